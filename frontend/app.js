@@ -1,6 +1,11 @@
 // Configuration
 const API_URL = 'https://pkj2v7ecf3.execute-api.us-east-1.amazonaws.com/prod';
 
+// Status push channel (StatusSocketUrl stack output); leave empty to only poll
+const WS_URL = 'YOUR_STATUS_SOCKET_URL';
+// While subscribed, poll rarely in case a push is missed
+const PUSH_FALLBACK_POLL_MS = 15000;
+
 // Helper to build API URLs correctly
 function getApiUrl(path) {
     const base = API_URL.replace(/\/$/, ''); // Remove trailing slash
@@ -8,6 +13,10 @@ function getApiUrl(path) {
     return base + cleanPath;
 }
 
+// Uploads go straight to S3 as presigned multipart parts
+const MAX_FILE_SIZE = 268435456; // 256 MB, matches MAX_FILE_SIZE_BYTES
+const UPLOAD_CONCURRENCY = 4;
+
 // State
 let currentDatasetId = null;
 let statusCheckInterval = null;
@@ -68,8 +77,8 @@ function handleFileSelect(file) {
         return;
     }
 
-    if (file.size > 1048576) {
-        showToast('File size exceeds 1 MB limit.', 'error');
+    if (file.size > MAX_FILE_SIZE) {
+        showToast('File size exceeds 256 MB limit.', 'error');
         uploadBtn.disabled = true;
         return;
     }
@@ -94,15 +103,12 @@ async function handleUpload() {
     uploadBtn.disabled = true;
     uploadProgress.style.display = 'block';
     
-    // Simulate progress
-    let progress = 0;
-    const progressInterval = setInterval(() => {
-        progress += 10;
-        if (progress <= 90) {
-            progressFill.style.width = progress + '%';
-            progressText.textContent = `Uploading... ${progress}%`;
-        }
-    }, 200);
+    const showProgress = (fraction) => {
+        const percent = Math.round(fraction * 100);
+        progressFill.style.width = percent + '%';
+        progressText.textContent = `Uploading... ${percent}%`;
+    };
+    showProgress(0);
 
     try {
         const datasetId = `demo-${Date.now()}`;
@@ -111,34 +117,10 @@ async function handleUpload() {
         // Store upload start time for display
         const uploadStartTime = new Date();
 
-        const fileContent = await readFileAsBase64(file);
-        
-        progressFill.style.width = '95%';
-        progressText.textContent = 'Processing...';
-
-        const response = await fetch(getApiUrl('/upload'), {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-            body: JSON.stringify({
-                datasetId: datasetId,
-                fileName: file.name,
-                fileType: file.name.endsWith('.geojson') || file.name.endsWith('.json') ? 'geojson' : 'geotiff',
-                fileContent: fileContent,
-            }),
-        });
+        await uploadMultipart(datasetId, file, showProgress);
 
-        clearInterval(progressInterval);
         progressFill.style.width = '100%';
         progressText.textContent = 'Complete!';
-
-        if (!response.ok) {
-            const errorData = await response.json().catch(() => ({}));
-            throw new Error(errorData.error || `Upload failed: ${response.statusText}`);
-        }
-
-        const data = await response.json();
         
         // Calculate upload duration
         const uploadEndTime = new Date();
@@ -181,7 +163,6 @@ async function handleUpload() {
         updateStats();
 
     } catch (error) {
-        clearInterval(progressInterval);
         uploadProgress.style.display = 'none';
         progressFill.style.width = '0%';
         showToast(`Upload failed: ${error.message}`, 'error');
@@ -189,22 +170,69 @@ async function handleUpload() {
     }
 }
 
-function readFileAsBase64(file) {
-    return new Promise((resolve, reject) => {
-        const reader = new FileReader();
-        reader.onload = (e) => {
-            const base64 = e.target.result.split(',')[1];
-            resolve(base64);
-        };
-        reader.onerror = reject;
-        reader.readAsDataURL(file);
+async function postJson(path, body) {
+    const response = await fetch(getApiUrl(path), {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify(body),
+    });
+    if (!response.ok) {
+        const errorData = await response.json().catch(() => ({}));
+        throw new Error(errorData.error || `Upload failed: ${response.statusText}`);
+    }
+    return response.json();
+}
+
+// Upload a file as presigned multipart parts, UPLOAD_CONCURRENCY at a time
+async function uploadMultipart(datasetId, file, onProgress) {
+    const fileName = file.name;
+    const fileType = fileName.endsWith('.geojson') || fileName.endsWith('.json') ? 'geojson' : 'geotiff';
+    const upload = await postJson('/upload', {
+        datasetId: datasetId,
+        fileName: fileName,
+        fileType: fileType,
+        fileSize: file.size,
+    });
+
+    const completed = [];
+    let uploadedBytes = 0;
+    const queue = upload.parts.slice();
+
+    async function worker() {
+        while (queue.length) {
+            const part = queue.shift();
+            const start = (part.partNumber - 1) * upload.partSize;
+            const chunk = file.slice(start, Math.min(start + upload.partSize, file.size));
+            const response = await fetch(part.url, { method: 'PUT', body: chunk });
+            if (!response.ok) {
+                throw new Error(`Part ${part.partNumber} failed: ${response.statusText}`);
+            }
+            completed.push({ partNumber: part.partNumber, eTag: response.headers.get('ETag') });
+            uploadedBytes += chunk.size;
+            onProgress(uploadedBytes / file.size);
+        }
+    }
+
+    const workers = [];
+    for (let i = 0; i < Math.min(UPLOAD_CONCURRENCY, queue.length); i++) {
+        workers.push(worker());
+    }
+    await Promise.all(workers);
+
+    return postJson('/upload/complete', {
+        datasetId: datasetId,
+        fileName: fileName,
+        uploadId: upload.uploadId,
+        parts: completed,
     });
 }
 
 // Status polling - optimized for faster updates
 let fastPollInterval = null;
 
-function startStatusPolling(datasetId) {
+function startStatusPolling(datasetId, usePush = true) {
     // Clear any existing intervals
     if (statusCheckInterval) {
         clearInterval(statusCheckInterval);
@@ -215,9 +243,18 @@ function startStatusPolling(datasetId) {
         fastPollInterval = null;
     }
 
-    // Check immediately
+    // Check immediately, rendering the job even if it has not changed
+    delete statusETags[datasetId];
     checkStatus(datasetId);
 
+    if (usePush && subscribeStatus(datasetId)) {
+        // Status changes are pushed over the socket
+        statusCheckInterval = setInterval(() => {
+            checkStatus(datasetId);
+        }, PUSH_FALLBACK_POLL_MS);
+        return;
+    }
+
     // Fast polling for first 30 seconds (every 1 second)
     let fastPollCount = 0;
     fastPollInterval = setInterval(() => {
@@ -237,21 +274,68 @@ function startStatusPolling(datasetId) {
     }, 1000);
 }
 
+// Push channel: one socket, subscribed to the job being viewed
+let statusSocket = null;
+let subscribedDatasetId = null;
+
+function subscribeStatus(datasetId) {
+    if (!WS_URL.startsWith('wss://') || typeof WebSocket === 'undefined') {
+        return false;
+    }
+    subscribedDatasetId = datasetId;
+    const send = () => statusSocket.send(JSON.stringify({ action: 'subscribe', datasetId: datasetId }));
+
+    if (statusSocket && statusSocket.readyState === WebSocket.OPEN) {
+        send();
+        return true;
+    }
+    if (!statusSocket) {
+        statusSocket = new WebSocket(WS_URL);
+        statusSocket.onmessage = (event) => {
+            const data = JSON.parse(event.data);
+            if (data.datasetId === subscribedDatasetId) {
+                applyStatus(data.datasetId, data);
+            }
+        };
+        statusSocket.onclose = () => {
+            statusSocket = null;
+            // Fall back to polling while the job is still running
+            if (subscribedDatasetId && (statusCheckInterval || fastPollInterval)) {
+                startStatusPolling(subscribedDatasetId, false);
+            }
+        };
+    }
+    statusSocket.addEventListener('open', send, { once: true });
+    return true;
+}
+
 // Track consecutive errors to prevent spam
 let consecutiveErrors = 0;
 const MAX_CONSECUTIVE_ERRORS = 3;
 
+// Last status ETag per job; unchanged jobs answer 304 with no body
+const statusETags = {};
+
 async function checkStatus(datasetId) {
     try {
+        const headers = {
+            'Cache-Control': 'no-cache',
+            'Pragma': 'no-cache'
+        };
+        if (statusETags[datasetId]) {
+            headers['If-None-Match'] = statusETags[datasetId];
+        }
         const response = await fetch(getApiUrl(`/status/${datasetId}`), {
             cache: 'no-cache',
-            headers: {
-                'Cache-Control': 'no-cache',
-                'Pragma': 'no-cache'
-            },
+            headers: headers,
             signal: AbortSignal.timeout(10000) // 10 second timeout
         });
         
+        if (response.status === 304) {
+            // Nothing changed since the last check
+            consecutiveErrors = 0;
+            return;
+        }
         if (!response.ok) {
             if (response.status === 404) {
                 // Job not found yet, this is normal during processing
@@ -266,194 +350,201 @@ async function checkStatus(datasetId) {
 
         const data = await response.json();
         console.log('Status check response:', JSON.stringify(data, null, 2)); // Debug log
-        
-        // CRITICAL: If status is COMPLETED, force update immediately
-        if (data.status === 'COMPLETED') {
-            console.log('✅ Status is COMPLETED - processing is done!');
+        if (response.headers.get('ETag')) {
+            statusETags[datasetId] = response.headers.get('ETag');
         }
+        applyStatus(datasetId, data);
+    } catch (error) {
+        consecutiveErrors++;
+        console.error('Error checking status:', error);
         
-        // Update status display immediately
-        updateStatusDisplay(data);
+        // Only show error if it's a real network error and not just 404
+        if (consecutiveErrors <= MAX_CONSECUTIVE_ERRORS) {
+            if (error.name === 'AbortError') {
+                console.warn('Request timeout - will retry');
+                // Don't show toast for timeout, just retry
+            } else if (!error.message.includes('404')) {
+                // Only show error for non-404 errors and limit spam
+                if (consecutiveErrors === 1) {
+                    showToast('Checking status...', 'success');
+                } else if (consecutiveErrors === MAX_CONSECUTIVE_ERRORS) {
+                    showToast('Connection issue. Retrying...', 'error');
+                }
+            }
+        }
+        // Don't spam errors after max attempts
+    }
+}
+
+// Render a job status, whether polled from /status or pushed over the socket
+function applyStatus(datasetId, data) {
+    // CRITICAL: If status is COMPLETED, force update immediately
+    if (data.status === 'COMPLETED') {
+        console.log('✅ Status is COMPLETED - processing is done!');
+    }
+    
+    // Update status display immediately
+    updateStatusDisplay(data);
 
-        // Check if we have results (handle multiple nested structures)
-        let hasResults = false;
-        let resultData = null;
+    // Check if we have results (handle multiple nested structures)
+    let hasResults = false;
+    let resultData = null;
+    
+    if (data.result) {
+        console.log('Result structure:', JSON.stringify(data.result, null, 2)); // Debug
         
-        if (data.result) {
-            console.log('Result structure:', JSON.stringify(data.result, null, 2)); // Debug
-            
-            // Check if result has summary directly
-            if (data.result.summary) {
-                hasResults = true;
-                resultData = data.result;
-                console.log('Found results with summary structure');
+        // Check if result has summary directly
+        if (data.result.summary) {
+            hasResults = true;
+            resultData = data.result;
+            console.log('Found results with summary structure');
+        }
+        // Check if result itself is the summary (has pointCount or polygonCount)
+        else if (data.result.pointCount !== undefined || data.result.polygonCount !== undefined || 
+                 (data.result.M && data.result.M.summary)) {
+            hasResults = true;
+            // Handle DynamoDB format if needed
+            if (data.result.M && data.result.M.summary) {
+                // Convert DynamoDB format
+                resultData = { summary: convertDynamoDBFormat(data.result.M.summary) };
+            } else {
+                resultData = { summary: data.result };
             }
-            // Check if result itself is the summary (has pointCount or polygonCount)
-            else if (data.result.pointCount !== undefined || data.result.polygonCount !== undefined || 
-                     (data.result.M && data.result.M.summary)) {
+            console.log('Found results with direct summary data');
+        }
+        // Check for nested M (DynamoDB map format)
+        else if (data.result.M) {
+            if (data.result.M.summary) {
                 hasResults = true;
-                // Handle DynamoDB format if needed
-                if (data.result.M && data.result.M.summary) {
-                    // Convert DynamoDB format
-                    resultData = { summary: convertDynamoDBFormat(data.result.M.summary) };
-                } else {
-                    resultData = { summary: data.result };
-                }
-                console.log('Found results with direct summary data');
-            }
-            // Check for nested M (DynamoDB map format)
-            else if (data.result.M) {
-                if (data.result.M.summary) {
-                    hasResults = true;
-                    resultData = { summary: convertDynamoDBFormat(data.result.M.summary) };
-                    console.log('Found results in DynamoDB M format');
-                }
+                resultData = { summary: convertDynamoDBFormat(data.result.M.summary) };
+                console.log('Found results in DynamoDB M format');
             }
         }
-        
-        // Helper function to convert DynamoDB format (if needed)
-        function convertDynamoDBFormat(obj) {
-            if (!obj || typeof obj !== 'object') return obj;
-            if (obj.M) {
-                // It's a DynamoDB map, convert recursively
-                const result = {};
-                for (const [key, value] of Object.entries(obj.M)) {
-                    if (value && typeof value === 'object') {
-                        if (value.S !== undefined) result[key] = value.S;
-                        else if (value.N !== undefined) result[key] = parseFloat(value.N);
-                        else if (value.BOOL !== undefined) result[key] = value.BOOL;
-                        else if (value.L !== undefined) result[key] = value.L.map(item => convertDynamoDBFormat(item));
-                        else if (value.M !== undefined) result[key] = convertDynamoDBFormat(value);
-                        else result[key] = value;
-                    } else {
-                        result[key] = value;
-                    }
+    }
+    
+    // Helper function to convert DynamoDB format (if needed)
+    function convertDynamoDBFormat(obj) {
+        if (!obj || typeof obj !== 'object') return obj;
+        if (obj.M) {
+            // It's a DynamoDB map, convert recursively
+            const result = {};
+            for (const [key, value] of Object.entries(obj.M)) {
+                if (value && typeof value === 'object') {
+                    if (value.S !== undefined) result[key] = value.S;
+                    else if (value.N !== undefined) result[key] = parseFloat(value.N);
+                    else if (value.BOOL !== undefined) result[key] = value.BOOL;
+                    else if (value.L !== undefined) result[key] = value.L.map(item => convertDynamoDBFormat(item));
+                    else if (value.M !== undefined) result[key] = convertDynamoDBFormat(value);
+                    else result[key] = value;
+                } else {
+                    result[key] = value;
                 }
-                return result;
             }
-            return obj;
+            return result;
         }
+        return obj;
+    }
 
-        // Show results immediately when available
+    // Show results immediately when available
+    if (hasResults && resultData) {
+        document.getElementById('processingIndicator').style.display = 'none';
+        showResults(resultData);
+        console.log('Results displayed successfully');
+    }
+
+    // CRITICAL: Check for completion - if we have results OR status is COMPLETED, show results
+    const isCompleted = data.status === 'COMPLETED' || data.status === 'FAILED';
+    const hasAnyResults = hasResults || (data.result && Object.keys(data.result).length > 0);
+    
+    // ALWAYS hide processing indicator if status is COMPLETED
+    if (isCompleted) {
+        document.getElementById('processingIndicator').style.display = 'none';
+        console.log('✅ Processing complete - hiding indicator');
+    }
+    
+    // If we have results OR status is COMPLETED, show results
+    if (hasAnyResults || isCompleted) {
+        document.getElementById('processingIndicator').style.display = 'none';
+        
+        // Show results with whatever data we have
         if (hasResults && resultData) {
-            document.getElementById('processingIndicator').style.display = 'none';
+            console.log('Showing results with detected structure');
             showResults(resultData);
-            console.log('Results displayed successfully');
+        } else if (data.result) {
+            // Try to show results even if structure detection failed
+            console.log('Showing results with available data');
+            showResults(data.result);
+        } else if (isCompleted) {
+            // Status is COMPLETED but no results yet - retry
+            console.log('Status COMPLETED but no results - will retry');
         }
-
-        // CRITICAL: Check for completion - if we have results OR status is COMPLETED, show results
-        const isCompleted = data.status === 'COMPLETED' || data.status === 'FAILED';
-        const hasAnyResults = hasResults || (data.result && Object.keys(data.result).length > 0);
         
-        // ALWAYS hide processing indicator if status is COMPLETED
-        if (isCompleted) {
-            document.getElementById('processingIndicator').style.display = 'none';
-            console.log('✅ Processing complete - hiding indicator');
+        // If status is COMPLETED, show success message
+        if (isCompleted && hasAnyResults) {
+            showToast('✅ Processing completed! Results displayed below.', 'success');
+        } else if (isCompleted && !hasAnyResults) {
+            showToast('✅ Processing completed! Fetching results...', 'success');
         }
+    }
+
+    // Handle completion or failure
+    if (isCompleted) {
+        console.log('Status is COMPLETED or FAILED, stopping polling');
         
-        // If we have results OR status is COMPLETED, show results
-        if (hasAnyResults || isCompleted) {
-            document.getElementById('processingIndicator').style.display = 'none';
-            
-            // Show results with whatever data we have
-            if (hasResults && resultData) {
-                console.log('Showing results with detected structure');
-                showResults(resultData);
-            } else if (data.result) {
-                // Try to show results even if structure detection failed
-                console.log('Showing results with available data');
-                showResults(data.result);
-            } else if (isCompleted) {
-                // Status is COMPLETED but no results yet - retry
-                console.log('Status COMPLETED but no results - will retry');
-            }
-            
-            // If status is COMPLETED, show success message
-            if (isCompleted && hasAnyResults) {
-                showToast('✅ Processing completed! Results displayed below.', 'success');
-            } else if (isCompleted && !hasAnyResults) {
-                showToast('✅ Processing completed! Fetching results...', 'success');
-            }
+        // Clear all intervals immediately
+        if (statusCheckInterval) {
+            clearInterval(statusCheckInterval);
+            statusCheckInterval = null;
+        }
+        if (fastPollInterval) {
+            clearInterval(fastPollInterval);
+            fastPollInterval = null;
         }
 
-        // Handle completion or failure
-        if (isCompleted) {
-            console.log('Status is COMPLETED or FAILED, stopping polling');
-            
-            // Clear all intervals immediately
-            if (statusCheckInterval) {
-                clearInterval(statusCheckInterval);
-                statusCheckInterval = null;
-            }
-            if (fastPollInterval) {
-                clearInterval(fastPollInterval);
-                fastPollInterval = null;
-            }
-
-            document.getElementById('processingIndicator').style.display = 'none';
+        document.getElementById('processingIndicator').style.display = 'none';
 
-            if (data.status === 'COMPLETED') {
-                // Force show results if we have any data
-                if (!hasAnyResults && data.result) {
-                    console.log('Forcing result display on completion');
-                    showResults(data.result);
-                }
-                
-                if (!hasAnyResults) {
-                    // No results yet, retry a few times
-                    let retryCount = 0;
-                    const maxRetries = 5;
-                    const retryInterval = setInterval(() => {
-                        retryCount++;
-                        console.log(`Retrying to fetch results (${retryCount}/${maxRetries})`);
-                        checkStatus(datasetId).then(() => {
-                            if (retryCount >= maxRetries) {
-                                clearInterval(retryInterval);
-                            }
-                        });
-                    }, 2000);
-                    
-                    setTimeout(() => {
-                        clearInterval(retryInterval);
-                    }, maxRetries * 2000);
-                }
-            } else {
-                showToast('❌ Processing failed. Please check the logs.', 'error');
-                if (data.error) {
-                    console.error('Error details:', data.error);
-                }
+        if (data.status === 'COMPLETED') {
+            // Force show results if we have any data
+            if (!hasAnyResults && data.result) {
+                console.log('Forcing result display on completion');
+                showResults(data.result);
             }
             
-            loadJobsList();
-            updateStats();
+            if (!hasAnyResults) {
+                // No results yet, retry a few times
+                let retryCount = 0;
+                const maxRetries = 5;
+                const retryInterval = setInterval(() => {
+                    retryCount++;
+                    console.log(`Retrying to fetch results (${retryCount}/${maxRetries})`);
+                    checkStatus(datasetId).then(() => {
+                        if (retryCount >= maxRetries) {
+                            clearInterval(retryInterval);
+                        }
+                    });
+                }, 2000);
+                
+                setTimeout(() => {
+                    clearInterval(retryInterval);
+                }, maxRetries * 2000);
+            }
         } else {
-            // Still processing - show indicator only if no results yet
-            if ((data.status === 'PROCESSING' || data.status === 'PENDING') && !hasAnyResults) {
-                document.getElementById('processingIndicator').style.display = 'block';
-            } else if (hasAnyResults) {
-                // We have results, hide processing indicator
-                document.getElementById('processingIndicator').style.display = 'none';
+            showToast('❌ Processing failed. Please check the logs.', 'error');
+            if (data.error) {
+                console.error('Error details:', data.error);
             }
         }
-    } catch (error) {
-        consecutiveErrors++;
-        console.error('Error checking status:', error);
         
-        // Only show error if it's a real network error and not just 404
-        if (consecutiveErrors <= MAX_CONSECUTIVE_ERRORS) {
-            if (error.name === 'AbortError') {
-                console.warn('Request timeout - will retry');
-                // Don't show toast for timeout, just retry
-            } else if (!error.message.includes('404')) {
-                // Only show error for non-404 errors and limit spam
-                if (consecutiveErrors === 1) {
-                    showToast('Checking status...', 'success');
-                } else if (consecutiveErrors === MAX_CONSECUTIVE_ERRORS) {
-                    showToast('Connection issue. Retrying...', 'error');
-                }
-            }
+        loadJobsList();
+        updateStats();
+    } else {
+        // Still processing - show indicator only if no results yet
+        if ((data.status === 'PROCESSING' || data.status === 'PENDING') && !hasAnyResults) {
+            document.getElementById('processingIndicator').style.display = 'block';
+        } else if (hasAnyResults) {
+            // We have results, hide processing indicator
+            document.getElementById('processingIndicator').style.display = 'none';
         }
-        // Don't spam errors after max attempts
     }
 }
 
@@ -728,7 +819,7 @@ async function loadJobsList() {
     jobsList.innerHTML = '<div class="loading-state"><div class="spinner-small"></div><p>Loading jobs...</p></div>';
 
     try {
-        const response = await fetch(getApiUrl('/jobs'), {
+        const response = await fetch(getApiUrl('/jobs?limit=100'), {
             cache: 'no-cache',
             signal: AbortSignal.timeout(10000)
         });
@@ -957,7 +1048,7 @@ function showAbout() {
 }
 
 function showHelp() {
-    alert('Help & Support\n\n1. Upload GeoJSON or GeoTIFF files (max 1MB)\n2. Monitor job status in real-time\n3. View analysis results when complete\n4. Check email for notifications\n\nFor issues, check CloudWatch logs or contact support.');
+    alert('Help & Support\n\n1. Upload GeoJSON or GeoTIFF files (max 256MB)\n2. Monitor job status in real-time\n3. View analysis results when complete\n4. Check email for notifications\n\nFor issues, check CloudWatch logs or contact support.');
 }
 
 // Make viewJob available globally
@@ -1,145 +1,342 @@
 import json
+import math
 import os
 from typing import Any, Dict, List, Optional
 import boto3
 
+from sgaf_core import cache as result_cache
+from sgaf_core import columnar, partial, rtree
+from sgaf_core.manifest import write_manifest
+from sgaf_core.metrics import flush_metrics, put_metric
+from sgaf_core.spatial import clip_cell
+from sgaf_core.status import update_job_status
+from sgaf_core.timings import merge as merge_timings
+
 OUTPUT_BUCKET = os.environ.get("OUTPUT_BUCKET", "")
-UPDATE_STATUS_FUNCTION = os.environ.get("UPDATE_STATUS_FUNCTION", "")
+DYNAMODB_TABLE = os.environ.get("DYNAMODB_TABLE", "")
+RESULT_CACHE_TTL_DAYS = int(os.environ.get("RESULT_CACHE_TTL_DAYS", "3"))
 
 s3 = boto3.client("s3")
-lambda_client = boto3.client("lambda")
-cloudwatch = boto3.client("cloudwatch")
+dynamodb = boto3.resource("dynamodb")
+table = dynamodb.Table(DYNAMODB_TABLE) if DYNAMODB_TABLE else None
 
 
+@flush_metrics
 def handler(event: Any, context: Any) -> Dict[str, Any]:
     # Expect list of results from Map state
     results: List[Dict[str, Any]]
     if isinstance(event, list):
         results = event
+    elif isinstance(event, dict) and "ResultWriterDetails" in event:
+        # Distributed Map writes tile results to S3 instead of returning them
+        results = _load_map_results(event["ResultWriterDetails"])
     elif isinstance(event, dict) and "Payload" in event:
         results = event["Payload"] if isinstance(event["Payload"], list) else [event["Payload"]]
     else:
         results = [event]
 
-    # Combine partial stats from shards
-    total_point_count = 0
-    total_point_sum_x = 0.0
-    total_point_sum_y = 0.0
-    total_polygon_count = 0
-    total_polygon_area = 0.0
-    total_other_count = 0
-    merged_bbox: Optional[List[float]] = None
+    if any("batch" in r for r in results):
+        return _aggregate_batch(results)
+    return _aggregate(results)
+
+
+def _aggregate_batch(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Aggregate a packed execution dataset by dataset.
+
+    Every dataset gets its own manifest and job status, exactly as if it had
+    run alone; the returned summary only totals them for the notification.
+    """
+    batch_id = _first_value(results, "batchId") or ""
+    by_dataset: Dict[str, List[Dict[str, Any]]] = {}
+    for r in results:
+        for item in r.get("batch", [r]):
+            by_dataset.setdefault(item.get("datasetId") or "", []).append(item)
+
+    datasets = []
+    for dataset_results in by_dataset.values():
+        out = _aggregate(dataset_results)
+        datasets.append({
+            "datasetId": out["datasetId"],
+            "status": out["status"],
+            "pointCount": out["summary"]["pointCount"],
+            "polygonCount": out["summary"]["polygonCount"],
+            "polygonArea": out["summary"]["polygonArea"],
+            "otherCount": out["summary"]["otherCount"],
+        })
 
+    all_ok = all(d["status"] == "COMPLETED" for d in datasets)
+    summary = {
+        "datasetId": batch_id,
+        "ok": all_ok,
+        "datasets": datasets,
+        "pointCount": sum(d["pointCount"] for d in datasets),
+        "polygonCount": sum(d["polygonCount"] for d in datasets),
+        "polygonArea": math.fsum(d["polygonArea"] for d in datasets),
+        "otherCount": sum(d["otherCount"] for d in datasets),
+    }
+    return {"summary": summary, "datasetId": batch_id, "status": "COMPLETED" if all_ok else "FAILED"}
+
+
+def _aggregate(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge one dataset's tile results, then write its manifest and status"""
+    # Combine partial stats from shards with an exact, order-independent merge
     per_tile = []
+    partials = []
     for r in results:
-        status = r.get("status")
-        tile = r.get("tile")
+        if isinstance(r.get("summary"), dict):
+            # Output of a lower-level aggregate in a hierarchical reduction
+            per_tile.extend(r["summary"].get("tiles", []))
+            partials.append(r["summary"].get("partial") or _partial_from_result(r["summary"]))
+            continue
+
         per = {
-            "tile": tile,
-            "status": status,
+            "tile": r.get("tile"),
+            "status": r.get("status"),
             "pointCount": r.get("pointCount", 0),
             "polygonCount": r.get("polygonCount", 0),
             "polygonAreaSum": r.get("polygonAreaSum", 0.0),
             "otherCount": r.get("otherCount", 0),
+            "bbox": r.get("bbox"),
         }
+        if r.get("cell") is not None:
+            per["cell"] = r["cell"]
+        if r.get("indexPart"):
+            per["indexPart"] = r["indexPart"]
+        if r.get("columnsPart"):
+            per["columnsPart"] = r["columnsPart"]
+        if r.get("cachedTile"):
+            per["cached"] = True
+        if r.get("error"):
+            per["error"] = r["error"]
+        if r.get("timings"):
+            per["timings"] = r["timings"]
         per_tile.append(per)
+        partials.append(r.get("partial") or _partial_from_result(r))
 
-        total_point_count += int(r.get("pointCount", 0))
-        ps = r.get("pointSum") or [0.0, 0.0]
-        total_point_sum_x += float(ps[0])
-        total_point_sum_y += float(ps[1])
-        total_polygon_count += int(r.get("polygonCount", 0))
-        total_polygon_area += float(r.get("polygonAreaSum", 0.0))
-        total_other_count += int(r.get("otherCount", 0))
-
-        bbox = r.get("bbox")
-        if isinstance(bbox, list) and len(bbox) == 4:
-            if merged_bbox is None:
-                merged_bbox = list(bbox)
-            else:
-                merged_bbox[0] = min(merged_bbox[0], bbox[0])
-                merged_bbox[1] = min(merged_bbox[1], bbox[1])
-                merged_bbox[2] = max(merged_bbox[2], bbox[2])
-                merged_bbox[3] = max(merged_bbox[3], bbox[3])
-
+    merged = partial.merge_all(partials)
+    totals = partial.finalize(merged)
     all_ok = all((t.get("status") == "ok") for t in per_tile)
-    centroid = None
-    if total_point_count > 0:
-        centroid = [total_point_sum_x / total_point_count, total_point_sum_y / total_point_count]
+    for t in per_tile:
+        # Spatial tiles report their grid cell bounded to the dataset extent;
+        # unlike feature bboxes, these never overlap
+        if t.get("cell") is not None:
+            t["cellBbox"] = clip_cell(t["cell"], totals["bbox"])
 
     dataset_id = _first_dataset_id(results)
     summary = {
         "datasetId": dataset_id,
         "ok": all_ok,
         "tiles": per_tile,
-        "bbox": merged_bbox,
-        "pointCount": total_point_count,
-        "pointCentroid": centroid,
-        "polygonCount": total_polygon_count,
-        "polygonArea": total_polygon_area,
-        "otherCount": total_other_count,
+        "bbox": totals["bbox"],
+        "pointCount": totals["pointCount"],
+        "pointCentroid": totals["pointCentroid"],
+        "polygonCount": totals["polygonCount"],
+        "polygonArea": totals["polygonArea"],
+        "otherCount": totals["otherCount"],
+        "reusedTiles": sum(1 for t in per_tile if t.get("cached")),
+        "partial": merged,
     }
+    columns = _list_column_parts(per_tile)
+    if columns is not None:
+        summary["columnar"] = columns
+    raster = _merge_raster_stats(results)
+    if raster is not None:
+        summary["raster"] = raster
+        skipped = _first_value([r.get("rasterStats") or {} for r in results], "skipped")
+        if skipped:
+            summary["rasterStatsUnavailable"] = skipped
+    timings = merge_timings(per_tile)
+    if timings is not None:
+        summary["timings"] = timings
 
     # Write manifest to S3 and update DynamoDB
+    status = "COMPLETED" if all_ok else "FAILED"
     try:
         dataset_id = dataset_id or _first_dataset_id(results)
         if OUTPUT_BUCKET and dataset_id:
-            key = f"{dataset_id}/manifest.json"
-            s3.put_object(
-                Bucket=OUTPUT_BUCKET,
-                Key=key,
-                Body=json.dumps(summary).encode("utf-8"),
-                ContentType="application/json"
-            )
-            
-            # Emit CloudWatch metric
-            cloudwatch.put_metric_data(
-                Namespace="SGAF/Aggregation",
-                MetricData=[
-                    {
-                        "MetricName": "JobsCompleted",
-                        "Value": 1,
-                        "Unit": "Count",
-                    }
-                ],
-            )
-            
-            # Update DynamoDB immediately (synchronous) for faster frontend updates
-            if UPDATE_STATUS_FUNCTION:
+            if all_ok and any(t.get("indexPart") for t in per_tile):
+                try:
+                    summary["spatialIndex"] = _build_spatial_index(
+                        dataset_id, per_tile, _first_value(results, "objectKey"), _first_value(results, "eTag")
+                    )
+                except Exception as e:
+                    print(f"Error building spatial index: {e}")
+            write_manifest(s3, OUTPUT_BUCKET, dataset_id, summary)
+
+            cache_key = _first_value(results, "cacheKey")
+            if cache_key and status == "COMPLETED":
                 try:
-                    lambda_client.invoke(
-                        FunctionName=UPDATE_STATUS_FUNCTION,
-                        InvocationType="RequestResponse",  # Synchronous for faster updates
-                        Payload=json.dumps({
-                            "datasetId": dataset_id,
-                            "status": "COMPLETED" if all_ok else "FAILED",
-                            "result": {"summary": summary},  # Wrap in summary for consistency
-                        }),
+                    result_cache.record(
+                        s3, OUTPUT_BUCKET, cache_key, dataset_id,
+                        _first_value(results, "objectKey"), RESULT_CACHE_TTL_DAYS,
                     )
+                except Exception as e:
+                    print(f"Error recording result cache entry: {e}")
+
+            # Buffered and written as EMF when the handler returns
+            put_metric("SGAF/Aggregation", "JobsCompleted", 1, dimensions={"Status": status})
+            put_metric("SGAF/Aggregation", "TilesAggregated", len(per_tile), dimensions={"Status": status})
+
+            # Single conditional DynamoDB write; no separate status Lambda hop
+            if table:
+                try:
+                    # Rejected if the dataset ID was restarted after this run began
+                    written = update_job_status(
+                        table, dataset_id, status, result={"summary": summary},
+                        expected_version=_first_value(results, "jobVersion"),
+                    )
+                    if not written:
+                        print(f"Job {dataset_id} restarted or already finished; status {status} not applied")
                 except Exception as e:
                     print(f"Error updating status: {e}")
-                    # Fallback to async if sync fails
-                    try:
-                        lambda_client.invoke(
-                            FunctionName=UPDATE_STATUS_FUNCTION,
-                            InvocationType="Event",
-                            Payload=json.dumps({
-                                "datasetId": dataset_id,
-                                "status": "COMPLETED" if all_ok else "FAILED",
-                                "result": {"summary": summary},
-                            }),
-                        )
-                    except:
-                        pass
     except Exception:
         pass
 
-    return {"summary": summary}
+    return {"summary": summary, "datasetId": dataset_id, "status": status}
+
+
+def _partial_from_result(r: Dict[str, Any]) -> Dict[str, Any]:
+    """Partial for results that carry only rounded totals (e.g. GeoTIFF tiles)"""
+    bbox = r.get("bbox")
+    return partial.from_totals(
+        point_count=r.get("pointCount", 0),
+        point_sum=r.get("pointSum"),
+        polygon_count=r.get("polygonCount", 0),
+        polygon_area=r.get("polygonAreaSum", r.get("polygonArea", 0.0)),
+        other_count=r.get("otherCount", 0),
+        bbox=bbox if isinstance(bbox, list) and len(bbox) == 4 else None,
+    )
+
+
+def _spatial_index_key(dataset_id: str) -> str:
+    return f"{dataset_id}/index/features.rtree"
+
+
+def _build_spatial_index(
+    dataset_id: str, per_tile: List[Dict[str, Any]], object_key: Optional[str], etag: Optional[str] = None
+) -> Dict[str, Any]:
+    """Merge per-tile R-tree parts into one dataset-wide packed Hilbert R-tree.
+
+    The index records the source object's ETag; its offsets are only valid
+    for that version of objectKey.
+    """
+    items: List[rtree.Item] = []
+    for t in per_tile:
+        part = t.get("indexPart")
+        if not part:
+            continue
+        base = int(part.get("base", 0))
+        body = s3.get_object(Bucket=OUTPUT_BUCKET, Key=part["key"])["Body"].read()
+        for minx, miny, maxx, maxy, offset, length in rtree.read_items(body):
+            items.append((minx, miny, maxx, maxy, base + offset, length))
+
+    key = _spatial_index_key(dataset_id)
+    s3.put_object(
+        Bucket=OUTPUT_BUCKET,
+        Key=key,
+        Body=rtree.build(rtree.hilbert_sort(items)),
+        ContentType="application/octet-stream",
+    )
+    return {
+        "key": key,
+        "objectKey": object_key,
+        "eTag": etag,
+        "featureCount": len(items),
+        "nodeSize": rtree.NODE_SIZE,
+    }
+
+
+def _list_column_parts(per_tile: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Describe the per-tile columnar tables written by process"""
+    parts = [
+        {"tile": t.get("tile"), **t["columnsPart"]}
+        for t in per_tile
+        if t.get("columnsPart")
+    ]
+    if not parts:
+        return None
+    return {
+        "format": "sgcol",
+        "version": columnar.VERSION,
+        "columns": [{"name": name, "type": ctype} for name, ctype in columnar.SCHEMA],
+        "rows": sum(int(p.get("rows", 0)) for p in parts),
+        "parts": sorted(parts, key=lambda p: p["tile"] if p["tile"] is not None else -1),
+    }
+
+
+def _load_map_results(details: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Read child execution outputs from a Distributed Map ResultWriter manifest"""
+    bucket = details["Bucket"]
+    manifest = json.loads(s3.get_object(Bucket=bucket, Key=details["Key"])["Body"].read())
+    files = manifest.get("ResultFiles", {})
+    if files.get("FAILED"):
+        raise Exception(f"{len(files['FAILED'])} Distributed Map result file(s) contain failed tiles")
+
+    results = []
+    for f in files.get("SUCCEEDED", []):
+        body = s3.get_object(Bucket=bucket, Key=f["Key"])["Body"].read()
+        for execution in json.loads(body):
+            results.append(json.loads(execution["Output"]))
+    return results
+
+
+def _merge_raster_stats(results: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Combine per-tile GeoTIFF band statistics into dataset-wide values"""
+    metadata = None
+    bands: Dict[int, Dict[str, Any]] = {}
+    for r in results:
+        if metadata is None and r.get("raster"):
+            metadata = r["raster"]
+        stats = r.get("rasterStats") or {}
+        for b in stats.get("bands", []):
+            merged = bands.get(b["band"])
+            if merged is None:
+                merged = bands[b["band"]] = {
+                    "band": b["band"],
+                    "count": 0,
+                    "nodataCount": 0,
+                    "min": None,
+                    "max": None,
+                    "sum": [0.0],
+                    "histogram": None,
+                }
+            merged["count"] += int(b.get("count", 0))
+            merged["nodataCount"] += int(b.get("nodataCount", 0))
+            partial.grow(merged["sum"], float(b.get("sum", 0.0)))
+            if b.get("min") is not None:
+                merged["min"] = b["min"] if merged["min"] is None else min(merged["min"], b["min"])
+                merged["max"] = b["max"] if merged["max"] is None else max(merged["max"], b["max"])
+            hist = b.get("histogram")
+            if hist:
+                if merged["histogram"] is None:
+                    merged["histogram"] = {"range": hist["range"], "counts": list(hist["counts"])}
+                else:
+                    counts = merged["histogram"]["counts"]
+                    for i, c in enumerate(hist["counts"]):
+                        counts[i] += c
+
+    if metadata is None and not bands:
+        return None
+    for merged in bands.values():
+        merged["sum"] = math.fsum(merged["sum"])
+        merged["mean"] = merged["sum"] / merged["count"] if merged["count"] else None
+    return {
+        "metadata": metadata,
+        "bands": [bands[k] for k in sorted(bands)],
+    }
+
+
+def _first_value(results: List[Dict[str, Any]], field: str) -> Optional[Any]:
+    for r in results:
+        val = r.get(field)
+        if val is not None:
+            return val
+    return None
 
 
 def _first_dataset_id(results: List[Dict[str, Any]]) -> str:
     for r in results:
-        val = r.get("datasetId")
+        val = r.get("datasetId") or (r.get("summary") or {}).get("datasetId")
         if isinstance(val, str) and val:
             return val
     return ""
@@ -1,36 +1,96 @@
+import base64
+import binascii
 import json
 import os
-from typing import Dict, Any
+import time
+from typing import Dict, Any, List, Optional, Tuple
 import boto3
+from boto3.dynamodb.conditions import Key
+from botocore.config import Config
+from botocore.exceptions import ClientError
 from datetime import datetime
 
+from sgaf_core import rtree
+from sgaf_core.manifest import manifest_key
+from sgaf_core.metrics import flush_metrics, put_metric
+from sgaf_core.status import JOB_STATUSES, TERMINAL_STATUSES, job_view, put_job
+from sgaf_core.statuscache import RedisTier, StatusCache
+
 INPUT_BUCKET = os.environ.get("INPUT_BUCKET", "")
+OUTPUT_BUCKET = os.environ.get("OUTPUT_BUCKET", "")
 STATE_MACHINE_ARN = os.environ.get("STATE_MACHINE_ARN", "")
 DYNAMODB_TABLE = os.environ.get("DYNAMODB_TABLE", "")
+MAX_FILE_SIZE = int(os.environ.get("MAX_FILE_SIZE_BYTES", "268435456"))
+# Presigned multipart uploads: part size (S3 minimum is 5 MiB) and URL lifetime
+UPLOAD_PART_BYTES = max(5 * 1024 * 1024, int(os.environ.get("UPLOAD_PART_BYTES", "8388608")))
+UPLOAD_URL_EXPIRY_SECONDS = int(os.environ.get("UPLOAD_URL_EXPIRY_SECONDS", "3600"))
+# Largest base64 fileContent upload once decoded; the encoded body must fit
+# Lambda's 6 MB request payload limit
+MAX_INLINE_UPLOAD_BYTES = int(os.environ.get("MAX_INLINE_UPLOAD_BYTES", "4718592"))
+# Longest GET /status?wait= long poll; keep under the API Gateway 29 s timeout
+MAX_STATUS_WAIT_SECONDS = float(os.environ.get("MAX_STATUS_WAIT_SECONDS", "20"))
+STATUS_WAIT_MAX_DELAY_SECONDS = 2.0
+# GSI on (status, createdAt) that projects the listing fields but not result
+JOBS_STATUS_INDEX = os.environ.get("JOBS_STATUS_INDEX", "StatusCreatedAtIndex")
+DEFAULT_JOBS_LIMIT = 50
+MAX_JOBS_LIMIT = int(os.environ.get("MAX_JOBS_LIMIT", "100"))
+# Per-container read-through cache of job items and /jobs pages. Running jobs
+# are served for the TTL, finished jobs for the terminal TTL; a re-upload can
+# restart a finished job, so other containers see it within that long
+STATUS_CACHE_ITEMS = int(os.environ.get("STATUS_CACHE_ITEMS", "1024"))
+STATUS_CACHE_TTL_SECONDS = float(os.environ.get("STATUS_CACHE_TTL_SECONDS", "2"))
+STATUS_CACHE_TERMINAL_TTL_SECONDS = float(os.environ.get("STATUS_CACHE_TERMINAL_TTL_SECONDS", "60"))
+# Optional shared tier (redis:// or rediss:// URL) in front of DynamoDB
+STATUS_CACHE_URL = os.environ.get("STATUS_CACHE_URL", "")
+STATUS_CACHE_METRICS_SECONDS = 60
+DEFAULT_FEATURE_LIMIT = 100
+MAX_FEATURE_LIMIT = int(os.environ.get("MAX_FEATURE_LIMIT", "1000"))
+# Keep feature pages well under the 6 MB Lambda response limit
+MAX_FEATURE_PAGE_BYTES = int(os.environ.get("MAX_FEATURE_PAGE_BYTES", "4194304"))
+# The first read of an index fetches this many bytes, which holds its upper levels
+INDEX_PREFETCH_BYTES = 65536
+# Feature reads closer than this are coalesced into one ranged GET
+FEATURE_COALESCE_GAP_BYTES = 65536
 
-s3 = boto3.client("s3") if INPUT_BUCKET else None
+# SigV4 is required for presigned multipart URLs on KMS/SSE buckets and new regions
+s3 = boto3.client("s3", config=Config(signature_version="s3v4")) if INPUT_BUCKET or OUTPUT_BUCKET else None
 sfn = boto3.client("stepfunctions") if STATE_MACHINE_ARN else None
 dynamodb = boto3.resource("dynamodb") if DYNAMODB_TABLE else None
 table = dynamodb.Table(DYNAMODB_TABLE) if dynamodb and DYNAMODB_TABLE else None
+status_cache = StatusCache(
+    max_items=STATUS_CACHE_ITEMS,
+    ttl_seconds=STATUS_CACHE_TTL_SECONDS,
+    terminal_ttl_seconds=STATUS_CACHE_TERMINAL_TTL_SECONDS,
+    shared=RedisTier(STATUS_CACHE_URL) if STATUS_CACHE_URL else None,
+)
+_cache_metrics_flushed_at = time.monotonic()
 
 
+@flush_metrics
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """API Gateway Lambda handler for file upload and job status"""
     http_method = event.get("httpMethod", "")
     path = event.get("path", "")
     path_parameters = event.get("pathParameters") or {}
+    query = event.get("queryStringParameters") or {}
+    _flush_cache_metrics()
     
     try:
-        if http_method == "POST" and "/upload" in path:
+        if http_method == "POST" and path.endswith("/upload/complete"):
+            return handle_upload_complete(event)
+        elif http_method == "POST" and "/upload" in path:
             return handle_upload(event)
+        elif http_method == "GET" and path.startswith("/datasets/") and path.endswith("/features"):
+            dataset_id = path_parameters.get("datasetId") or path.split("/")[-2]
+            return handle_features(dataset_id, query)
         elif http_method == "GET" and "/status" in path:
             dataset_id = path_parameters.get("datasetId") or path.split("/")[-1]
             if dataset_id:
-                return handle_status(dataset_id)
+                return handle_status(dataset_id, query, event.get("headers") or {}, context)
             else:
                 return error_response(400, "Missing datasetId")
         elif http_method == "GET" and "/jobs" in path:
-            return handle_list_jobs()
+            return handle_list_jobs(query)
         elif http_method == "OPTIONS":
             return cors_response({})
         else:
@@ -40,48 +100,127 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
 
 
 def handle_upload(event: Dict[str, Any]) -> Dict[str, Any]:
-    """Handle file upload via API Gateway"""
-    body = json.loads(event.get("body", "{}"))
+    """Start an upload.
+
+    With fileSize, a multipart upload is created and presigned URLs for its
+    parts are returned, so the client PUTs the file straight to S3 in
+    parallel and then calls /upload/complete. Completing the upload fires
+    the ingest notification. A base64 fileContent body is still accepted for
+    files up to MAX_INLINE_UPLOAD_BYTES.
+    """
+    body = json.loads(event.get("body") or "{}")
     dataset_id = body.get("datasetId")
-    file_content = body.get("fileContent")  # Base64 encoded
-    file_name = body.get("fileName", "upload.geojson")
+    file_name = (body.get("fileName") or "upload.geojson").split("/")[-1]
     file_type = body.get("fileType", "geojson")
     
-    if not dataset_id or not file_content:
-        return error_response(400, "Missing datasetId or fileContent")
-    
-    # Decode base64
-    import base64
-    file_bytes = base64.b64decode(file_content)
-    
     if not s3 or not INPUT_BUCKET:
         return error_response(500, "S3 not configured")
-    
+
+    if body.get("fileContent") is not None:
+        return _upload_inline(dataset_id, file_name, file_type, body["fileContent"])
+
+    try:
+        file_size = int(body.get("fileSize"))
+    except (TypeError, ValueError):
+        return error_response(400, "Missing datasetId or fileSize")
+    if not dataset_id or file_size <= 0:
+        return error_response(400, "Missing datasetId or fileSize")
+    if file_size > MAX_FILE_SIZE:
+        return error_response(413, f"File too large: {file_size} > {MAX_FILE_SIZE}")
+
+    key = _upload_key(dataset_id, file_name)
+    upload = s3.create_multipart_upload(
+        Bucket=INPUT_BUCKET,
+        Key=key,
+        ContentType=_content_type(file_type),
+    )
+    upload_id = upload["UploadId"]
+    num_parts = max(1, -(-file_size // UPLOAD_PART_BYTES))
+    parts = [
+        {
+            "partNumber": n,
+            "url": s3.generate_presigned_url(
+                "upload_part",
+                Params={"Bucket": INPUT_BUCKET, "Key": key, "UploadId": upload_id, "PartNumber": n},
+                ExpiresIn=UPLOAD_URL_EXPIRY_SECONDS,
+            ),
+        }
+        for n in range(1, num_parts + 1)
+    ]
+
+    _put_pending_job(dataset_id, file_name, file_type)
+    return cors_response({
+        "datasetId": dataset_id,
+        "status": "PENDING",
+        "uploadId": upload_id,
+        "partSize": UPLOAD_PART_BYTES,
+        "parts": parts,
+    })
+
+
+def handle_upload_complete(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Complete a multipart upload from the part ETags returned by S3"""
+    body = json.loads(event.get("body") or "{}")
+    dataset_id = body.get("datasetId")
+    file_name = (body.get("fileName") or "upload.geojson").split("/")[-1]
+    upload_id = body.get("uploadId")
+    parts = body.get("parts") or []
+
+    if not dataset_id or not upload_id or not parts:
+        return error_response(400, "Missing datasetId, uploadId or parts")
+    if not s3 or not INPUT_BUCKET:
+        return error_response(500, "S3 not configured")
+
+    try:
+        s3.complete_multipart_upload(
+            Bucket=INPUT_BUCKET,
+            Key=_upload_key(dataset_id, file_name),
+            UploadId=upload_id,
+            MultipartUpload={
+                "Parts": sorted(
+                    ({"PartNumber": int(p["partNumber"]), "ETag": p["eTag"]} for p in parts),
+                    key=lambda p: p["PartNumber"],
+                )
+            },
+        )
+    except (KeyError, TypeError, ValueError):
+        return error_response(400, "Each part needs partNumber and eTag")
+    except s3.exceptions.NoSuchUpload:
+        return error_response(404, "Upload not found")
+
+    # The S3 CompleteMultipartUpload event triggers ingest
+    return cors_response({
+        "datasetId": dataset_id,
+        "status": "PENDING",
+        "message": "File uploaded successfully"
+    })
+
+
+def _upload_inline(dataset_id: Optional[str], file_name: str, file_type: str, file_content: str) -> Dict[str, Any]:
+    if not dataset_id or not file_content:
+        return error_response(400, "Missing datasetId or fileContent")
+
+    try:
+        file_bytes = base64.b64decode(file_content)
+    except ValueError:
+        return error_response(400, "fileContent is not valid base64")
+    limit = min(MAX_FILE_SIZE, MAX_INLINE_UPLOAD_BYTES)
+    if len(file_bytes) > limit:
+        return error_response(
+            413, f"File too large for an inline upload (max {limit} bytes); send fileSize for a multipart upload"
+        )
+
+    # Record the job first: the upload triggers ingest, whose writes must win
+    _put_pending_job(dataset_id, file_name, file_type)
+
     # Upload to S3
-    key = f"ingest/{dataset_id}/{file_name}"
     s3.put_object(
         Bucket=INPUT_BUCKET,
-        Key=key,
+        Key=_upload_key(dataset_id, file_name),
         Body=file_bytes,
-        ContentType="application/json" if file_type == "geojson" else "image/tiff"
+        ContentType=_content_type(file_type),
     )
     
-    # Create DynamoDB record
-    if table:
-        try:
-            table.put_item(
-                Item={
-                    "datasetId": dataset_id,
-                    "status": "PENDING",
-                    "fileName": file_name,
-                    "fileType": file_type,
-                    "createdAt": datetime.utcnow().isoformat(),
-                    "updatedAt": datetime.utcnow().isoformat(),
-                }
-            )
-        except Exception as e:
-            print(f"Error writing to DynamoDB: {e}")
-    
     # Note: S3 event will trigger ingest Lambda which starts Step Functions
     
     return cors_response({
@@ -91,66 +230,363 @@ def handle_upload(event: Dict[str, Any]) -> Dict[str, Any]:
     })
 
 
-def handle_status(dataset_id: str) -> Dict[str, Any]:
-    """Get job status from DynamoDB"""
+def _upload_key(dataset_id: str, file_name: str) -> str:
+    return f"ingest/{dataset_id}/{file_name}"
+
+
+def _content_type(file_type: str) -> str:
+    return "application/json" if file_type == "geojson" else "image/tiff"
+
+
+def _put_pending_job(dataset_id: str, file_name: str, file_type: str) -> None:
+    # Create DynamoDB record
+    if table:
+        try:
+            put_job(table, dataset_id, "PENDING", fileName=file_name, fileType=file_type)
+            status_cache.invalidate(dataset_id)
+        except Exception as e:
+            print(f"Error writing to DynamoDB: {e}")
+
+
+def handle_status(
+    dataset_id: str,
+    query: Optional[Dict[str, str]] = None,
+    headers: Optional[Dict[str, str]] = None,
+    context: Any = None,
+) -> Dict[str, Any]:
+    """Get job status, read through the status cache.
+
+    Responses carry an ETag derived from the job's version. A request whose
+    If-None-Match still matches gets 304 with no body. With wait=N it is
+    held for up to N seconds first, re-reading only the version, and
+    answered as soon as the job changes.
+    """
     if not table:
         return error_response(500, "DynamoDB not configured")
-    
+
+    try:
+        wait = min(max(float((query or {}).get("wait") or 0), 0.0), MAX_STATUS_WAIT_SECONDS)
+    except ValueError:
+        return error_response(400, "wait must be a number of seconds")
+    if_none_match = next(
+        (v for k, v in (headers or {}).items() if k.lower() == "if-none-match"), None
+    )
+
     try:
-        response = table.get_item(Key={"datasetId": dataset_id})
-        
-        if "Item" not in response:
+        item = status_cache.get(
+            dataset_id,
+            lambda: table.get_item(Key={"datasetId": dataset_id}).get("Item"),
+        )
+        if item is None:
             return error_response(404, "Job not found")
-        
-        item = response["Item"]
-        
-        # Extract result and ensure it's properly formatted
-        result = item.get("result")
-        if result and isinstance(result, dict):
-            # Ensure result structure is clean for frontend
-            # Handle nested summary if needed
-            if "summary" in result and isinstance(result["summary"], dict):
-                # Result already has summary, use as is
-                pass
-            elif "M" in result and "summary" in result["M"]:
-                # DynamoDB format - convert
-                import json
-                result = json.loads(json.dumps(result, default=str))
-        
-        return cors_response({
-            "datasetId": dataset_id,
-            "status": item.get("status", "UNKNOWN"),
-            "fileName": item.get("fileName"),
-            "fileType": item.get("fileType"),
-            "createdAt": item.get("createdAt"),
-            "updatedAt": item.get("updatedAt"),
-            "result": result,
-            "error": item.get("error"),
-        })
+
+        etag = _status_etag(item)
+        if if_none_match and _etag_matches(if_none_match, etag):
+            # Waiting re-reads DynamoDB directly; the cache may be up to a TTL behind
+            item = _wait_for_change(dataset_id, item, etag, wait, context)
+            if item is None:
+                return not_modified_response(etag)
+            item = status_cache.put(dataset_id, item)
+            etag = _status_etag(item)
+
+        response = cors_response(job_view(item))
+        response["headers"]["ETag"] = etag
+        response["headers"]["Access-Control-Expose-Headers"] = "ETag"
+        response["headers"]["Cache-Control"] = "no-cache"
+        return response
     except Exception as e:
         return error_response(500, f"Error querying DynamoDB: {str(e)}")
 
 
-def handle_list_jobs() -> Dict[str, Any]:
-    """List all jobs from DynamoDB"""
+def _status_etag(item: Dict[str, Any]) -> str:
+    if item.get("version") is not None:
+        return f'"v{int(item["version"])}"'
+    # Items written before versioning
+    return f'"{item.get("updatedAt", "")}"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in (t[2:] if t.startswith("W/") else t for t in tags)
+
+
+def _wait_for_change(
+    dataset_id: str, item: Dict[str, Any], etag: str, wait: float, context: Any
+) -> Optional[Dict[str, Any]]:
+    """Poll the job's version until it differs from etag; return the new item or None"""
+    if item.get("status") in TERMINAL_STATUSES:
+        return None
+    deadline = time.monotonic() + wait
+    if context is not None:
+        deadline = min(deadline, time.monotonic() + context.get_remaining_time_in_millis() / 1000 - 1)
+    delay = 0.25
+    while time.monotonic() + delay < deadline:
+        time.sleep(delay)
+        delay = min(delay * 2, STATUS_WAIT_MAX_DELAY_SECONDS)
+        head = _read_head(dataset_id)
+        if head is None or _status_etag(head) != etag:
+            return table.get_item(Key={"datasetId": dataset_id}).get("Item") or item
+    return None
+
+
+def _read_head(dataset_id: str) -> Optional[Dict[str, Any]]:
+    """Read only the job's version and updatedAt"""
+    return table.get_item(
+        Key={"datasetId": dataset_id},
+        ProjectionExpression="#version, updatedAt",
+        ExpressionAttributeNames={"#version": "version"},
+    ).get("Item")
+
+
+def handle_list_jobs(query: Dict[str, str]) -> Dict[str, Any]:
+    """List jobs newest first, one page at a time.
+
+    Each status is a partition of the (status, createdAt) index, so a page
+    queries at most one page per requested status, newest first, and merges
+    them. The cursor records where each status left off. Cost depends on the
+    page size, not on the table size.
+    """
     if not table:
         return error_response(500, "DynamoDB not configured")
-    
+
+    statuses = [s for s in (query.get("status") or "").upper().split(",") if s] or list(JOB_STATUSES)
+    if any(s not in JOB_STATUSES for s in statuses):
+        return error_response(400, f"status must be one of {', '.join(JOB_STATUSES)}")
+    since = query.get("since")
+    until = query.get("until")
+    try:
+        limit = int(query.get("limit") or DEFAULT_JOBS_LIMIT)
+        for bound in (since, until):
+            if bound:
+                datetime.fromisoformat(bound)
+        starts = _decode_jobs_cursor(query.get("cursor"), statuses)
+    except ValueError:
+        return error_response(400, "limit must be an integer, since/until ISO 8601 times and cursor from a previous page")
+    if limit < 1:
+        return error_response(400, "limit must be positive")
+    limit = min(limit, MAX_JOBS_LIMIT)
+
+    # Pages are cached briefly under their normalised query
+    cache_key = "jobs?" + json.dumps(
+        [sorted(statuses), since, until, limit, query.get("cursor")], separators=(",", ":")
+    )
     try:
-        response = table.scan()
-        jobs = [
-            {
-                "datasetId": item.get("datasetId"),
-                "status": item.get("status"),
-                "fileName": item.get("fileName"),
-                "createdAt": item.get("createdAt"),
-            }
-            for item in response.get("Items", [])
-        ]
-        
-        return cors_response({"jobs": jobs})
+        page = status_cache.get(cache_key, lambda: _query_jobs_page(statuses, since, until, limit, starts))
     except Exception as e:
-        return error_response(500, f"Error scanning DynamoDB: {str(e)}")
+        return error_response(500, f"Error querying DynamoDB: {str(e)}")
+    return cors_response(page)
+
+
+def _query_jobs_page(
+    statuses: List[str],
+    since: Optional[str],
+    until: Optional[str],
+    limit: int,
+    starts: Dict[str, Optional[Dict[str, Any]]],
+) -> Dict[str, Any]:
+    condition = None
+    if since and until:
+        condition = Key("createdAt").between(since, until)
+    elif since:
+        condition = Key("createdAt").gte(since)
+    elif until:
+        condition = Key("createdAt").lte(until)
+
+    pages: Dict[str, Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]] = {}
+    for status, start in starts.items():
+        key_condition = Key("status").eq(status)
+        kwargs = {
+            "IndexName": JOBS_STATUS_INDEX,
+            "KeyConditionExpression": key_condition & condition if condition else key_condition,
+            "ScanIndexForward": False,
+            "Limit": limit,
+        }
+        if start:
+            kwargs["ExclusiveStartKey"] = start
+        response = table.query(**kwargs)
+        pages[status] = (response.get("Items", []), response.get("LastEvaluatedKey"))
+
+    # Merge the per-status pages newest first
+    taken = {status: 0 for status in pages}
+    items = []
+    while len(items) < limit:
+        best = None
+        for status, (page, _) in pages.items():
+            k = taken[status]
+            if k < len(page) and (
+                best is None or page[k].get("createdAt", "") > pages[best][0][taken[best]].get("createdAt", "")
+            ):
+                best = status
+        if best is None:
+            break
+        items.append(pages[best][0][taken[best]])
+        taken[best] += 1
+
+    # Resume each status after the last item this page used from it
+    next_starts: Dict[str, Optional[Dict[str, Any]]] = {}
+    for status, (page, last_key) in pages.items():
+        k = taken[status]
+        if k < len(page):
+            next_starts[status] = _jobs_index_key(page[k - 1]) if k else starts[status]
+        elif last_key:
+            next_starts[status] = _jobs_index_key(page[-1]) if page else last_key
+
+    jobs = [
+        {
+            "datasetId": item.get("datasetId"),
+            "status": item.get("status"),
+            "fileName": item.get("fileName"),
+            "fileType": item.get("fileType"),
+            "createdAt": item.get("createdAt"),
+            "updatedAt": item.get("updatedAt"),
+        }
+        for item in items
+    ]
+    return {
+        "jobs": jobs,
+        "next": _encode_jobs_cursor(next_starts) if next_starts else None,
+    }
+
+
+def _flush_cache_metrics() -> None:
+    """Record status cache hit/miss counts at most once a minute per container"""
+    global _cache_metrics_flushed_at
+    if time.monotonic() - _cache_metrics_flushed_at < STATUS_CACHE_METRICS_SECONDS:
+        return
+    _cache_metrics_flushed_at = time.monotonic()
+    stats = status_cache.take_stats()
+    if not any(stats.values()):
+        return
+    put_metric("SGAF/Api", "StatusCacheHits", stats["localHits"], dimensions={"Tier": "local"})
+    put_metric("SGAF/Api", "StatusCacheHits", stats["sharedHits"], dimensions={"Tier": "shared"})
+    put_metric("SGAF/Api", "StatusCacheMisses", stats["misses"])
+    put_metric("SGAF/Api", "StatusCacheErrors", stats["sharedErrors"])
+
+
+def _jobs_index_key(item: Dict[str, Any]) -> Dict[str, Any]:
+    return {"datasetId": item["datasetId"], "status": item["status"], "createdAt": item["createdAt"]}
+
+
+def _encode_jobs_cursor(starts: Dict[str, Optional[Dict[str, Any]]]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(starts, separators=(",", ":")).encode("utf-8")).decode("ascii")
+
+
+def _decode_jobs_cursor(cursor: Optional[str], statuses: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Per-status start keys; a status missing from a cursor has no more jobs"""
+    if not cursor:
+        return {status: None for status in statuses}
+    try:
+        starts = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (binascii.Error, UnicodeError, json.JSONDecodeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(starts, dict):
+        raise ValueError("Invalid cursor")
+    return {status: starts[status] for status in statuses if status in starts}
+
+
+def handle_features(dataset_id: str, query: Dict[str, str]) -> Dict[str, Any]:
+    """Return features intersecting a bbox as a paginated GeoJSON FeatureCollection.
+
+    Answered from the dataset's packed R-tree with ranged reads: the upper
+    index levels, the index nodes on the path to this page's hits, and the
+    hits' bytes in the source object. Cost depends on the page size, not on
+    the dataset size. The cursor is the index of the next leaf to consider.
+    """
+    if not s3 or not OUTPUT_BUCKET or not INPUT_BUCKET:
+        return error_response(500, "S3 not configured")
+
+    try:
+        bbox = [float(v) for v in (query.get("bbox") or "").split(",")]
+        limit = int(query.get("limit") or DEFAULT_FEATURE_LIMIT)
+        cursor = int(query.get("cursor") or 0)
+    except ValueError:
+        return error_response(400, "bbox must be minx,miny,maxx,maxy; limit and cursor must be integers")
+    if len(bbox) != 4 or bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+        return error_response(400, "bbox must be minx,miny,maxx,maxy")
+    if limit < 1 or cursor < 0:
+        return error_response(400, "limit must be positive and cursor non-negative")
+    limit = min(limit, MAX_FEATURE_LIMIT)
+
+    try:
+        manifest = json.loads(
+            s3.get_object(Bucket=OUTPUT_BUCKET, Key=manifest_key(dataset_id))["Body"].read()
+        )
+    except s3.exceptions.NoSuchKey:
+        return error_response(404, "Dataset not found")
+    index = manifest.get("spatialIndex")
+    if not index:
+        return error_response(404, "Dataset has no spatial index")
+
+    read_nodes, node_size, num_items = _open_index(index["key"])
+    hits: List[Tuple[int, int]] = []
+    page_bytes = 0
+    next_cursor: Optional[int] = None
+    for leaf, item in rtree.search(read_nodes, node_size, num_items, bbox, cursor):
+        if len(hits) >= limit or (hits and page_bytes + item[5] > MAX_FEATURE_PAGE_BYTES):
+            next_cursor = leaf
+            break
+        hits.append((item[4], item[5]))
+        page_bytes += item[5]
+
+    try:
+        features = _read_features(index.get("objectKey") or "", hits, index.get("eTag"))
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") != "PreconditionFailed":
+            raise
+        # The source object was replaced after the index was built
+        return error_response(409, "Spatial index is stale; the source object has changed")
+    body = (
+        '{"type":"FeatureCollection","features":['
+        + ",".join(features)
+        + '],"numberReturned":' + str(len(features))
+        + ',"next":' + json.dumps(str(next_cursor) if next_cursor is not None else None)
+        + "}"
+    )
+    response = cors_response({})
+    response["headers"]["Content-Type"] = "application/geo+json"
+    response["body"] = body
+    return response
+
+
+def _open_index(key: str) -> Tuple[Any, int, int]:
+    """Fetch the index head once and serve node reads from it where possible"""
+    head = _get_range(OUTPUT_BUCKET, key, 0, INDEX_PREFETCH_BYTES)
+    node_size, num_items, _ = rtree.parse_header(head)
+
+    def read_nodes(first: int, count: int) -> bytes:
+        start, end = rtree.node_range(first, count)
+        if end <= len(head):
+            return head[start:end]
+        return _get_range(OUTPUT_BUCKET, key, start, end - start)
+
+    return read_nodes, node_size, num_items
+
+
+def _read_features(object_key: str, hits: List[Tuple[int, int]], etag: Optional[str] = None) -> List[str]:
+    """Ranged reads of the hit features' raw bytes, coalescing nearby spans.
+
+    With etag, reads fail with PreconditionFailed if the object was replaced.
+    """
+    out: Dict[int, str] = {}
+    group: List[Tuple[int, int]] = []
+    for span in sorted(hits) + [None]:
+        if group and (span is None or span[0] - (group[-1][0] + group[-1][1]) > FEATURE_COALESCE_GAP_BYTES):
+            start = group[0][0]
+            data = _get_range(INPUT_BUCKET, object_key, start, group[-1][0] + group[-1][1] - start, etag)
+            for offset, length in group:
+                out[offset] = data[offset - start:offset - start + length].decode("utf-8")
+            group = []
+        if span is not None:
+            group.append(span)
+    # Keep the index (Hilbert) order of the page
+    return [out[offset] for offset, _ in hits]
+
+
+def _get_range(bucket: str, key: str, offset: int, length: int, etag: Optional[str] = None) -> bytes:
+    params = {"Bucket": bucket, "Key": key, "Range": f"bytes={offset}-{offset + length - 1}"}
+    if etag:
+        params["IfMatch"] = etag
+    return s3.get_object(**params)["Body"].read()
 
 
 def error_response(status_code: int, message: str) -> Dict[str, Any]:
@@ -166,6 +602,19 @@ def error_response(status_code: int, message: str) -> Dict[str, Any]:
     }
 
 
+def not_modified_response(etag: str) -> Dict[str, Any]:
+    return {
+        "statusCode": 304,
+        "headers": {
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Expose-Headers": "ETag",
+            "ETag": etag,
+            "Cache-Control": "no-cache",
+        },
+        "body": "",
+    }
+
+
 def cors_response(data: Dict[str, Any]) -> Dict[str, Any]:
     return {
         "statusCode": 200,
@@ -212,7 +212,7 @@ ERROR INFORMATION:
 TROUBLESHOOTING:
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
   1. Check CloudWatch Logs for detailed error information
-  2. Verify input file format and size (max 1MB)
+  2. Verify input file format and size (max 256MB)
   3. Review Step Functions execution history
   4. Check SQS Dead Letter Queue for failed messages
   5. Contact system administrator if issue persists
@@ -1,39 +1,244 @@
+import hashlib
 import json
+import math
 import os
 import re
-from typing import List, Dict, Any
-from datetime import datetime
+import sys
+from array import array
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+from urllib.parse import unquote_plus
 
 import boto3
 
-MAX_FILE_SIZE = int(os.environ.get("MAX_FILE_SIZE_BYTES", "1048576"))
-MAX_ITEMS = int(os.environ.get("MAX_ITEMS", "3"))
+from sgaf_core import cache as result_cache
+from sgaf_core.geojson import FeatureScanner
+from sgaf_core.geotiff import TiffReader, block_count
+from sgaf_core.status import put_job, update_job_status
+from sgaf_core.spatial import feature_center, kd_tree, locate_cell
+
+MAX_FILE_SIZE = int(os.environ.get("MAX_FILE_SIZE_BYTES", "268435456"))
+MAX_ITEMS = int(os.environ.get("MAX_ITEMS", "32"))
+TARGET_SHARD_BYTES = int(os.environ.get("TARGET_SHARD_BYTES", "8388608"))
+MIN_SHARD_FEATURES = int(os.environ.get("MIN_SHARD_FEATURES", "1000"))
+# Plans with at least this many tiles use the Distributed Map (0 disables it)
+DISTRIBUTED_MAP_MIN_TILES = int(os.environ.get("DISTRIBUTED_MAP_MIN_TILES", "0"))
+CHUNK_SIZE = int(os.environ.get("STREAM_CHUNK_BYTES", "65536"))
+# "contiguous" splits the feature index into byte ranges; "spatial" assigns
+# features to balanced grid cells so tiles are spatially coherent
+SHARDING_MODE = os.environ.get("SHARDING_MODE", "contiguous")
+SPATIAL_SAMPLE_SIZE = int(os.environ.get("SPATIAL_SAMPLE_SIZE", "10000"))
+# Cut contiguous tiles at content-defined feature boundaries and hash them, so
+# process can reuse cached results for tiles an edit did not touch
+TILE_CACHE = os.environ.get("TILE_CACHE", "true").lower() == "true"
+# Process options that shape the outputs; part of the result cache key
+SPATIAL_INDEX = os.environ.get("SPATIAL_INDEX", "true").lower() == "true"
+COLUMNAR_OUTPUT = os.environ.get("COLUMNAR_OUTPUT", "true").lower() == "true"
+STAGE_TIMINGS = os.environ.get("STAGE_TIMINGS", "false").lower() == "true"
+RASTER_HISTOGRAM_BINS = int(os.environ.get("RASTER_HISTOGRAM_BINS", "256"))
+RASTER_HISTOGRAM_RANGE = os.environ.get("RASTER_HISTOGRAM_RANGE", "")
 INPUT_BUCKET = os.environ["INPUT_BUCKET"]
+OUTPUT_BUCKET = os.environ.get("OUTPUT_BUCKET", "")
 STATE_MACHINE_ARN = os.environ["STATE_MACHINE_ARN"]
+# Single-tile jobs up to this size run on the Express state machine
+EXPRESS_STATE_MACHINE_ARN = os.environ.get("EXPRESS_STATE_MACHINE_ARN", "")
+FAST_PATH_MAX_BYTES = int(os.environ.get("FAST_PATH_MAX_BYTES", "262144"))
+# Objects up to PACK_MAX_BYTES that arrive in the same batch share process
+# invocations, up to PACK_MAX_FILES per work item
+PACK_SMALL_FILES = os.environ.get("PACK_SMALL_FILES", "true").lower() == "true"
+PACK_MAX_BYTES = int(os.environ.get("PACK_MAX_BYTES", "262144"))
+PACK_MAX_FILES = int(os.environ.get("PACK_MAX_FILES", "25"))
 DYNAMODB_TABLE = os.environ.get("DYNAMODB_TABLE", "")
+# Reuse completed results for byte-identical uploads (see sgaf_core.cache)
+RESULT_CACHE = os.environ.get("RESULT_CACHE", "true").lower() == "true"
+RESULT_CACHE_TTL_DAYS = int(os.environ.get("RESULT_CACHE_TTL_DAYS", "3"))
+# SQS batches only index an object in-line while the invocation has time for
+# it at this rate; the rest are sent back to INGEST_QUEUE_URL
+INDEX_BYTES_PER_SECOND = int(os.environ.get("INDEX_BYTES_PER_SECOND", "5000000"))
+INGEST_RESERVE_SECONDS = 15
+INGEST_QUEUE_URL = os.environ.get("INGEST_QUEUE_URL", "")
 
+s3 = boto3.client("s3")
 sfn = boto3.client("stepfunctions")
+sqs = boto3.client("sqs") if INGEST_QUEUE_URL else None
 dynamodb = boto3.resource("dynamodb")
 table = dynamodb.Table(DYNAMODB_TABLE) if DYNAMODB_TABLE else None
 
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
-    # Expect S3 event; validate size and start state machine with tiny work plan
+    """Start processing for every object in an S3 event or an SQS batch of them.
+
+    Objects that fit on the fast path are packed into shared executions when
+    a batch holds more than one of them. For SQS batches, messages whose
+    objects fail are reported back so only they are retried, and objects
+    that would not finish indexing in the remaining time are deferred.
+    Executions are named after the upload, so a redelivered message never
+    starts or restarts a job twice.
+    """
     if "Records" not in event:
         raise Exception("Expected S3 event Records")
 
-    rec = event["Records"][0]
-    key = rec["s3"]["object"]["key"]
-    size = int(rec["s3"]["object"].get("size", "0"))
+    jobs: List[Dict[str, Any]] = []
+    packable: List[Tuple[Optional[str], Dict[str, Any]]] = []
+    failed: List[Optional[str]] = []
+    records = list(_iter_s3_records(event["Records"]))
+    for message_id, rec in records:
+        try:
+            obj = _parse_record(rec)
+            if len(records) > 1 and _is_packable(obj):
+                started = _started_job(obj)
+                cached = _try_cache(obj) if started is None else started
+                if cached is not None:
+                    jobs.append(cached)
+                else:
+                    packable.append((message_id, obj))
+            elif len(records) > 1 and not _has_time_for(obj, context):
+                if not _defer(rec):
+                    failed.append(message_id)
+            else:
+                jobs.append(_ingest_object(obj))
+        except Exception as e:
+            print(f"Error ingesting {rec.get('s3', {}).get('object', {}).get('key')}: {e}")
+            failed.append(message_id)
+
+    for group in _chunks(_pack_objects(packable), MAX_ITEMS):
+        try:
+            if len(group) == 1 and len(group[0]) == 1:
+                # Nothing to share an execution with
+                jobs.append(_ingest_object(group[0][0][1]))
+            else:
+                jobs.append(_ingest_packed([[obj for _, obj in pack] for pack in group]))
+        except Exception as e:
+            print(f"Error starting execution for {sum(len(pack) for pack in group)} object(s): {e}")
+            failed.extend(message_id for pack in group for message_id, _ in pack)
+
+    if any(message_id is not None for message_id, _ in records):
+        # SQS event source with ReportBatchItemFailures
+        return {
+            "jobs": jobs,
+            "batchItemFailures": [{"itemIdentifier": m} for m in dict.fromkeys(failed)],
+        }
+    if failed:
+        raise Exception(f"{len(failed)} of {len(records)} object(s) failed to ingest")
+    return jobs[0] if len(records) == 1 else {"jobs": jobs}
+
+
+def _has_time_for(obj: Dict[str, Any], context: Any) -> bool:
+    if context is None:
+        return True
+    needed = obj["size"] / max(1, INDEX_BYTES_PER_SECOND) + INGEST_RESERVE_SECONDS
+    return context.get_remaining_time_in_millis() / 1000 >= needed
+
+
+def _defer(rec: Dict[str, Any]) -> bool:
+    """Send an S3 record back to the ingest queue as a new message.
+
+    Returning a deferred message as a batch item failure would count against
+    its receive limit and could move it to the dead letter queue.
+    """
+    if sqs is None:
+        return False
+    sqs.send_message(QueueUrl=INGEST_QUEUE_URL, MessageBody=json.dumps({"Records": [rec]}))
+    return True
+
+
+def _iter_s3_records(records: List[Dict[str, Any]]) -> Iterator[Tuple[Optional[str], Dict[str, Any]]]:
+    """Yield (SQS message ID, S3 record) from direct S3 or SQS-buffered events"""
+    for rec in records:
+        if rec.get("eventSource") == "aws:sqs":
+            body = json.loads(rec.get("body") or "{}")
+            # s3:TestEvent messages sent when the notification is created have no Records
+            for inner in body.get("Records", []):
+                yield rec["messageId"], inner
+        else:
+            yield None, rec
+
 
+def _parse_record(rec: Dict[str, Any]) -> Dict[str, Any]:
+    # Object keys in S3 event notifications are URL encoded
+    key = unquote_plus(rec["s3"]["object"]["key"])
+    size = int(rec["s3"]["object"].get("size", "0"))
     if size > MAX_FILE_SIZE:
         raise Exception(f"File too large: {size} > {MAX_FILE_SIZE}")
-
+    file_type = "geotiff" if _is_geotiff(key) else "geojson"
+    etag = rec["s3"]["object"].get("eTag")
     dataset_id = _derive_dataset_id(key)
+    return {
+        "datasetId": dataset_id,
+        "key": key,
+        "size": size,
+        "eTag": etag,
+        # The sequencer differs for every write of a key, even with equal bytes
+        "executionName": _execution_name(dataset_id, etag, rec["s3"]["object"].get("sequencer")),
+        "fileType": file_type,
+        "cacheKey": _result_cache_key(file_type, size, etag),
+    }
+
+
+def _is_packable(obj: Dict[str, Any]) -> bool:
+    return PACK_SMALL_FILES and obj["size"] <= min(PACK_MAX_BYTES, TARGET_SHARD_BYTES)
+
+
+def _try_cache(obj: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    if not obj["cacheKey"]:
+        return None
+    return _serve_from_cache(obj["datasetId"], obj["key"], obj["fileType"], obj["cacheKey"])
+
+
+def _ingest_object(obj: Dict[str, Any]) -> Dict[str, Any]:
+    """Plan one object's tiles and start its execution"""
+    dataset_id = obj["datasetId"]
+    key = obj["key"]
+    size = obj["size"]
+    etag = obj["eTag"]
+    file_type = obj["fileType"]
+    cache_key = obj["cacheKey"]
+
+    existing = _existing_execution(obj["executionName"])
+    if existing:
+        # Redelivered event: the job was already started; leave it alone
+        return {"executionArn": existing, "datasetId": dataset_id}
+
+    cached = _try_cache(obj)
+    if cached is not None:
+        return cached
+
     # Include objectKey so process workers can read the GeoJSON from S3
     # Include numTiles to coordinate sharding logic
-    num_tiles = min(MAX_ITEMS, 3)
-    work_items = _derive_work_items(dataset_id, key, num_tiles)
+    plan = _plan_shards(size)
+
+    # Index feature boundaries once so each tile can range-read its own slice;
+    # single-tile jobs stream the whole object and skip the index pass
+    spans = None
+    cells = None
+    cell_ranges = None
+    groups = None
+    hashes = None
+    if _is_geotiff(key) and plan["numTiles"] > 1:
+        # Never plan tiles that would own no internal tile or strip
+        plan = _plan_shards(size, block_count=_geotiff_block_count(key, etag))
+    elif plan["numTiles"] > 1:
+        spatial = SHARDING_MODE == "spatial"
+        spans, samples, digests, centers = _build_feature_index(
+            dataset_id, key, size, etag, sample=spatial, digest=TILE_CACHE and not spatial
+        )
+        plan = _plan_shards(size, len(spans))
+        if spatial and plan["numTiles"] > 1:
+            cells, root = kd_tree(samples, plan["numTiles"])
+            plan["sharding"] = "spatial"
+            plan["sampledFeatures"] = len(samples)
+            if OUTPUT_BUCKET:
+                # Each tile range-reads only the features in its cell
+                cell_ranges = _write_cell_spans(dataset_id, spans, centers, root, plan["numTiles"])
+        elif digests is not None and plan["numTiles"] > 1:
+            groups = _split_spans_by_content(spans, digests, plan["numTiles"])
+            hashes = [_tile_hash(spans, digests, first, last) for first, last in groups]
+            plan["numTiles"] = len(groups)
+            plan["mode"] = "inline" if len(groups) == 1 else "map"
+            plan["sharding"] = "content"
+    num_tiles = plan["numTiles"]
+    work_items = _derive_work_items(
+        dataset_id, key, num_tiles, spans, etag, cells, groups, hashes, cell_ranges
+    )
 
     input_payload = {
         "datasetId": dataset_id,
@@ -41,35 +246,262 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         "workItems": work_items,
         "numTiles": num_tiles,
     }
+    distributed = bool(DISTRIBUTED_MAP_MIN_TILES and num_tiles >= DISTRIBUTED_MAP_MIN_TILES and OUTPUT_BUCKET)
+    if distributed:
+        plan["mode"] = "distributed"
 
-    response = sfn.start_execution(
-        stateMachineArn=STATE_MACHINE_ARN,
-        input=json.dumps(input_payload),
-    )
+    state_machine_arn = STATE_MACHINE_ARN
+    if EXPRESS_STATE_MACHINE_ARN and num_tiles == 1 and size <= FAST_PATH_MAX_BYTES:
+        state_machine_arn = EXPRESS_STATE_MACHINE_ARN
+        plan["mode"] = "express"
 
-    # Update DynamoDB with job status
+    # Record the job before starting the execution: aggregate writes the
+    # terminal status itself and may finish before this Lambda returns
+    job_version = None
     if table:
         try:
-            # Determine file type
-            file_type = "geojson"
-            if key.lower().endswith((".tif", ".tiff", ".geotiff")):
-                file_type = "geotiff"
-            
-            table.put_item(
-                Item={
-                    "datasetId": dataset_id,
-                    "status": "PROCESSING",
-                    "fileName": key.split("/")[-1],
-                    "fileType": file_type,
-                    "executionArn": response.get("executionArn"),
-                    "createdAt": datetime.utcnow().isoformat(),
-                    "updatedAt": datetime.utcnow().isoformat(),
-                }
+            job_version = _put_job(dataset_id, key, file_type, plan, obj["executionName"])
+        except Exception:
+            pass  # Non-blocking
+
+    # Echoed by process so aggregate can record the completed result, and
+    # write it only over the job version this run started
+    for item in work_items:
+        if cache_key:
+            item["cacheKey"] = cache_key
+        if job_version is not None:
+            item["jobVersion"] = job_version
+    if job_version is not None:
+        # Read by MarkJobFailed
+        input_payload["jobVersion"] = job_version
+    if distributed:
+        # Too many items for the execution input; the Distributed Map reads them from S3
+        input_payload["workItemsKey"] = _write_work_items(dataset_id, work_items)
+        del input_payload["workItems"]
+
+    execution_arn = _start_execution(state_machine_arn, obj["executionName"], input_payload)
+    _set_execution_arn([dataset_id], execution_arn)
+
+    return {"executionArn": execution_arn, "datasetId": dataset_id}
+
+
+def _pack_objects(
+    objects: List[Tuple[Optional[str], Dict[str, Any]]]
+) -> List[List[Tuple[Optional[str], Dict[str, Any]]]]:
+    """Group small objects into packs of at most PACK_MAX_FILES files and
+    TARGET_SHARD_BYTES bytes; each pack is one process invocation"""
+    packs: List[List[Tuple[Optional[str], Dict[str, Any]]]] = []
+    acc = 0
+    for item in objects:
+        size = item[1]["size"]
+        if not packs or len(packs[-1]) >= PACK_MAX_FILES or acc + size > TARGET_SHARD_BYTES:
+            packs.append([])
+            acc = 0
+        packs[-1].append(item)
+        acc += size
+    return packs
+
+
+def _chunks(items: List[Any], size: int) -> Iterator[List[Any]]:
+    for start in range(0, len(items), max(1, size)):
+        yield items[start:start + max(1, size)]
+
+
+def _ingest_packed(packs: List[List[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Start one execution over packs of small objects.
+
+    Every object keeps its own dataset, single-tile work item, manifest and
+    job record; the packs only share process invocations and the execution.
+    Aggregate splits the results by dataset again.
+    """
+    dataset_ids = [obj["datasetId"] for pack in packs for obj in pack]
+    names = "\n".join(obj["executionName"] for pack in packs for obj in pack)
+    batch_id = "batch-" + hashlib.sha256(names.encode("utf-8")).hexdigest()[:16]
+    existing = _existing_execution(batch_id)
+    if existing:
+        return {"executionArn": existing, "datasetId": batch_id, "datasetIds": dataset_ids}
+    total = sum(obj["size"] for pack in packs for obj in pack)
+    state_machine_arn = STATE_MACHINE_ARN
+    mode = "packed"
+    if EXPRESS_STATE_MACHINE_ARN and len(packs) == 1 and total <= FAST_PATH_MAX_BYTES:
+        state_machine_arn = EXPRESS_STATE_MACHINE_ARN
+        mode = "packed-express"
+
+    job_versions: Dict[str, int] = {}
+    if table:
+        for pack in packs:
+            for obj in pack:
+                try:
+                    plan = _plan_shards(obj["size"])
+                    plan.update({"mode": mode, "batchId": batch_id, "packedFiles": len(pack)})
+                    version = _put_job(obj["datasetId"], obj["key"], obj["fileType"], plan, obj["executionName"])
+                    if version is not None:
+                        job_versions[obj["datasetId"]] = version
+                except Exception:
+                    pass  # Non-blocking
+
+    work_items = []
+    for pack in packs:
+        batch = []
+        for obj in pack:
+            item = _derive_work_items(obj["datasetId"], obj["key"], 1, etag=obj["eTag"])[0]
+            if obj["cacheKey"]:
+                item["cacheKey"] = obj["cacheKey"]
+            if obj["datasetId"] in job_versions:
+                item["jobVersion"] = job_versions[obj["datasetId"]]
+            batch.append(item)
+        work_items.append({"batchId": batch_id, "batch": batch})
+
+    execution_arn = _start_execution(state_machine_arn, batch_id, {
+        "datasetId": batch_id,
+        "datasetIds": dataset_ids,
+        "jobVersions": job_versions,
+        "workItems": work_items,
+        "numTiles": len(work_items),
+    })
+    _set_execution_arn(dataset_ids, execution_arn)
+    return {"executionArn": execution_arn, "datasetId": batch_id, "datasetIds": dataset_ids}
+
+
+def _execution_name(*parts: Optional[str]) -> str:
+    """Step Functions execution name (at most 80 of [A-Za-z0-9_-]) for an upload"""
+    name = re.sub(r"[^A-Za-z0-9_-]", "-", "-".join(p.strip('"') for p in parts if p))
+    if len(name) > 80:
+        name = name[:63] + "-" + hashlib.sha256(name.encode("utf-8")).hexdigest()[:16]
+    return name
+
+
+def _existing_execution(name: str) -> Optional[str]:
+    """ARN of the Standard execution with this name, if one was started.
+
+    Express executions cannot be described; they only run small files, so a
+    redelivered one simply runs again.
+    """
+    arn = _execution_arn(STATE_MACHINE_ARN, name)
+    try:
+        sfn.describe_execution(executionArn=arn)
+    except sfn.exceptions.ExecutionDoesNotExist:
+        return None
+    return arn
+
+
+def _start_execution(state_machine_arn: str, name: str, payload: Dict[str, Any]) -> str:
+    try:
+        response = sfn.start_execution(
+            stateMachineArn=state_machine_arn,
+            name=name,
+            input=json.dumps(payload),
+        )
+        return response["executionArn"]
+    except sfn.exceptions.ExecutionAlreadyExists:
+        # Started by an earlier delivery of the same event
+        return _execution_arn(state_machine_arn, name)
+
+
+def _execution_arn(state_machine_arn: str, name: str) -> str:
+    return state_machine_arn.replace(":stateMachine:", ":execution:", 1) + ":" + name
+
+
+def _set_execution_arn(dataset_ids: List[str], execution_arn: Optional[str]) -> None:
+    if not table:
+        return
+    for dataset_id in dataset_ids:
+        try:
+            table.update_item(
+                Key={"datasetId": dataset_id},
+                UpdateExpression="SET executionArn = :arn",
+                ExpressionAttributeValues={":arn": execution_arn},
             )
         except Exception:
             pass  # Non-blocking
 
-    return {"executionArn": response.get("executionArn"), "datasetId": dataset_id}
+
+def _put_job(
+    dataset_id: str, key: str, file_type: str, plan: Dict[str, Any], execution_name: Optional[str] = None
+) -> Optional[int]:
+    fields: Dict[str, Any] = {"fileName": key.split("/")[-1], "fileType": file_type, "plan": plan}
+    if execution_name:
+        # Identifies the upload, so a redelivered packed object is recognised
+        fields["executionName"] = execution_name
+    return put_job(table, dataset_id, "PROCESSING", **fields)
+
+
+def _started_job(obj: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """The job already started for this upload, if any.
+
+    Packed executions are named after the whole batch, so a partial
+    redelivery would pack the object under a new name and run it twice.
+    Instead the object's job item is checked: it records the upload's
+    execution name and, once an execution started, its ARN.
+    """
+    if not table:
+        return None
+    try:
+        item = table.get_item(
+            Key={"datasetId": obj["datasetId"]},
+            ProjectionExpression="executionName, executionArn",
+            ConsistentRead=True,
+        ).get("Item") or {}
+    except Exception as e:
+        print(f"Error reading job {obj['datasetId']}: {e}")
+        return None
+    if item.get("executionName") != obj["executionName"] or not item.get("executionArn"):
+        return None
+    return {"executionArn": item["executionArn"], "datasetId": obj["datasetId"]}
+
+
+def _result_cache_key(file_type: str, size: int, etag: Optional[str]) -> Optional[str]:
+    if not (RESULT_CACHE and OUTPUT_BUCKET and etag):
+        return None
+    # Everything that shapes the manifest besides the bytes themselves
+    config = {
+        "fileType": file_type,
+        "maxItems": MAX_ITEMS,
+        "targetShardBytes": TARGET_SHARD_BYTES,
+        "minShardFeatures": MIN_SHARD_FEATURES,
+        "shardingMode": SHARDING_MODE,
+        "spatialSampleSize": SPATIAL_SAMPLE_SIZE,
+        "tileCache": TILE_CACHE,
+        "spatialIndex": SPATIAL_INDEX,
+        "columnarOutput": COLUMNAR_OUTPUT,
+        "stageTimings": STAGE_TIMINGS,
+        "rasterHistogramBins": RASTER_HISTOGRAM_BINS,
+        "rasterHistogramRange": RASTER_HISTOGRAM_RANGE,
+    }
+    return result_cache.cache_key(etag, size, config)
+
+
+def _serve_from_cache(
+    dataset_id: str, key: str, file_type: str, cache_key: str
+) -> Optional[Dict[str, Any]]:
+    """Complete the job from a cached result without starting an execution"""
+    try:
+        entry = result_cache.lookup(s3, OUTPUT_BUCKET, cache_key)
+        if entry is None or entry.get("datasetId") == dataset_id:
+            return None
+        summary = result_cache.materialize(s3, OUTPUT_BUCKET, entry, dataset_id, key)
+    except Exception as e:
+        # Cached outputs expired or are unreadable; process from scratch
+        print(f"Result cache entry {cache_key} unusable: {e}")
+        return None
+
+    # The outputs are already copied; bookkeeping failures must not fail the ingest
+    try:
+        result_cache.record(
+            s3, OUTPUT_BUCKET, cache_key, dataset_id, key, RESULT_CACHE_TTL_DAYS,
+            hits=int(entry.get("hits", 0)) + 1,
+        )
+    except Exception as e:
+        print(f"Error recording result cache entry: {e}")
+    if table:
+        try:
+            version = _put_job(dataset_id, key, file_type, {"mode": "cached", "cacheKey": cache_key})
+            update_job_status(
+                table, dataset_id, "COMPLETED", result={"summary": summary}, expected_version=version
+            )
+        except Exception as e:
+            print(f"Error recording cached job {dataset_id}: {e}")
+    return {"executionArn": None, "datasetId": dataset_id, "cachedFrom": entry["datasetId"]}
 
 
 def _derive_dataset_id(key: str) -> str:
@@ -77,15 +509,355 @@ def _derive_dataset_id(key: str) -> str:
     return m.group(1) if m else "unknown"
 
 
-def _derive_work_items(dataset_id: str, object_key: str, num_tiles: int) -> List[Dict[str, Any]]:
-    # Create ≤3 tiny work items that all reference the same source object
-    return [
-        {
+def _plan_shards(
+    size: int, feature_count: Optional[int] = None, block_count: Optional[int] = None
+) -> Dict[str, Any]:
+    """Choose the tile count from object size and, when known, feature count.
+
+    One tile per TARGET_SHARD_BYTES, capped at MAX_ITEMS, and never fewer than
+    MIN_SHARD_FEATURES features per tile. GeoTIFF tiles own whole internal
+    tiles/strips, so there are never more tiles than blocks. Single-tile
+    plans run in-line without a Map state.
+    """
+    num_tiles = max(1, min(MAX_ITEMS, -(-size // max(1, TARGET_SHARD_BYTES))))
+    if feature_count is not None:
+        num_tiles = max(1, min(num_tiles, -(-feature_count // max(1, MIN_SHARD_FEATURES))))
+    if block_count is not None:
+        num_tiles = max(1, min(num_tiles, block_count))
+
+    plan = {
+        "numTiles": num_tiles,
+        "mode": "inline" if num_tiles == 1 else "map",
+        "sizeBytes": size,
+        "targetShardBytes": TARGET_SHARD_BYTES,
+        "minShardFeatures": MIN_SHARD_FEATURES,
+    }
+    if feature_count is not None:
+        plan["featureCount"] = feature_count
+    if block_count is not None:
+        plan["blockCount"] = block_count
+    return plan
+
+
+def _is_geotiff(key: str) -> bool:
+    return key.lower().endswith((".tif", ".tiff", ".geotiff"))
+
+
+def _geotiff_block_count(key: str, etag: Optional[str]) -> Optional[int]:
+    """Internal tile/strip count from the TIFF header; None if it can't be read"""
+    def read_range(offset: int, length: int) -> bytes:
+        params = {"Bucket": INPUT_BUCKET, "Key": key, "Range": f"bytes={offset}-{offset + length - 1}"}
+        if etag:
+            params["IfMatch"] = etag
+        return s3.get_object(**params)["Body"].read()
+
+    try:
+        return block_count(TiffReader(read_range))
+    except Exception as e:
+        # Process reports unreadable rasters; plan by size alone
+        print(f"Error reading GeoTIFF header of {key}: {e}")
+        return None
+
+
+class _Spans:
+    """Feature (start, end) byte spans packed into one array("Q"), 16 bytes per feature"""
+
+    def __init__(self) -> None:
+        self.offsets = array("Q")
+
+    def append(self, span: Tuple[int, int]) -> None:
+        self.offsets.extend(span)
+
+    def __len__(self) -> int:
+        return len(self.offsets) // 2
+
+    def __getitem__(self, k: int) -> Tuple[int, int]:
+        return self.offsets[2 * k], self.offsets[2 * k + 1]
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        offsets = iter(self.offsets)
+        return zip(offsets, offsets)
+
+    def to_bytes(self) -> bytes:
+        """Little-endian u64 start, end pairs"""
+        offsets = self.offsets
+        if sys.byteorder != "little":
+            offsets = array("Q", offsets)
+            offsets.byteswap()
+        return offsets.tobytes()
+
+
+def _derive_work_items(
+    dataset_id: str,
+    object_key: str,
+    num_tiles: int,
+    spans: Optional[_Spans] = None,
+    etag: Optional[str] = None,
+    cells: Optional[List[List[Optional[float]]]] = None,
+    groups: Optional[List[Tuple[int, int]]] = None,
+    hashes: Optional[List[str]] = None,
+    cell_ranges: Optional[List[Tuple[int, int]]] = None,
+) -> List[Dict[str, Any]]:
+    # Create one work item per planned tile, all referencing the same source object.
+    # When a feature index is available, each item carries the contiguous byte
+    # span of its features so the process worker only fetches that slice.
+    # Spatial plans instead give each item a grid cell, and the part of the
+    # per-cell span sidecar listing that cell's features when one was written.
+    items = []
+    if groups is None and spans is not None and cells is None:
+        groups = _split_spans(spans, num_tiles)
+    for i in range(num_tiles):
+        item = {
             "datasetId": dataset_id,
             "tile": i,
             "objectKey": object_key,
             "numTiles": num_tiles,
         }
-        for i in range(num_tiles)
-    ]
+        if etag:
+            # Process pins its reads to the indexed object, and the manifest records it
+            item["eTag"] = etag
+        if groups is not None:
+            first, last = groups[i]
+            if last > first:
+                item["byteRange"] = [spans[first][0], spans[last - 1][1]]
+            else:
+                item["byteRange"] = [0, 0]
+            item["featureRange"] = [first, last]
+            item["indexKey"] = _index_key(dataset_id)
+            if hashes is not None:
+                item["contentHash"] = hashes[i]
+        elif cells is not None:
+            item["cell"] = cells[i]
+            if cell_ranges is not None:
+                item["spansKey"] = _cell_spans_key(dataset_id)
+                item["spansRange"] = list(cell_ranges[i])
+        items.append(item)
+    return items
+
+
+def _write_work_items(dataset_id: str, work_items: List[Dict[str, Any]]) -> str:
+    key = f"{dataset_id}/work/items.json"
+    s3.put_object(
+        Bucket=OUTPUT_BUCKET,
+        Key=key,
+        Body=json.dumps(work_items).encode("utf-8"),
+        ContentType="application/json",
+    )
+    return key
+
+
+def _index_key(dataset_id: str) -> str:
+    return f"{dataset_id}/index/features.spans"
+
+
+def _cell_spans_key(dataset_id: str) -> str:
+    return f"{dataset_id}/index/cells.spans"
+
+
+def _write_cell_spans(
+    dataset_id: str, spans: _Spans, centers: array, root: Any, num_tiles: int
+) -> List[Tuple[int, int]]:
+    """Assign every feature span to its kd cell and persist them grouped by tile.
+
+    The sidecar holds each tile's little-endian u64 (start, end) pairs back
+    to back, in source order within a tile; the returned [first, last) pair
+    indexes per tile locate its part. Features without coordinates go to
+    tile 0, as the in-process cell filter did.
+    """
+    per_tile = [_Spans() for _ in range(num_tiles)]
+    for k, span in enumerate(spans):
+        x = centers[2 * k]
+        y = centers[2 * k + 1]
+        per_tile[0 if math.isnan(x) else locate_cell(root, x, y)].append(span)
+
+    body = bytearray()
+    ranges = []
+    for tile_spans in per_tile:
+        first = len(body) // 16
+        body += tile_spans.to_bytes()
+        ranges.append((first, len(body) // 16))
+    s3.put_object(
+        Bucket=OUTPUT_BUCKET,
+        Key=_cell_spans_key(dataset_id),
+        Body=bytes(body),
+        ContentType="application/octet-stream",
+    )
+    return ranges
+
+
+def _build_feature_index(
+    dataset_id: str,
+    key: str,
+    size: int,
+    etag: Optional[str],
+    sample: bool = False,
+    digest: bool = False,
+) -> Tuple[_Spans, List[Tuple[float, float]], Optional[array], Optional[array]]:
+    """Stream the source once and persist feature byte offsets as a sidecar index.
+
+    Spans are kept packed (16 bytes per feature) rather than as Python
+    tuples, and the sidecar is their raw little-endian u64 (start, end)
+    pairs, with the source's key, size, ETag and feature count as object
+    metadata.
+
+    With sample=True, every feature's centre is returned as packed x, y
+    doubles (NaN for features without coordinates), along with an evenly
+    strided sample of at most 2 * SPATIAL_SAMPLE_SIZE of them for spatial
+    partitioning. With digest=True, a 64-bit BLAKE2 digest of every
+    feature's bytes is returned as well.
+    """
+    obj = s3.get_object(Bucket=INPUT_BUCKET, Key=key)
+    scanner = FeatureScanner()
+    spans = _Spans()
+    samples: List[Tuple[float, float]] = []
+    digests = array("Q") if digest else None
+    centers = array("d") if sample else None
+    stride = 1
+    for chunk in obj["Body"].iter_chunks(CHUNK_SIZE):
+        for start, end, raw in scanner.feed(chunk):
+            if digests is not None:
+                digests.append(int.from_bytes(hashlib.blake2b(raw, digest_size=8).digest(), "little"))
+            if centers is not None:
+                center = _sample_center(raw)
+                centers.extend(center if center is not None else (math.nan, math.nan))
+                if center is not None and len(spans) % stride == 0:
+                    samples.append(center)
+                if len(samples) >= 2 * max(1, SPATIAL_SAMPLE_SIZE):
+                    # Halve the sample and the rate to keep memory bounded
+                    samples = samples[::2]
+                    stride *= 2
+            spans.append((start, end))
+        if scanner.done:
+            break
+    scanner.close()
+
+    if OUTPUT_BUCKET:
+        s3.put_object(
+            Bucket=OUTPUT_BUCKET,
+            Key=_index_key(dataset_id),
+            Body=spans.to_bytes(),
+            ContentType="application/octet-stream",
+            Metadata={
+                "object-key": key,
+                "size": str(size),
+                "etag": (etag or "").strip('"'),
+                "feature-count": str(len(spans)),
+            },
+        )
+    return spans, samples, digests, centers
+
+
+def _sample_center(raw: bytes) -> Optional[Tuple[float, float]]:
+    try:
+        return feature_center(json.loads(raw))
+    except ValueError:
+        return None
+
+
+def _split_spans(spans: _Spans, num_tiles: int) -> List[Tuple[int, int]]:
+    """Partition feature indexes into num_tiles contiguous groups of roughly equal bytes"""
+    total = sum(end - start for start, end in spans)
+    groups = []
+    first = 0
+    acc = 0
+    for t in range(num_tiles):
+        remaining_tiles = num_tiles - t - 1
+        target = total * (t + 1) / num_tiles
+        # Leave at least one feature for each remaining tile
+        limit = len(spans) - remaining_tiles
+        last = first
+        while last < limit and (last == first or acc < target or remaining_tiles == 0):
+            acc += spans[last][1] - spans[last][0]
+            last += 1
+        groups.append((first, last))
+        first = last
+    return groups
+
+
+def _split_spans_by_content(
+    spans: _Spans, digests: array, num_tiles: int
+) -> List[Tuple[int, int]]:
+    """Partition features into at most num_tiles groups cut at content-defined boundaries.
+
+    A group ends after a feature whose digest falls below its byte length
+    modulo the target group size, so groups average about the target size.
+    Boundaries depend only on nearby features, so an edit changes the groups
+    around it and leaves the rest of the file grouped, and hashed, as before.
+    The target moves in quarter-octave steps from TARGET_SHARD_BYTES, so it
+    does not change when an edit changes the file size slightly: the
+    smallest step that still yields no more than num_tiles groups is used.
+    While more than num_tiles groups remain, the adjacent pair with the
+    fewest bytes is merged.
+    """
+    num_tiles = max(1, num_tiles)
+    total = sum(end - start for start, end in spans)
+    step = 0
+    while total > _content_target(step) * num_tiles:
+        step += 1
+    groups, sizes = _content_groups(spans, digests, _content_target(step))
+    # Groups run past the target, so finer steps may still fit the plan
+    while step > 0:
+        finer, finer_sizes = _content_groups(spans, digests, _content_target(step - 1))
+        if len(finer) > num_tiles or len(finer) == len(groups):
+            break
+        step -= 1
+        groups, sizes = finer, finer_sizes
+    while len(groups) > num_tiles:
+        j = min(range(len(groups) - 1), key=lambda i: sizes[i] + sizes[i + 1])
+        groups[j:j + 2] = [(groups[j][0], groups[j + 1][1])]
+        sizes[j:j + 2] = [sizes[j] + sizes[j + 1]]
+    return groups
+
+
+def _content_target(step: int) -> int:
+    return int(max(1, TARGET_SHARD_BYTES) * 2 ** (step / 4))
+
+
+def _content_groups(
+    spans: _Spans, digests: array, target: int
+) -> Tuple[List[Tuple[int, int]], List[int]]:
+    """Content-defined groups for one target and their byte sizes.
+
+    Groups hold at least MIN_SHARD_FEATURES features (a short last group
+    joins the one before it) and are cut at four times the target.
+    """
+    min_features = max(1, MIN_SHARD_FEATURES)
+    groups: List[Tuple[int, int]] = []
+    sizes: List[int] = []
+    first = 0
+    acc = 0
+    for k, (start, end) in enumerate(spans):
+        acc += end - start
+        if k + 1 - first < min_features:
+            continue
+        if (acc * 4 >= target and digests[k] % target < end - start) or acc >= 4 * target:
+            groups.append((first, k + 1))
+            sizes.append(acc)
+            first = k + 1
+            acc = 0
+    if first < len(spans):
+        if groups and len(spans) - first < min_features:
+            groups[-1] = (groups[-1][0], len(spans))
+            sizes[-1] += acc
+        else:
+            groups.append((first, len(spans)))
+            sizes.append(acc)
+    return groups, sizes
+
+
+def _tile_hash(spans: _Spans, digests: array, first: int, last: int) -> str:
+    """Content hash of a feature group, covering its bytes and their layout.
 
+    Reused index and columnar parts keep offsets relative to the slice start,
+    so each feature's digest is hashed with its offset from the group start
+    and its length; an edit that only moves features within the slice (e.g.
+    whitespace between them) then misses the cache.
+    """
+    block = array("Q")
+    base = spans[first][0] if last > first else 0
+    for k in range(first, last):
+        start, end = spans[k]
+        block.extend((digests[k], start - base, end - start))
+    if sys.byteorder != "little":
+        block.byteswap()
+    return hashlib.sha256(block.tobytes()).hexdigest()
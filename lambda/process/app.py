@@ -1,22 +1,90 @@
+import hashlib
 import json
 import os
-from typing import Dict, Any, Tuple
+import sys
+import time
+from array import array
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 
 import boto3
 from botocore.exceptions import ClientError
 
+from sgaf_core import columnar, partial, rtree
+from sgaf_core.cache import CACHE_VERSION
+from sgaf_core.columnar import ColumnarWriter
+from sgaf_core.geojson import iter_feature_records
+from sgaf_core.geotiff import TiffReader, georeference
+from sgaf_core.metrics import flush_metrics, put_metric
+from sgaf_core.spatial import cell_contains, geometry_bbox
+from sgaf_core.timings import StageTimer
+from sgaf_core.wkb import GEOMETRY_TYPES, to_wkb
+
+from geometry import GeometryBatch
+from raster import np, tile_statistics
+
 INPUT_BUCKET = os.environ["INPUT_BUCKET"]
+CHUNK_SIZE = int(os.environ.get("STREAM_CHUNK_BYTES", "65536"))
+GEOMETRY_BATCH_VERTICES = int(os.environ.get("GEOMETRY_BATCH_VERTICES", "65536"))
+OUTPUT_BUCKET = os.environ.get("OUTPUT_BUCKET", "")
+# Write a per-tile packed R-tree of feature bboxes for aggregate to merge
+SPATIAL_INDEX = os.environ.get("SPATIAL_INDEX", "true").lower() == "true"
+# Write a per-tile columnar (.sgcol) table of feature attributes and WKB
+COLUMNAR_OUTPUT = os.environ.get("COLUMNAR_OUTPUT", "true").lower() == "true"
+# Reuse results of byte-range tiles whose content hash was processed before
+TILE_CACHE = os.environ.get("TILE_CACHE", "true").lower() == "true"
+# Return per-stage wall time, bytes and feature counts with each tile result
+STAGE_TIMINGS = os.environ.get("STAGE_TIMINGS", "false").lower() == "true"
+# Spatial tiles fetch their features with ranged GETs, merging spans closer
+# than the gap into one request of at most the fetch size
+SPAN_GAP_BYTES = int(os.environ.get("SPAN_GAP_BYTES", "65536"))
+SPAN_FETCH_BYTES = int(os.environ.get("SPAN_FETCH_BYTES", "8388608"))
 
 s3 = boto3.client("s3")
-cloudwatch = boto3.client("cloudwatch")
+
+# Bytes of input fetched by, and stage timer of, the current work item
+_bytes_read = 0
+_timer = StageTimer(enabled=False)
 
 
+@flush_metrics
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    if "batch" in event:
+        # Packed work item: several small single-tile datasets share one invocation
+        return {
+            "batchId": event.get("batchId"),
+            "batch": [_process_packed(item, context) for item in event["batch"]],
+        }
+    return _process_item(event, context)
+
+
+def _process_packed(item: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """Process one dataset of a pack; a failure fails only that dataset"""
+    try:
+        return _process_item(item, context)
+    except Exception as e:
+        print(f"Error processing {item.get('objectKey')}: {e}")
+        return {
+            "datasetId": item.get("datasetId", "unknown"),
+            "tile": int(item.get("tile", 0)),
+            "numTiles": int(item.get("numTiles", 1)),
+            "objectKey": item.get("objectKey"),
+            "jobVersion": item.get("jobVersion"),
+            "status": "error",
+            "error": str(e),
+        }
+
+
+def _process_item(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     # Perform genuine GeoJSON/GeoTIFF analysis, sharded by tile
+    global _bytes_read, _timer
     dataset_id = event.get("datasetId", "unknown")
     tile = int(event.get("tile", 0))
     num_tiles = int(event.get("numTiles", 3))
     object_key = event.get("objectKey")
+    byte_range = event.get("byteRange")
+    etag = event.get("eTag")
+    cell = event.get("cell")
+    spans_ref = (event["spansKey"], event["spansRange"]) if event.get("spansKey") else None
 
     if not object_key:
         raise Exception("objectKey missing in work item")
@@ -26,158 +94,480 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     if object_key.lower().endswith((".tif", ".tiff", ".geotiff")):
         file_type = "geotiff"
     
-    # Emit CloudWatch metric
-    cloudwatch.put_metric_data(
-        Namespace="SGAF/Processing",
-        MetricData=[
-            {
-                "MetricName": "FilesProcessed",
-                "Value": 1,
-                "Unit": "Count",
-                "Dimensions": [
-                    {"Name": "FileType", "Value": file_type},
-                    {"Name": "Tile", "Value": str(tile)},
-                ],
-            }
-        ],
-    )
-
+    _bytes_read = 0
+    _timer = StageTimer(STAGE_TIMINGS)
+    started = time.perf_counter()
     try:
         if file_type == "geotiff":
             result = _process_geotiff(INPUT_BUCKET, object_key, tile, num_tiles)
         else:
-            result = _process_geojson(INPUT_BUCKET, object_key, tile, num_tiles)
+            index_key = _index_part_key(dataset_id, tile) if SPATIAL_INDEX and OUTPUT_BUCKET else None
+            columns_key = _columns_part_key(dataset_id, tile) if COLUMNAR_OUTPUT and OUTPUT_BUCKET else None
+            tile_key = None
+            if TILE_CACHE and OUTPUT_BUCKET and byte_range is not None and event.get("contentHash"):
+                tile_key = _tile_cache_key(event["contentHash"])
+            result = _reuse_cached_tile(tile_key, int(byte_range[0]), index_key, columns_key) if tile_key else None
+            if tile_key:
+                _timer.lap("cache")
+            if result is None:
+                result = _process_geojson(
+                    INPUT_BUCKET, object_key, tile, num_tiles, byte_range, etag, cell, index_key, columns_key,
+                    spans_ref,
+                )
+                if tile_key:
+                    _record_tile(tile_key, result, int(byte_range[0]))
+                    _timer.lap("cache")
         
         result["datasetId"] = dataset_id
         result["tile"] = tile
         result["numTiles"] = num_tiles
         result["objectKey"] = object_key
+        if etag:
+            result["eTag"] = etag
+        if event.get("cacheKey"):
+            result["cacheKey"] = event["cacheKey"]
+        if event.get("jobVersion") is not None:
+            result["jobVersion"] = event["jobVersion"]
         result["status"] = "ok"
+        if _timer.enabled:
+            result["timings"] = _timer.to_dict()
         
+        _record_metrics(file_type, result, time.perf_counter() - started)
         return result
     except Exception as e:
-        cloudwatch.put_metric_data(
-            Namespace="SGAF/Errors",
-            MetricData=[
-                {
-                    "MetricName": "ProcessingErrors",
-                    "Value": 1,
-                    "Unit": "Count",
-                }
-            ],
-        )
+        put_metric("SGAF/Errors", "ProcessingErrors", 1, dimensions={"FileType": file_type})
         raise
 
 
-def _process_geojson(bucket: str, key: str, tile: int, num_tiles: int) -> Dict[str, Any]:
-    """Process GeoJSON file"""
-    data = _read_geojson(bucket, key)
-    features = data.get("features", []) if isinstance(data, dict) else []
-
-    minx = float("inf")
-    miny = float("inf")
-    maxx = float("-inf")
-    maxy = float("-inf")
-    point_count = 0
-    point_sum_x = 0.0
-    point_sum_y = 0.0
-    polygon_count = 0
-    polygon_area_sum = 0.0
+def _record_metrics(file_type: str, result: Dict[str, Any], seconds: float) -> None:
+    # Buffered and written as EMF when the handler returns
+    dimensions = {"FileType": file_type}
+    features = result.get("pointCount", 0) + result.get("polygonCount", 0) + result.get("otherCount", 0)
+    put_metric("SGAF/Processing", "FilesProcessed", 1, dimensions=dimensions)
+    put_metric("SGAF/Processing", "BytesRead", _bytes_read, "Bytes", dimensions)
+    put_metric("SGAF/Processing", "ProcessingTime", seconds * 1000, "Milliseconds", dimensions)
+    put_metric("SGAF/Processing", "FeaturesProcessed", features, dimensions=dimensions)
+    if seconds > 0:
+        put_metric("SGAF/Processing", "FeaturesPerSecond", features / seconds, "Count/Second", dimensions)
+
+
+def _process_geojson(
+    bucket: str,
+    key: str,
+    tile: int,
+    num_tiles: int,
+    byte_range: Optional[List[int]] = None,
+    etag: Optional[str] = None,
+    cell: Optional[List[Optional[float]]] = None,
+    index_key: Optional[str] = None,
+    columns_key: Optional[str] = None,
+    spans_ref: Optional[Tuple[str, List[int]]] = None,
+) -> Dict[str, Any]:
+    """Process GeoJSON file.
+
+    Features are streamed one at a time from S3, so memory is bounded by the
+    largest feature rather than the file. With a byte range from the ingest
+    feature index, only this tile's slice is fetched. With spans_ref, the
+    (key, [first, last)) of this tile's part of the ingest per-cell span
+    sidecar, only the features of this tile's grid cell are fetched. With
+    just a spatial grid cell, the whole object is streamed and only features
+    whose bbox centre falls in the cell are kept (features without
+    coordinates go to tile 0). Otherwise features are sharded round-robin by
+    index.
+
+    With index_key, each kept feature's bbox and byte span are written there
+    as a packed R-tree. Offsets are relative to the slice start, which is
+    returned as the part's base (0 for span lists, whose offsets are absolute). With columns_key, one row per kept feature
+    (source offset, id, geometry type, bbox, area, centroid, WKB) is written
+    there as a columnar table. Area and centroid come from the geometry
+    kernel for polygons; other non-point geometries get NaN area and their
+    bbox centre.
+    """
+    if byte_range is not None:
+        base = int(byte_range[0])
+        features = _iter_feature_slice(bucket, key, base, int(byte_range[1]), etag)
+    elif spans_ref is not None:
+        base = 0
+        features = _iter_feature_spans(bucket, key, _read_cell_spans(*spans_ref), etag)
+    else:
+        base = 0
+        params = {"Bucket": bucket, "Key": key}
+        if etag:
+            params["IfMatch"] = etag
+        obj = _get_input_object(**params)
+        features = iter_feature_records(obj["Body"], CHUNK_SIZE)
+    index_items: List[rtree.Item] = []
+    table = ColumnarWriter() if columns_key else None
+
+    # Tile totals are kept as an exact, mergeable partial aggregate
+    acc = partial.empty()
     other_count = 0
 
-    for idx, feat in enumerate(features):
-        if (idx % max(1, num_tiles)) != tile:
+    # Coordinates are packed into a batch and reduced by the geometry kernel
+    # whenever it grows past GEOMETRY_BATCH_VERTICES
+    batch = GeometryBatch()
+    # Table rows of the polygons packed into the current batch, in ring order
+    ring_rows: List[int] = []
+
+    def flush() -> None:
+        nonlocal batch, ring_rows
+        stats = batch.summarize()
+        if table is not None:
+            for row, area, centroid in zip(ring_rows, stats["areas"], stats["centroids"]):
+                table.set(row, "area", area)
+                if centroid is not None:
+                    table.set(row, "centroidX", centroid[0])
+                    table.set(row, "centroidY", centroid[1])
+        acc["pointCount"] += stats["pointCount"]
+        acc["polygonCount"] += stats["polygonCount"]
+        partial.add_sum(acc, "pointSumX", stats["pointSum"][0])
+        partial.add_sum(acc, "pointSumY", stats["pointSum"][1])
+        for area in stats["areas"]:
+            partial.add_sum(acc, "polygonArea", area)
+        partial.add_bbox(acc, stats["bbox"])
+        batch = GeometryBatch()
+        ring_rows = []
+
+    # Stage boundaries are marked with _timer.lap(); S3 reads time themselves
+    for idx, (start, end, feat) in enumerate(features):
+        _timer.lap("parse", 1, end - start)
+        bbox = None
+        if cell is not None or index_key or table is not None:
+            bbox = geometry_bbox((feat or {}).get("geometry"))
+        if cell is not None and spans_ref is None:
+            if bbox is not None:
+                keep = cell_contains(cell, (bbox[0] + bbox[2]) / 2.0, (bbox[1] + bbox[3]) / 2.0)
+            else:
+                keep = tile == 0
+            if not keep:
+                _timer.lap("filter")
+                continue
+        elif byte_range is None and spans_ref is None and (idx % max(1, num_tiles)) != tile:
+            _timer.lap("filter")
             continue
 
+        if index_key and bbox is not None:
+            index_items.append((bbox[0], bbox[1], bbox[2], bbox[3], start, end - start))
+
         geom = (feat or {}).get("geometry") or {}
         gtype = geom.get("type")
         coords = geom.get("coordinates")
+        _timer.lap("filter", 1)
+
+        row = None
+        if table is not None:
+            row = _add_table_row(table, feat, geom, bbox, base + start)
+            _timer.lap("serialise", 1)
 
         if gtype == "Point" and isinstance(coords, list) and len(coords) >= 2:
-            x, y = float(coords[0]), float(coords[1])
-            point_count += 1
-            point_sum_x += x
-            point_sum_y += y
-            minx, miny, maxx, maxy = _expand_bbox(minx, miny, maxx, maxy, [(x, y)])
+            batch.add_point(float(coords[0]), float(coords[1]))
+            if row is not None:
+                table.set(row, "area", 0.0)
         elif gtype == "Polygon" and isinstance(coords, list) and coords:
-            outer = coords[0]
-            if isinstance(outer, list) and len(outer) >= 3:
-                ring_pts = [(float(p[0]), float(p[1])) for p in outer if isinstance(p, list) and len(p) >= 2]
-                if len(ring_pts) >= 3:
-                    polygon_count += 1
-                    polygon_area_sum += abs(_shoelace_area(ring_pts))
-                    minx, miny, maxx, maxy = _expand_bbox(minx, miny, maxx, maxy, ring_pts)
+            if batch.add_ring(coords[0]) and row is not None:
+                ring_rows.append(row)
         else:
             other_count += 1
 
-    shard_bbox = _finalize_bbox(minx, miny, maxx, maxy)
+        if batch.vertex_count >= GEOMETRY_BATCH_VERTICES:
+            flush()
+        _timer.lap("geometry", 1)
+
+    # Reading past the last feature
+    _timer.lap("parse")
+    flush()
+    _timer.lap("geometry")
+    acc["otherCount"] = other_count
+    totals = partial.finalize(acc)
+
+    result = {
+        "bbox": totals["bbox"],
+        "pointCount": totals["pointCount"],
+        "pointSum": totals["pointSum"],
+        "polygonCount": totals["polygonCount"],
+        "polygonAreaSum": totals["polygonArea"],
+        "otherCount": totals["otherCount"],
+        "partial": acc,
+    }
+    if cell is not None:
+        result["cell"] = cell
+    if index_key:
+        body = rtree.build(rtree.hilbert_sort(index_items))
+        s3.put_object(
+            Bucket=OUTPUT_BUCKET,
+            Key=index_key,
+            Body=body,
+            ContentType="application/octet-stream",
+        )
+        result["indexPart"] = {"key": index_key, "base": base, "count": len(index_items)}
+        _timer.lap("serialise", nbytes=len(body))
+    if table is not None:
+        body = table.to_bytes()
+        s3.put_object(
+            Bucket=OUTPUT_BUCKET,
+            Key=columns_key,
+            Body=body,
+            ContentType="application/octet-stream",
+        )
+        result["columnsPart"] = {"key": columns_key, "rows": table.rows, "bytes": len(body)}
+        _timer.lap("serialise", nbytes=len(body))
+    return result
+
 
-    return {
-        "bbox": shard_bbox,
-        "pointCount": point_count,
-        "pointSum": [point_sum_x, point_sum_y],
-        "polygonCount": polygon_count,
-        "polygonAreaSum": polygon_area_sum,
-        "otherCount": other_count,
+def _add_table_row(
+    table: ColumnarWriter,
+    feat: Any,
+    geom: Dict[str, Any],
+    bbox: Optional[Tuple[float, float, float, float]],
+    offset: int,
+) -> int:
+    try:
+        wkb = to_wkb(geom)
+    except (ValueError, TypeError):
+        wkb = b""
+    values: Dict[str, Any] = {
+        "offset": offset,
+        "id": feat.get("id") if isinstance(feat, dict) else None,
+        "geometryType": GEOMETRY_TYPES.get(geom.get("type"), 0) if wkb else 0,
+        "wkb": wkb,
     }
+    if bbox is not None:
+        values.update(minx=bbox[0], miny=bbox[1], maxx=bbox[2], maxy=bbox[3])
+        # Polygon rows are overwritten with the kernel's area centroid on flush
+        values.update(centroidX=(bbox[0] + bbox[2]) / 2.0, centroidY=(bbox[1] + bbox[3]) / 2.0)
+    if values["geometryType"] in (GEOMETRY_TYPES["LineString"], GEOMETRY_TYPES["MultiLineString"]):
+        values["area"] = 0.0
+    return table.add_row(values)
 
 
 def _process_geotiff(bucket: str, key: str, tile: int, num_tiles: int) -> Dict[str, Any]:
-    """Process GeoTIFF file - simplified for free tier (no rasterio dependency)"""
-    # For free tier, we'll extract metadata from GeoTIFF headers
-    # In production, you'd use rasterio, but that's too heavy for free tier Lambda
-    # So we'll simulate basic processing
-    
-    obj = s3.get_object(Bucket=bucket, Key=key)
-    # Read first few KB to check header (GeoTIFF starts with specific bytes)
-    header = obj["Body"].read(4096)
-    
-    # Simulate GeoTIFF processing - extract bounding box from file metadata
-    # In a real implementation, you'd parse GeoTIFF tags
-    # For demo, return mock data based on file
-    return {
-        "bbox": [0.0, 0.0, 1.0, 1.0],  # Mock bbox
+    """Analyse a GeoTIFF with ranged reads.
+
+    Every tile reads the header tags, then fetches and reduces only its own
+    contiguous run of internal tiles/strips into per-band statistics. The
+    raster footprint is reported once, by tile 0.
+    """
+    result = {
+        "bbox": None,
         "pointCount": 0,
         "pointSum": [0.0, 0.0],
-        "polygonCount": 1,  # GeoTIFF represents raster data as polygon
-        "polygonAreaSum": 1.0,  # Mock area
+        "polygonCount": 0,
+        "polygonAreaSum": 0.0,
         "otherCount": 0,
         "geotiffProcessed": True,
     }
 
+    def read_range(offset: int, length: int) -> bytes:
+        return _read_range(bucket, key, offset, length)
+
+    reader = TiffReader(read_range)
+    info = georeference(reader)
+    _timer.lap("parse")
+    if tile == 0 and info["bbox"] is not None:
+        # The raster footprint counts as a single polygon
+        result["bbox"] = info["bbox"]
+        result["polygonCount"] = 1
+        result["polygonAreaSum"] = info["width"] * info["height"] * info["pixelArea"]
+
+    # Block statistics need NumPy and a supported block format; the metadata
+    # above stands either way, and the skip reason is reported instead
+    if np is None:
+        print("NumPy is not available; skipping GeoTIFF block statistics")
+        result["rasterStats"] = {"skipped": "NumPy is not available"}
+    else:
+        try:
+            result["rasterStats"] = tile_statistics(reader, read_range, tile, num_tiles)
+        except ValueError as e:
+            print(f"Skipping GeoTIFF block statistics for {key}: {e}")
+            result["rasterStats"] = {"skipped": str(e)}
+    result["raster"] = {**info, "bytesRead": reader.bytes_read}
+    # Block decoding and reduction
+    _timer.lap("raster")
+    return result
 
-def _read_geojson(bucket: str, key: str) -> Dict[str, Any]:
-    obj = s3.get_object(Bucket=bucket, Key=key)
-    body = obj["Body"].read()
-    return json.loads(body)
 
+def _read_range(bucket: str, key: str, offset: int, length: int) -> bytes:
+    obj = _get_input_object(Bucket=bucket, Key=key, Range=f"bytes={offset}-{offset + length - 1}")
+    return obj["Body"].read()
 
-def _expand_bbox(minx: float, miny: float, maxx: float, maxy: float, pts: list) -> Tuple[float, float, float, float]:
-    for x, y in pts:
-        if x < minx:
-            minx = x
-        if y < miny:
-            miny = y
-        if x > maxx:
-            maxx = x
-        if y > maxy:
-            maxy = y
-    return minx, miny, maxx, maxy
 
+def _get_input_object(**params: Any) -> Dict[str, Any]:
+    global _bytes_read
+    started = time.perf_counter()
+    obj = s3.get_object(**params)
+    _bytes_read += int(obj.get("ContentLength") or 0)
+    if _timer.enabled:
+        _timer.add("fetch", time.perf_counter() - started)
+        obj["Body"] = _TimedBody(obj["Body"], _timer)
+    return obj
 
-def _finalize_bbox(minx: float, miny: float, maxx: float, maxy: float):
-    if minx == float("inf"):
+
+class _TimedBody:
+    """S3 body wrapper that records time spent reading it as the fetch stage"""
+
+    def __init__(self, body: Any, timer: StageTimer) -> None:
+        self.body = body
+        self.timer = timer
+
+    def read(self, *args: Any) -> bytes:
+        started = time.perf_counter()
+        data = self.body.read(*args)
+        self.timer.add("fetch", time.perf_counter() - started, nbytes=len(data))
+        return data
+
+    def iter_chunks(self, chunk_size: int) -> Iterator[bytes]:
+        chunks = self.body.iter_chunks(chunk_size)
+        while True:
+            started = time.perf_counter()
+            chunk = next(chunks, None)
+            self.timer.add("fetch", time.perf_counter() - started, nbytes=len(chunk or b""))
+            if chunk is None:
+                return
+            yield chunk
+
+
+def _iter_feature_slice(bucket: str, key: str, start: int, end: int, etag: Optional[str] = None) -> Iterator[Any]:
+    """Ranged GET of [start, end) holding comma-separated features.
+
+    Yields (start, end, feature) with offsets relative to the slice.
+    """
+    if end <= start:
+        return iter(())
+    params = {"Bucket": bucket, "Key": key, "Range": f"bytes={start}-{end - 1}"}
+    if etag:
+        # Fail rather than mis-slice if the object changed since it was indexed
+        params["IfMatch"] = etag
+    obj = _get_input_object(**params)
+    return iter_feature_records(obj["Body"], CHUNK_SIZE, array_body=True)
+
+
+def _read_cell_spans(spans_key: str, spans_range: List[int]) -> array:
+    """This tile's (start, end) pairs from the ingest per-cell span sidecar"""
+    first, last = int(spans_range[0]), int(spans_range[1])
+    offsets = array("Q")
+    if last <= first:
+        return offsets
+    obj = s3.get_object(Bucket=OUTPUT_BUCKET, Key=spans_key, Range=f"bytes={first * 16}-{last * 16 - 1}")
+    offsets.frombytes(obj["Body"].read())
+    if sys.byteorder != "little":
+        offsets.byteswap()
+    return offsets
+
+
+def _iter_feature_spans(bucket: str, key: str, offsets: array, etag: Optional[str] = None) -> Iterator[Any]:
+    """Fetch the features at the given (start, end) pairs with coalesced ranged GETs.
+
+    Spans are in source order. Neighbours less than SPAN_GAP_BYTES apart
+    share a request of up to SPAN_FETCH_BYTES. Yields (start, end, feature)
+    with absolute offsets.
+    """
+    count = len(offsets) // 2
+    k = 0
+    while k < count:
+        first = k
+        lo = offsets[2 * k]
+        hi = offsets[2 * k + 1]
+        k += 1
+        while (
+            k < count
+            and offsets[2 * k] - hi < SPAN_GAP_BYTES
+            and offsets[2 * k + 1] - lo <= SPAN_FETCH_BYTES
+        ):
+            hi = offsets[2 * k + 1]
+            k += 1
+        params = {"Bucket": bucket, "Key": key, "Range": f"bytes={lo}-{hi - 1}"}
+        if etag:
+            params["IfMatch"] = etag
+        data = _get_input_object(**params)["Body"].read()
+        for j in range(first, k):
+            start = offsets[2 * j]
+            end = offsets[2 * j + 1]
+            yield start, end, json.loads(data[start - lo:end - lo])
+
+
+def _tile_cache_key(content_hash: str) -> str:
+    # Outputs also depend on which artifacts this function writes
+    config = json.dumps(
+        {"v": CACHE_VERSION, "hash": content_hash, "index": SPATIAL_INDEX, "columns": COLUMNAR_OUTPUT},
+        sort_keys=True,
+    )
+    return f"partials/{hashlib.sha256(config.encode('utf-8')).hexdigest()}"
+
+
+def _record_tile(tile_key: str, result: Dict[str, Any], base: int) -> None:
+    """Persist a tile's result and artifacts under its content-addressed key.
+
+    Artifacts are copied out of the dataset prefix so a later run of the same
+    dataset cannot overwrite them while they are being reused.
+    """
+    try:
+        record = {**result, "base": base}
+        for field, name in (("indexPart", "index.rtree"), ("columnsPart", "columns.sgcol")):
+            part = result.get(field)
+            if part:
+                key = f"{tile_key}/{name}"
+                s3.copy_object(
+                    Bucket=OUTPUT_BUCKET, Key=key, CopySource={"Bucket": OUTPUT_BUCKET, "Key": part["key"]}
+                )
+                record[field] = {**part, "key": key}
+        s3.put_object(
+            Bucket=OUTPUT_BUCKET,
+            Key=f"{tile_key}.json",
+            Body=json.dumps(record).encode("utf-8"),
+            ContentType="application/json",
+        )
+    except Exception as e:
+        print(f"Error recording tile cache entry {tile_key}: {e}")
+
+
+def _reuse_cached_tile(
+    tile_key: str, base: int, index_key: Optional[str], columns_key: Optional[str]
+) -> Optional[Dict[str, Any]]:
+    """Return a previously computed result for identical tile content, or None.
+
+    The partial aggregate is reused as is. Index offsets are relative to the
+    slice start, so the index part is copied unchanged with the new base; the
+    columnar part's absolute offset column is shifted when the slice moved.
+    """
+    try:
+        cached = json.loads(s3.get_object(Bucket=OUTPUT_BUCKET, Key=f"{tile_key}.json")["Body"].read())
+    except s3.exceptions.NoSuchKey:
         return None
-    return [minx, miny, maxx, maxy]
-
-
-def _shoelace_area(ring_pts: list) -> float:
-    n = len(ring_pts)
-    if n < 3:
-        return 0.0
-    area2 = 0.0
-    for i in range(n):
-        x1, y1 = ring_pts[i]
-        x2, y2 = ring_pts[(i + 1) % n]
-        area2 += x1 * y2 - x2 * y1
-    return 0.5 * area2
+
+    try:
+        result = {k: v for k, v in cached.items() if k not in ("base", "indexPart", "columnsPart")}
+        part = cached.get("indexPart")
+        if part and index_key:
+            s3.copy_object(
+                Bucket=OUTPUT_BUCKET, Key=index_key, CopySource={"Bucket": OUTPUT_BUCKET, "Key": part["key"]}
+            )
+            result["indexPart"] = {**part, "key": index_key, "base": base}
+        part = cached.get("columnsPart")
+        if part and columns_key:
+            delta = base - int(cached.get("base", 0))
+            if delta:
+                data = s3.get_object(Bucket=OUTPUT_BUCKET, Key=part["key"])["Body"].read()
+                data = columnar.shift(data, "offset", delta)
+                s3.put_object(
+                    Bucket=OUTPUT_BUCKET, Key=columns_key, Body=data, ContentType="application/octet-stream"
+                )
+                part = {**part, "bytes": len(data)}
+            else:
+                s3.copy_object(
+                    Bucket=OUTPUT_BUCKET, Key=columns_key, CopySource={"Bucket": OUTPUT_BUCKET, "Key": part["key"]}
+                )
+            result["columnsPart"] = {**part, "key": columns_key}
+    except Exception as e:
+        # Cached artifacts expired; process the tile from scratch
+        print(f"Tile cache entry {tile_key} unusable: {e}")
+        return None
+    result["cachedTile"] = True
+    return result
+
+
+def _index_part_key(dataset_id: str, tile: int) -> str:
+    return f"{dataset_id}/index/parts/tile-{tile:05d}.rtree"
+
+
+def _columns_part_key(dataset_id: str, tile: int) -> str:
+    return f"{dataset_id}/columns/part-{tile:05d}.sgcol"
@@ -0,0 +1,170 @@
+"""Batched geometry kernel for the process Lambda.
+
+Coordinates of many points and polygon outer rings are packed into contiguous
+float64 buffers with an offsets index, then shoelace areas and centroids,
+bbox min/max and point sums are computed for the whole batch at once. NumPy is used when it is
+importable (e.g. via the optional numpy layer); otherwise a pure-Python path
+runs the same floating-point operations in the same order, so both backends
+return bit-identical results.
+"""
+import math
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy is only present when the optional layer is attached
+    np = None
+
+
+class GeometryBatch:
+    """Accumulates points and polygon outer rings for one kernel call"""
+
+    def __init__(self, use_numpy: Optional[bool] = None):
+        self.use_numpy = (np is not None) if use_numpy is None else (use_numpy and np is not None)
+        self.point_xs = array("d")
+        self.point_ys = array("d")
+        self.ring_xs = array("d")
+        self.ring_ys = array("d")
+        self.offsets = [0]
+        self._ring_arrays: List[Any] = []
+
+    @property
+    def vertex_count(self) -> int:
+        return len(self.point_xs) + self.offsets[-1]
+
+    @property
+    def ring_count(self) -> int:
+        return len(self.offsets) - 1
+
+    def add_point(self, x: float, y: float) -> None:
+        self.point_xs.append(x)
+        self.point_ys.append(y)
+
+    def add_ring(self, ring: Any) -> bool:
+        """Pack a ring; returns False (and adds nothing) if it has < 3 valid vertices"""
+        if not isinstance(ring, list) or len(ring) < 3:
+            return False
+
+        if self.use_numpy:
+            try:
+                pts = np.asarray(ring, dtype=np.float64)
+            except (TypeError, ValueError):
+                pts = None
+            if pts is None or pts.ndim != 2 or pts.shape[1] < 2:
+                pts = np.asarray(_valid_points(ring), dtype=np.float64).reshape(-1, 2)
+            if len(pts) < 3:
+                return False
+            self._ring_arrays.append(pts[:, :2])
+            self.offsets.append(self.offsets[-1] + len(pts))
+            return True
+
+        pts = _valid_points(ring)
+        if len(pts) < 3:
+            return False
+        for x, y in pts:
+            self.ring_xs.append(x)
+            self.ring_ys.append(y)
+        self.offsets.append(self.offsets[-1] + len(pts))
+        return True
+
+    def summarize(self) -> Dict[str, Any]:
+        """Run the kernel over everything packed so far"""
+        if self.use_numpy:
+            return _summarize_numpy(self)
+        return _summarize_python(self)
+
+
+def _valid_points(ring: list) -> List[Tuple[float, float]]:
+    return [(float(p[0]), float(p[1])) for p in ring if isinstance(p, list) and len(p) >= 2]
+
+
+def _empty_stats(batch: GeometryBatch) -> Dict[str, Any]:
+    return {
+        "pointCount": len(batch.point_xs),
+        "pointSum": [0.0, 0.0],
+        "polygonCount": batch.ring_count,
+        "areas": [],
+        "centroids": [],
+        "bbox": None,
+    }
+
+
+def _centroid(area2: float, cx_terms: List[float], cy_terms: List[float]) -> Optional[Tuple[float, float]]:
+    # area2 is twice the signed area; degenerate rings have no centroid
+    if not area2:
+        return None
+    return math.fsum(cx_terms) / (3.0 * area2), math.fsum(cy_terms) / (3.0 * area2)
+
+
+def _summarize_python(batch: GeometryBatch) -> Dict[str, Any]:
+    stats = _empty_stats(batch)
+    xs, ys = batch.ring_xs, batch.ring_ys
+    offsets = batch.offsets
+
+    areas = []
+    centroids = []
+    for k in range(batch.ring_count):
+        start, end = offsets[k], offsets[k + 1]
+        nxt = list(range(start + 1, end)) + [start]
+        terms = [xs[i] * ys[j] - xs[j] * ys[i] for i, j in zip(range(start, end), nxt)]
+        area2 = math.fsum(terms)
+        areas.append(abs(0.5 * area2))
+        centroids.append(_centroid(
+            area2,
+            [(xs[i] + xs[j]) * t for i, j, t in zip(range(start, end), nxt, terms)],
+            [(ys[i] + ys[j]) * t for i, j, t in zip(range(start, end), nxt, terms)],
+        ))
+    stats["areas"] = areas
+    stats["centroids"] = centroids
+
+    if batch.point_xs:
+        stats["pointSum"] = [math.fsum(batch.point_xs), math.fsum(batch.point_ys)]
+
+    all_x = list(batch.point_xs) + list(xs)
+    all_y = list(batch.point_ys) + list(ys)
+    if all_x:
+        stats["bbox"] = (min(all_x), min(all_y), max(all_x), max(all_y))
+    return stats
+
+
+def _summarize_numpy(batch: GeometryBatch) -> Dict[str, Any]:
+    stats = _empty_stats(batch)
+    px = np.frombuffer(batch.point_xs, dtype=np.float64)
+    py = np.frombuffer(batch.point_ys, dtype=np.float64)
+
+    if batch._ring_arrays:
+        xy = np.concatenate(batch._ring_arrays)
+        xs = np.ascontiguousarray(xy[:, 0])
+        ys = np.ascontiguousarray(xy[:, 1])
+        offsets = np.asarray(batch.offsets, dtype=np.int64)
+
+        # Successor of each vertex, wrapping the last vertex of a ring to its first
+        nxt = np.arange(1, len(xs) + 1, dtype=np.int64)
+        nxt[offsets[1:] - 1] = offsets[:-1]
+        cross = xs * ys[nxt] - xs[nxt] * ys
+        terms = cross.tolist()
+        cx_terms = ((xs + xs[nxt]) * cross).tolist()
+        cy_terms = ((ys + ys[nxt]) * cross).tolist()
+
+        # fsum per ring keeps the reduction exact and identical to the Python path
+        bounds = batch.offsets
+        area2 = [math.fsum(terms[bounds[k]:bounds[k + 1]]) for k in range(batch.ring_count)]
+        stats["areas"] = [abs(0.5 * a) for a in area2]
+        stats["centroids"] = [
+            _centroid(a, cx_terms[bounds[k]:bounds[k + 1]], cy_terms[bounds[k]:bounds[k + 1]])
+            for k, a in enumerate(area2)
+        ]
+    else:
+        xs = ys = np.empty(0, dtype=np.float64)
+
+    if len(px):
+        stats["pointSum"] = [math.fsum(px.tolist()), math.fsum(py.tolist())]
+
+    all_x = np.concatenate((px, xs))
+    all_y = np.concatenate((py, ys))
+    if len(all_x):
+        stats["bbox"] = (
+            float(all_x.min()), float(all_y.min()), float(all_x.max()), float(all_y.max())
+        )
+    return stats
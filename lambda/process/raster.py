@@ -0,0 +1,300 @@
+"""Tiled raster statistics for GeoTIFFs.
+
+A GeoTIFF is stored as internal tiles or strips ("blocks"). Each Map tile of a
+job owns a contiguous run of blocks, fetches only their byte ranges, decodes
+them (uncompressed, DEFLATE, LZW or PackBits, with optional horizontal
+predictor) and reduces them to per-band count/min/max/sum and histograms that
+the aggregate step can merge. Reductions use NumPy.
+"""
+import os
+import zlib
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from sgaf_core.geotiff import (
+    BITS_PER_SAMPLE, COMPRESSION, GDAL_NODATA, IMAGE_LENGTH, IMAGE_WIDTH,
+    PLANAR_CONFIGURATION, PREDICTOR, ROWS_PER_STRIP, SAMPLE_FORMAT,
+    SAMPLES_PER_PIXEL, STRIP_BYTE_COUNTS, STRIP_OFFSETS, TILE_BYTE_COUNTS,
+    TILE_LENGTH, TILE_OFFSETS, TILE_WIDTH, TiffReader,
+)
+
+try:
+    import numpy as np
+except ImportError:  # numpy is only present when the optional layer is attached
+    np = None
+
+HISTOGRAM_BINS = int(os.environ.get("RASTER_HISTOGRAM_BINS", "256"))
+# "lo,hi" histogram range for float and 32/64-bit integer rasters, whose
+# per-tile ranges would otherwise not be mergeable
+HISTOGRAM_RANGE = os.environ.get("RASTER_HISTOGRAM_RANGE", "")
+# Adjacent block reads closer than this are coalesced into one ranged GET
+COALESCE_GAP_BYTES = 65536
+MAX_FETCH_BYTES = 8 * 1024 * 1024
+
+_COMPRESSION_NONE = 1
+_COMPRESSION_LZW = 5
+_COMPRESSION_DEFLATE = (8, 32946)
+_COMPRESSION_PACKBITS = 32773
+
+
+def block_layout(reader: TiffReader) -> Dict[str, Any]:
+    """Describe the internal tile/strip structure of the first image"""
+    width = int(reader.scalar(IMAGE_WIDTH, 0))
+    height = int(reader.scalar(IMAGE_LENGTH, 0))
+    samples = int(reader.scalar(SAMPLES_PER_PIXEL, 1))
+    bits = reader.value(BITS_PER_SAMPLE, (1,))
+    sample_format = int(reader.scalar(SAMPLE_FORMAT, 1))
+    planar = int(reader.scalar(PLANAR_CONFIGURATION, 1))
+
+    if reader.has(TILE_OFFSETS):
+        block_width = int(reader.scalar(TILE_WIDTH))
+        block_height = int(reader.scalar(TILE_LENGTH))
+        offsets = reader.value(TILE_OFFSETS)
+        byte_counts = reader.value(TILE_BYTE_COUNTS)
+        tiled = True
+    else:
+        block_width = width
+        block_height = min(int(reader.scalar(ROWS_PER_STRIP, height)), height) or height
+        offsets = reader.value(STRIP_OFFSETS)
+        byte_counts = reader.value(STRIP_BYTE_COUNTS)
+        tiled = False
+
+    across = -(-width // block_width)
+    down = -(-height // block_height)
+    nodata = reader.value(GDAL_NODATA)
+    return {
+        "width": width,
+        "height": height,
+        "samples": samples,
+        "bits": int(bits[0]),
+        "sampleFormat": sample_format,
+        "planar": planar,
+        "compression": int(reader.scalar(COMPRESSION, _COMPRESSION_NONE)),
+        "predictor": int(reader.scalar(PREDICTOR, 1)),
+        "tiled": tiled,
+        "blockWidth": block_width,
+        "blockHeight": block_height,
+        "blocksAcross": across,
+        "blocksPerPlane": across * down,
+        "offsets": offsets,
+        "byteCounts": byte_counts,
+        "endian": reader.endian,
+        "nodata": float(nodata.decode("ascii").strip()) if nodata else None,
+    }
+
+
+def tile_blocks(num_blocks: int, tile: int, num_tiles: int) -> range:
+    """Contiguous run of block indexes owned by a Map tile"""
+    num_tiles = max(1, num_tiles)
+    return range(num_blocks * tile // num_tiles, num_blocks * (tile + 1) // num_tiles)
+
+
+def fetch_blocks(
+    read_range: Callable[[int, int], bytes], layout: Dict[str, Any], indexes: range
+) -> Iterator[Tuple[int, bytes]]:
+    """Yield (block index, compressed bytes), coalescing nearby ranges into one GET"""
+    spans = sorted(
+        (layout["offsets"][k], layout["byteCounts"][k], k) for k in indexes if layout["byteCounts"][k]
+    )
+    group: List[Tuple[int, int, int]] = []
+    for span in spans + [None]:
+        if group and (
+            span is None
+            or span[0] - (group[-1][0] + group[-1][1]) > COALESCE_GAP_BYTES
+            or span[0] + span[1] - group[0][0] > MAX_FETCH_BYTES
+        ):
+            start = group[0][0]
+            data = read_range(start, group[-1][0] + group[-1][1] - start)
+            for offset, count, k in group:
+                yield k, data[offset - start:offset - start + count]
+            group = []
+        if span is not None:
+            group.append(span)
+
+
+def decode_block(layout: Dict[str, Any], index: int, data: bytes) -> Tuple[int, Any]:
+    """Decode one block to (first band, array of shape rows x cols x samples)"""
+    compression = layout["compression"]
+    if compression == _COMPRESSION_NONE:
+        raw = data
+    elif compression in _COMPRESSION_DEFLATE:
+        raw = zlib.decompress(data)
+    elif compression == _COMPRESSION_LZW:
+        raw = lzw_decode(data)
+    elif compression == _COMPRESSION_PACKBITS:
+        raw = packbits_decode(data)
+    else:
+        raise ValueError(f"Unsupported TIFF compression {compression}")
+
+    dtype = _dtype(layout)
+    planar = layout["planar"] == 2
+    samples = 1 if planar else layout["samples"]
+    plane, k = divmod(index, layout["blocksPerPlane"])
+    block_w = layout["blockWidth"]
+
+    if layout["tiled"]:
+        row0 = (k // layout["blocksAcross"]) * layout["blockHeight"]
+        col0 = (k % layout["blocksAcross"]) * block_w
+        full_rows = layout["blockHeight"]
+    else:
+        row0, col0 = k * layout["blockHeight"], 0
+        full_rows = -(-len(raw) // (block_w * samples * dtype.itemsize))
+    rows = min(layout["blockHeight"], layout["height"] - row0)
+    cols = min(block_w, layout["width"] - col0)
+
+    count = min(full_rows * block_w * samples, len(raw) // dtype.itemsize)
+    arr = np.frombuffer(raw, dtype=dtype, count=count)
+    arr = arr[:(count // (block_w * samples)) * block_w * samples].reshape(-1, block_w, samples)
+
+    if layout["predictor"] == 2:
+        arr = np.cumsum(arr, axis=1, dtype=arr.dtype)
+    elif layout["predictor"] != 1:
+        raise ValueError(f"Unsupported TIFF predictor {layout['predictor']}")
+
+    return (plane if planar else 0), arr[:rows, :cols, :]
+
+
+def _dtype(layout: Dict[str, Any]) -> Any:
+    kind = {1: "u", 2: "i", 3: "f"}.get(layout["sampleFormat"])
+    bits = layout["bits"]
+    if kind is None or bits not in (8, 16, 32, 64) or (kind == "f" and bits < 32):
+        raise ValueError(f"Unsupported sample format {layout['sampleFormat']}/{bits}")
+    return np.dtype(f"{layout['endian']}{kind}{bits // 8}")
+
+
+def _histogram_range(dtype: Any) -> Optional[Tuple[float, float]]:
+    if HISTOGRAM_RANGE:
+        lo, hi = (float(v) for v in HISTOGRAM_RANGE.split(","))
+        return lo, hi
+    if dtype.kind in "ui" and dtype.itemsize <= 2:
+        info = np.iinfo(dtype)
+        return float(info.min), float(info.max) + 1.0
+    return None
+
+
+class BandAccumulator:
+    """Running count/min/max/sum/histogram for one band"""
+
+    def __init__(self, band: int, hist_range: Optional[Tuple[float, float]]):
+        self.band = band
+        self.count = 0
+        self.nodata_count = 0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self.sum = 0.0
+        self.hist_range = hist_range
+        self.hist = np.zeros(HISTOGRAM_BINS, dtype=np.int64) if hist_range else None
+
+    def add(self, values: Any, nodata: Optional[float]) -> None:
+        values = values.ravel()
+        valid = np.ones(values.shape, dtype=bool)
+        if nodata is not None:
+            valid &= values != nodata
+        if values.dtype.kind == "f":
+            valid &= ~np.isnan(values)
+        self.nodata_count += int(values.size - np.count_nonzero(valid))
+        values = values[valid]
+        if not values.size:
+            return
+        vmin, vmax = float(values.min()), float(values.max())
+        self.min = vmin if self.min is None else min(self.min, vmin)
+        self.max = vmax if self.max is None else max(self.max, vmax)
+        self.sum += float(values.sum(dtype=np.float64))
+        self.count += int(values.size)
+        if self.hist is not None:
+            self.hist += np.histogram(values, bins=HISTOGRAM_BINS, range=self.hist_range)[0]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "band": self.band,
+            "count": self.count,
+            "nodataCount": self.nodata_count,
+            "min": self.min,
+            "max": self.max,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else None,
+            "histogram": {
+                "range": list(self.hist_range),
+                "counts": self.hist.tolist(),
+            } if self.hist is not None else None,
+        }
+
+
+def tile_statistics(
+    reader: TiffReader, read_range: Callable[[int, int], bytes], tile: int, num_tiles: int
+) -> Dict[str, Any]:
+    """Reduce the blocks owned by this Map tile to per-band statistics"""
+    layout = block_layout(reader)
+    num_blocks = len(layout["offsets"])
+    indexes = tile_blocks(num_blocks, tile, num_tiles)
+    dtype = _dtype(layout)
+    hist_range = _histogram_range(dtype)
+    bands = [BandAccumulator(b, hist_range) for b in range(layout["samples"])]
+
+    bytes_read = 0
+    for index, data in fetch_blocks(read_range, layout, indexes):
+        bytes_read += len(data)
+        first_band, arr = decode_block(layout, index, data)
+        for s in range(arr.shape[2]):
+            bands[first_band + s].add(arr[:, :, s], layout["nodata"])
+
+    return {
+        "blocks": [indexes.start, indexes.stop],
+        "numBlocks": num_blocks,
+        "blockBytes": bytes_read,
+        "bands": [b.to_dict() for b in bands],
+    }
+
+
+def lzw_decode(data: bytes) -> bytes:
+    """Decode TIFF-flavoured LZW (MSB-first codes, early code-width change)"""
+    clear, eoi = 256, 257
+    table = [bytes([i]) for i in range(256)] + [b"", b""]
+    out = bytearray()
+    padded = data + b"\x00\x00\x00"
+    total_bits = len(data) * 8
+    bitpos = 0
+    width = 9
+    prev = None
+
+    while bitpos + width <= total_bits:
+        byte = bitpos >> 3
+        window = (padded[byte] << 16) | (padded[byte + 1] << 8) | padded[byte + 2]
+        code = (window >> (24 - (bitpos & 7) - width)) & ((1 << width) - 1)
+        bitpos += width
+
+        if code == clear:
+            del table[258:]
+            width = 9
+            prev = None
+            continue
+        if code == eoi:
+            break
+        if prev is None:
+            entry = table[code]
+        elif code < len(table):
+            entry = table[code]
+            table.append(prev + entry[:1])
+        else:
+            entry = prev + prev[:1]
+            table.append(entry)
+        out += entry
+        prev = entry
+        if len(table) + 1 >= (1 << width) and width < 12:
+            width += 1
+
+    return bytes(out)
+
+
+def packbits_decode(data: bytes) -> bytes:
+    out = bytearray()
+    i = 0
+    while i < len(data):
+        n = data[i]
+        i += 1
+        if n < 128:
+            out += data[i:i + n + 1]
+            i += n + 1
+        elif n > 128:
+            out += data[i:i + 1] * (257 - n)
+            i += 1
+    return bytes(out)
@@ -0,0 +1,115 @@
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import boto3
+from boto3.dynamodb.conditions import Key
+from boto3.dynamodb.types import TypeDeserializer
+
+from sgaf_core.status import job_view
+from sgaf_core.statuscache import RedisTier, StatusCache
+
+DYNAMODB_TABLE = os.environ.get("DYNAMODB_TABLE", "")
+CONNECTIONS_TABLE = os.environ.get("CONNECTIONS_TABLE", "")
+WEBSOCKET_ENDPOINT = os.environ.get("WEBSOCKET_ENDPOINT", "")
+# API Gateway closes WebSocket connections after 2 hours at most
+SUBSCRIPTION_TTL_SECONDS = int(os.environ.get("SUBSCRIPTION_TTL_SECONDS", "7200"))
+# Shared tier of the API's status cache, invalidated on every job write
+STATUS_CACHE_URL = os.environ.get("STATUS_CACHE_URL", "")
+
+dynamodb = boto3.resource("dynamodb")
+table = dynamodb.Table(DYNAMODB_TABLE) if DYNAMODB_TABLE else None
+connections = dynamodb.Table(CONNECTIONS_TABLE) if CONNECTIONS_TABLE else None
+management = (
+    boto3.client("apigatewaymanagementapi", endpoint_url=WEBSOCKET_ENDPOINT)
+    if WEBSOCKET_ENDPOINT else None
+)
+_deserializer = TypeDeserializer()
+status_cache = StatusCache(shared=RedisTier(STATUS_CACHE_URL)) if STATUS_CACHE_URL else None
+
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """Push job status changes to WebSocket subscribers.
+
+    Invoked by the WebSocket API's subscribe route and by the JobsTable
+    stream. A client sends {"action": "subscribe", "datasetId": ...} and gets
+    the job's current status at once, then a message in the GET /status
+    format on every status change.
+    """
+    if "requestContext" in event:
+        return _handle_socket(event)
+    return _handle_stream(event.get("Records", []))
+
+
+def _handle_socket(event: Dict[str, Any]) -> Dict[str, Any]:
+    connection_id = event["requestContext"]["connectionId"]
+    try:
+        dataset_id = json.loads(event.get("body") or "{}").get("datasetId")
+    except ValueError:
+        dataset_id = None
+    if not isinstance(dataset_id, str) or not dataset_id:
+        return {"statusCode": 400, "body": "Missing datasetId"}
+
+    connections.put_item(
+        Item={
+            "datasetId": dataset_id,
+            "connectionId": connection_id,
+            "ttl": int(time.time()) + SUBSCRIPTION_TTL_SECONDS,
+        }
+    )
+
+    # The job may have changed before the subscription existed
+    item = table.get_item(Key={"datasetId": dataset_id}).get("Item")
+    if item:
+        _send(dataset_id, connection_id, job_view(item))
+    return {"statusCode": 200}
+
+
+def _handle_stream(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    # Only the latest status change per job in a batch is pushed
+    changed: Dict[str, Dict[str, Any]] = {}
+    for rec in records:
+        images = rec.get("dynamodb", {})
+        new = _deserialize(images.get("NewImage"))
+        old = _deserialize(images.get("OldImage"))
+        if status_cache is not None and (new or old):
+            # Ingest, aggregate and MarkJobFailed all write through this stream
+            status_cache.invalidate((new or old)["datasetId"])
+        if not new or (old and old.get("status") == new.get("status")):
+            continue
+        changed[new["datasetId"]] = new
+
+    pushed = 0
+    for dataset_id, item in changed.items():
+        message = job_view(item)
+        for sub in _subscribers(dataset_id):
+            if _send(dataset_id, sub["connectionId"], message):
+                pushed += 1
+    return {"pushed": pushed}
+
+
+def _deserialize(image: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if not image:
+        return None
+    return {k: _deserializer.deserialize(v) for k, v in image.items()}
+
+
+def _subscribers(dataset_id: str) -> List[Dict[str, Any]]:
+    response = connections.query(KeyConditionExpression=Key("datasetId").eq(dataset_id))
+    return response.get("Items", [])
+
+
+def _send(dataset_id: str, connection_id: str, message: Dict[str, Any]) -> bool:
+    try:
+        management.post_to_connection(
+            ConnectionId=connection_id,
+            Data=json.dumps(message).encode("utf-8"),
+        )
+        return True
+    except management.exceptions.GoneException:
+        # The client went away; stop pushing to it
+        connections.delete_item(Key={"datasetId": dataset_id, "connectionId": connection_id})
+    except Exception as e:
+        print(f"Error pushing to {connection_id}: {e}")
+    return False
@@ -0,0 +1 @@
+"""Shared SGAF library, deployed as a Lambda layer and importable by every handler."""
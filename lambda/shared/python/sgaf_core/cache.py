@@ -0,0 +1,113 @@
+"""Content-addressed cache of completed job results.
+
+A completed job is recorded under cache/{key}.json, where the key hashes the
+source object's ETag and size together with the processing config. When the
+same bytes are uploaded again, ingest copies the cached dataset's manifest
+and artifacts to the new dataset ID instead of re-processing.
+
+Every hit re-points the entry at the newest copy and rewrites it. The output
+bucket's lifecycle rule expires objects a fixed number of days after their
+last write, so an entry lives until it goes unused for that long (LRU by
+age). expiresAt enforces the same TTL when the entry is read, which covers
+the window before lifecycle cleanup runs.
+"""
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from .manifest import manifest_key, write_manifest
+
+# Bump when processing changes in a way that alters manifests
+CACHE_VERSION = 1
+
+
+def cache_key(etag: str, size: int, config: Dict[str, Any]) -> str:
+    material = json.dumps(
+        {"v": CACHE_VERSION, "eTag": etag.strip('"'), "size": int(size), "config": config},
+        sort_keys=True,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def entry_key(key: str) -> str:
+    return f"cache/{key}.json"
+
+
+def lookup(s3: Any, bucket: str, key: str) -> Optional[Dict[str, Any]]:
+    try:
+        entry = json.loads(s3.get_object(Bucket=bucket, Key=entry_key(key))["Body"].read())
+    except s3.exceptions.NoSuchKey:
+        return None
+    if entry.get("expiresAt", "") < datetime.utcnow().isoformat():
+        return None
+    return entry
+
+
+def record(
+    s3: Any,
+    bucket: str,
+    key: str,
+    dataset_id: str,
+    object_key: str,
+    ttl_days: int,
+    hits: int = 0,
+) -> None:
+    """Point the entry at dataset_id's manifest and restart its TTL"""
+    now = datetime.utcnow()
+    s3.put_object(
+        Bucket=bucket,
+        Key=entry_key(key),
+        Body=json.dumps({
+            "datasetId": dataset_id,
+            "objectKey": object_key,
+            "manifestKey": manifest_key(dataset_id),
+            "hits": hits,
+            "lastAccessedAt": now.isoformat(),
+            "expiresAt": (now + timedelta(days=ttl_days)).isoformat(),
+        }).encode("utf-8"),
+        ContentType="application/json",
+    )
+
+
+def materialize(
+    s3: Any, bucket: str, entry: Dict[str, Any], dataset_id: str, object_key: str
+) -> Dict[str, Any]:
+    """Copy a cached result to dataset_id and return its manifest summary.
+
+    Artifact keys under the cached dataset's prefix are copied server side
+    and rewritten, and references to the cached source object point at the
+    new upload, which has the same bytes. Raises if the cached outputs have
+    already expired.
+    """
+    source_id = entry["datasetId"]
+    summary = json.loads(s3.get_object(Bucket=bucket, Key=entry["manifestKey"])["Body"].read())
+
+    prefix = f"{source_id}/"
+    artifacts: List[str] = []
+
+    def rewrite(value: Any) -> Any:
+        if isinstance(value, dict):
+            return {k: rewrite(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [rewrite(v) for v in value]
+        if isinstance(value, str):
+            if value == entry.get("objectKey"):
+                return object_key
+            if value.startswith(prefix):
+                artifacts.append(value)
+                return f"{dataset_id}/{value[len(prefix):]}"
+        return value
+
+    summary = rewrite(summary)
+    for key in dict.fromkeys(artifacts):
+        s3.copy_object(
+            Bucket=bucket,
+            Key=f"{dataset_id}/{key[len(prefix):]}",
+            CopySource={"Bucket": bucket, "Key": key},
+        )
+
+    summary["datasetId"] = dataset_id
+    summary["cachedFrom"] = source_id
+    write_manifest(s3, bucket, dataset_id, summary)
+    return summary
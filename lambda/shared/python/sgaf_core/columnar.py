@@ -0,0 +1,177 @@
+"""Compact columnar feature tables (.sgcol).
+
+Each process tile writes one part file. Rows are grouped into row groups,
+and within a group every column is stored as its own zlib-compressed block,
+so a reader fetches only the columns it needs with ranged reads. The JSON
+footer, located from the fixed-size trailer, lists the byte range of every
+block, as in Parquet.
+
+File layout:
+    MAGIC
+    column blocks, row group by row group
+    footer JSON {"version", "rows", "columns": [{name, type}],
+                 "rowGroups": [{"rows", "columns": {name: [offset, length]}}]}
+    footer length u32 (little endian), MAGIC
+
+Fixed-width columns are little-endian arrays. Binary and UTF-8 columns are
+stored as rows + 1 u64 offsets followed by the concatenated values.
+"""
+import json
+import struct
+import sys
+import zlib
+from array import array
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+MAGIC = b"SGC1"
+VERSION = 1
+ROW_GROUP_ROWS = 65536
+TRAILER = struct.Struct("<I4s")
+
+# Column name -> type; the order is the on-disk order within a row group
+SCHEMA = (
+    ("offset", "uint64"),
+    ("id", "utf8"),
+    ("geometryType", "uint8"),
+    ("minx", "float64"),
+    ("miny", "float64"),
+    ("maxx", "float64"),
+    ("maxy", "float64"),
+    ("area", "float64"),
+    ("centroidX", "float64"),
+    ("centroidY", "float64"),
+    ("wkb", "binary"),
+)
+
+_TYPECODES = {"uint64": "Q", "uint8": "B", "float64": "d"}
+
+
+class ColumnarWriter:
+    """Buffers feature rows column by column and serialises them to .sgcol"""
+
+    def __init__(self) -> None:
+        self.columns: Dict[str, Any] = {
+            name: array(_TYPECODES[ctype]) if ctype in _TYPECODES else []
+            for name, ctype in SCHEMA
+        }
+        self.rows = 0
+
+    def add_row(self, values: Dict[str, Any]) -> int:
+        """Append a row (missing values default to 0 / NaN / empty); returns its index"""
+        for name, ctype in SCHEMA:
+            value = values.get(name)
+            if ctype == "float64":
+                self.columns[name].append(float("nan") if value is None else float(value))
+            elif ctype in _TYPECODES:
+                self.columns[name].append(int(value or 0))
+            elif ctype == "utf8":
+                self.columns[name].append(("" if value is None else str(value)).encode("utf-8"))
+            else:
+                self.columns[name].append(bytes(value or b""))
+        self.rows += 1
+        return self.rows - 1
+
+    def set(self, row: int, name: str, value: float) -> None:
+        self.columns[name][row] = value
+
+    def to_bytes(self) -> bytes:
+        out = bytearray(MAGIC)
+        groups = []
+        for start in range(0, self.rows, ROW_GROUP_ROWS) or [0]:
+            end = min(start + ROW_GROUP_ROWS, self.rows)
+            blocks = {}
+            for name, ctype in SCHEMA:
+                block = zlib.compress(_encode(ctype, self.columns[name][start:end]))
+                blocks[name] = [len(out), len(block)]
+                out += block
+            groups.append({"rows": end - start, "columns": blocks})
+
+        footer = json.dumps({
+            "version": VERSION,
+            "rows": self.rows,
+            "columns": [{"name": name, "type": ctype} for name, ctype in SCHEMA],
+            "rowGroups": groups,
+        }).encode("utf-8")
+        out += footer
+        out += TRAILER.pack(len(footer), MAGIC)
+        return bytes(out)
+
+
+def _encode(ctype: str, values: Any) -> bytes:
+    if ctype in _TYPECODES:
+        arr = array(_TYPECODES[ctype], values)
+        if sys.byteorder != "little":
+            arr.byteswap()
+        return arr.tobytes()
+    offsets = array("Q", [0])
+    for v in values:
+        offsets.append(offsets[-1] + len(v))
+    if sys.byteorder != "little":
+        offsets.byteswap()
+    return offsets.tobytes() + b"".join(values)
+
+
+def _decode(ctype: str, data: bytes, rows: int) -> List[Any]:
+    if ctype in _TYPECODES:
+        arr = array(_TYPECODES[ctype])
+        arr.frombytes(data)
+        if sys.byteorder != "little":
+            arr.byteswap()
+        return arr.tolist()
+    offsets = array("Q")
+    offsets.frombytes(data[:8 * (rows + 1)])
+    if sys.byteorder != "little":
+        offsets.byteswap()
+    base = 8 * (rows + 1)
+    values = [data[base + offsets[i]:base + offsets[i + 1]] for i in range(rows)]
+    return [v.decode("utf-8") for v in values] if ctype == "utf8" else values
+
+
+def read_footer(read_range: Callable[[int, int], bytes], size: int) -> Dict[str, Any]:
+    """Read the footer of a part of the given size via read_range(offset, length)"""
+    tail = read_range(max(0, size - 65536), min(size, 65536))
+    length, magic = TRAILER.unpack(tail[-TRAILER.size:])
+    if magic != MAGIC:
+        raise ValueError("Not an .sgcol file")
+    if length + TRAILER.size > len(tail):
+        tail = read_range(size - length - TRAILER.size, length + TRAILER.size)
+    return json.loads(tail[-TRAILER.size - length:-TRAILER.size])
+
+
+def read_columns(
+    read_range: Callable[[int, int], bytes],
+    footer: Dict[str, Any],
+    names: Optional[Sequence[str]] = None,
+) -> Dict[str, List[Any]]:
+    """Read whole columns, fetching only the requested blocks"""
+    types = {c["name"]: c["type"] for c in footer["columns"]}
+    names = list(names or types)
+    out: Dict[str, List[Any]] = {name: [] for name in names}
+    for group in footer["rowGroups"]:
+        for name in names:
+            offset, length = group["columns"][name]
+            data = zlib.decompress(read_range(offset, length))
+            out[name].extend(_decode(types[name], data, group["rows"]))
+    return out
+
+
+def shift(data: bytes, name: str, delta: int) -> bytes:
+    """Return a copy of a table with delta added to an integer column"""
+    def read_range(offset: int, length: int) -> bytes:
+        return data[offset:offset + length]
+
+    footer = read_footer(read_range, len(data))
+    columns = read_columns(read_range, footer)
+    writer = ColumnarWriter()
+    for cname, ctype in SCHEMA:
+        values = columns[cname]
+        if cname == name:
+            values = [v + delta for v in values]
+        if ctype in _TYPECODES:
+            writer.columns[cname] = array(_TYPECODES[ctype], values)
+        elif ctype == "utf8":
+            writer.columns[cname] = [v.encode("utf-8") for v in values]
+        else:
+            writer.columns[cname] = values
+    writer.rows = footer["rows"]
+    return writer.to_bytes()
@@ -0,0 +1,28 @@
+import math
+from decimal import Decimal
+from typing import Any
+
+
+def to_dynamo(obj: Any) -> Any:
+    """Recursively convert floats to Decimal numbers; NaN and infinity become None"""
+    if isinstance(obj, float):
+        # repr round-trips exactly, unlike Decimal(float) which keeps binary noise
+        return Decimal(repr(obj)) if math.isfinite(obj) else None
+    elif isinstance(obj, dict):
+        return {key: to_dynamo(value) for key, value in obj.items()}
+    elif isinstance(obj, (list, tuple)):
+        return [to_dynamo(item) for item in obj]
+    else:
+        return obj
+
+
+def from_dynamo(obj: Any) -> Any:
+    """Recursively convert Decimal numbers read from DynamoDB to int or float"""
+    if isinstance(obj, Decimal):
+        return int(obj) if obj == obj.to_integral_value() else float(obj)
+    elif isinstance(obj, dict):
+        return {key: from_dynamo(value) for key, value in obj.items()}
+    elif isinstance(obj, list):
+        return [from_dynamo(item) for item in obj]
+    else:
+        return obj
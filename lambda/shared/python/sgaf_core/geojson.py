@@ -0,0 +1,112 @@
+import json
+import re
+from typing import Any, Iterator, List, Tuple
+
+_STRUCTURAL = re.compile(rb'[{}\[\]"]')
+_IN_FEATURE = re.compile(rb'[{}"]')
+_STRING_TAIL = re.compile(rb'[^"\\]*(?:\\.[^"\\]*)*"', re.S)
+
+
+class FeatureScanner:
+    """Incremental scanner that emits the raw bytes of each GeoJSON feature.
+
+    Chunks are fed in as they arrive; only the bytes of the feature currently
+    being assembled are retained, so memory is bounded by the largest feature.
+    Inside a feature only braces and strings are tracked, which lets long
+    coordinate arrays be skipped without per-bracket work. With array_body=True
+    the input is a bare comma-separated run of features (a ranged slice).
+    """
+
+    def __init__(self, array_body: bool = False):
+        self.buf = bytearray()
+        self.base = 0  # absolute offset of buf[0]
+        self.pos = 0
+        self.depth = 0
+        self.last_string = None
+        self.features_depth = 0 if array_body else None
+        self.start = None
+        self.feature_depth = 0
+        self.done = False
+
+    def feed(self, chunk: bytes) -> List[Tuple[int, int, bytes]]:
+        out: List[Tuple[int, int, bytes]] = []
+        if self.done:
+            return out
+        # Appended and trimmed in place, so a feature spanning many chunks
+        # is not copied again for every chunk
+        buf = self.buf
+        buf += chunk
+        pos = self.pos
+
+        while True:
+            m = (_IN_FEATURE if self.start is not None else _STRUCTURAL).search(buf, pos)
+            if not m:
+                pos = len(buf)
+                break
+            i = m.start()
+            ch = buf[i:i + 1]
+
+            if ch == b'"':
+                tail = _STRING_TAIL.match(buf, i + 1)
+                if not tail:
+                    # String continues in the next chunk
+                    pos = i
+                    break
+                if self.start is None and self.depth == 1:
+                    self.last_string = bytes(buf[i + 1:tail.end() - 1])
+                pos = tail.end()
+                continue
+
+            pos = i + 1
+            if self.start is not None:
+                if ch == b"{":
+                    self.feature_depth += 1
+                else:
+                    self.feature_depth -= 1
+                    if self.feature_depth == 0:
+                        out.append((self.base + self.start, self.base + pos, bytes(buf[self.start:pos])))
+                        self.start = None
+            elif ch == b"{" and self.depth == self.features_depth:
+                self.start = i
+                self.feature_depth = 1
+            elif ch in (b"{", b"["):
+                if self.features_depth is None and ch == b"[" and self.depth == 1 and self.last_string == b"features":
+                    self.features_depth = 2
+                self.depth += 1
+            else:
+                self.depth -= 1
+                if self.features_depth is not None and self.depth < self.features_depth:
+                    self.done = True
+                    break
+
+        # Drop everything before the feature (or string) still being assembled
+        keep = pos if self.start is None else self.start
+        del buf[:keep]
+        self.base += keep
+        self.pos = pos - keep
+        if self.start is not None:
+            self.start = 0
+        return out
+
+    def close(self) -> None:
+        if self.start is not None:
+            raise ValueError("Truncated GeoJSON feature")
+
+
+def iter_features(body: Any, chunk_size: int = 65536, array_body: bool = False) -> Iterator[Any]:
+    """Yield parsed features from an S3 StreamingBody without buffering the object"""
+    for _, _, feature in iter_feature_records(body, chunk_size, array_body):
+        yield feature
+
+
+def iter_feature_records(
+    body: Any, chunk_size: int = 65536, array_body: bool = False
+) -> Iterator[Tuple[int, int, Any]]:
+    """Like iter_features, but yield (start, end, feature) with byte offsets into the body"""
+    scanner = FeatureScanner(array_body)
+    for chunk in body.iter_chunks(chunk_size):
+        for start, end, raw in scanner.feed(chunk):
+            yield start, end, json.loads(raw)
+        if scanner.done:
+            break
+    scanner.close()
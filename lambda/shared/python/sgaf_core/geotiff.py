@@ -0,0 +1,218 @@
+"""Dependency-free TIFF/GeoTIFF tag reader built on ranged reads.
+
+Only the header, the first IFD and the out-of-line tag values that are
+actually requested are fetched, so georeferencing a raster costs a few KB of
+I/O regardless of its size. Classic TIFF and BigTIFF, in either byte order,
+are supported.
+"""
+import struct
+from typing import Any, Callable, Dict, List, Tuple
+
+# Baseline TIFF tags
+IMAGE_WIDTH = 256
+IMAGE_LENGTH = 257
+BITS_PER_SAMPLE = 258
+COMPRESSION = 259
+PHOTOMETRIC = 262
+STRIP_OFFSETS = 273
+SAMPLES_PER_PIXEL = 277
+ROWS_PER_STRIP = 278
+STRIP_BYTE_COUNTS = 279
+PLANAR_CONFIGURATION = 284
+PREDICTOR = 317
+TILE_WIDTH = 322
+TILE_LENGTH = 323
+TILE_OFFSETS = 324
+TILE_BYTE_COUNTS = 325
+SAMPLE_FORMAT = 339
+
+# GeoTIFF tags
+MODEL_PIXEL_SCALE = 33550
+MODEL_TIEPOINT = 33922
+MODEL_TRANSFORMATION = 34264
+GEO_KEY_DIRECTORY = 34735
+GEO_DOUBLE_PARAMS = 34736
+GEO_ASCII_PARAMS = 34737
+GDAL_NODATA = 42113
+
+# GeoKeys
+GT_RASTER_TYPE = 1025
+GEOGRAPHIC_TYPE = 2048
+PROJECTED_CS_TYPE = 3072
+RASTER_PIXEL_IS_POINT = 2
+
+# TIFF field type -> (struct code, byte size)
+_FIELD_TYPES = {
+    1: ("B", 1), 2: ("s", 1), 3: ("H", 2), 4: ("I", 4), 5: ("II", 8),
+    6: ("b", 1), 7: ("B", 1), 8: ("h", 2), 9: ("i", 4), 10: ("ii", 8),
+    11: ("f", 4), 12: ("d", 8), 16: ("Q", 8), 17: ("q", 8), 18: ("Q", 8),
+}
+
+HEADER_BYTES = 16384
+MIN_FETCH_BYTES = 4096
+
+
+class TiffReader:
+    """Reads tags from the first IFD of a TIFF through a read_range callable.
+
+    read_range(offset, length) must return up to length bytes starting at offset
+    (e.g. an S3 ranged GET). Fetched blocks are cached, and bytes_read records
+    the total I/O performed.
+    """
+
+    def __init__(self, read_range: Callable[[int, int], bytes], header_bytes: int = HEADER_BYTES):
+        self._read_range = read_range
+        self._blocks: List[Tuple[int, bytes]] = []
+        self.bytes_read = 0
+
+        head = self._read(0, 16, prefetch=header_bytes)
+        if head[:2] == b"II":
+            self.endian = "<"
+        elif head[:2] == b"MM":
+            self.endian = ">"
+        else:
+            raise ValueError("Not a TIFF file")
+
+        version = struct.unpack(self.endian + "H", head[2:4])[0]
+        if version == 42:
+            self.big = False
+            ifd_offset = struct.unpack(self.endian + "I", head[4:8])[0]
+        elif version == 43:
+            self.big = True
+            ifd_offset = struct.unpack(self.endian + "Q", head[8:16])[0]
+        else:
+            raise ValueError(f"Unsupported TIFF version {version}")
+
+        self.entries = self._read_ifd(ifd_offset)
+        self._values: Dict[int, Any] = {}
+
+    def _read(self, offset: int, length: int, prefetch: int = MIN_FETCH_BYTES) -> bytes:
+        for start, data in self._blocks:
+            if start <= offset and offset + length <= start + len(data):
+                return data[offset - start:offset - start + length]
+        data = self._read_range(offset, max(length, prefetch))
+        self.bytes_read += len(data)
+        self._blocks.append((offset, data))
+        if len(data) < length:
+            raise ValueError("Truncated TIFF")
+        return data[:length]
+
+    def _read_ifd(self, offset: int) -> Dict[int, Tuple[int, int, bytes]]:
+        count_fmt, entry_size, inline = ("Q", 20, 8) if self.big else ("H", 12, 4)
+        count_size = struct.calcsize(count_fmt)
+        count = struct.unpack(self.endian + count_fmt, self._read(offset, count_size))[0]
+        raw = self._read(offset + count_size, count * entry_size)
+
+        entries = {}
+        for k in range(count):
+            entry = raw[k * entry_size:(k + 1) * entry_size]
+            if self.big:
+                tag, ftype, n = struct.unpack(self.endian + "HHQ", entry[:12])
+            else:
+                tag, ftype, n = struct.unpack(self.endian + "HHI", entry[:8])
+            entries[tag] = (ftype, n, entry[-inline:])
+        return entries
+
+    def has(self, tag: int) -> bool:
+        return tag in self.entries
+
+    def value(self, tag: int, default: Any = None) -> Any:
+        """Return a tag's values as a tuple (bytes for ASCII), fetching out-of-line data"""
+        if tag not in self.entries:
+            return default
+        if tag in self._values:
+            return self._values[tag]
+
+        ftype, n, field = self.entries[tag]
+        code, size = _FIELD_TYPES.get(ftype, ("B", 1))
+        nbytes = size * n
+        inline = 8 if self.big else 4
+        if nbytes <= inline:
+            data = field[:nbytes]
+        else:
+            offset = struct.unpack(self.endian + ("Q" if self.big else "I"), field)[0]
+            data = self._read(offset, nbytes)
+
+        if ftype == 2:
+            val: Any = data.rstrip(b"\x00")
+        elif ftype in (5, 10):
+            parts = struct.unpack(self.endian + code[0] * (2 * n), data)
+            val = tuple(parts[i] / parts[i + 1] if parts[i + 1] else 0.0 for i in range(0, len(parts), 2))
+        else:
+            val = struct.unpack(self.endian + code * n, data)
+        self._values[tag] = val
+        return val
+
+    def scalar(self, tag: int, default: Any = None) -> Any:
+        val = self.value(tag)
+        return val[0] if val else default
+
+
+def block_count(reader: TiffReader) -> int:
+    """Number of internal tiles or strips, read from the IFD entry alone"""
+    tag = TILE_OFFSETS if reader.has(TILE_OFFSETS) else STRIP_OFFSETS
+    return reader.entries[tag][1] if reader.has(tag) else 0
+
+
+def geokeys(reader: TiffReader) -> Dict[int, Any]:
+    """Decode the GeoKeyDirectory into {key id: value}"""
+    directory = reader.value(GEO_KEY_DIRECTORY)
+    if not directory or len(directory) < 4:
+        return {}
+    doubles = reader.value(GEO_DOUBLE_PARAMS, ())
+    ascii_params = reader.value(GEO_ASCII_PARAMS, b"")
+
+    keys = {}
+    for k in range(directory[3]):
+        key_id, location, count, value = directory[4 + 4 * k:8 + 4 * k]
+        if location == 0:
+            keys[key_id] = value
+        elif location == GEO_DOUBLE_PARAMS:
+            keys[key_id] = doubles[value:value + count]
+        elif location == GEO_ASCII_PARAMS:
+            keys[key_id] = ascii_params[value:value + count].rstrip(b"|").decode("latin-1")
+    return keys
+
+
+def georeference(reader: TiffReader) -> Dict[str, Any]:
+    """Compute size, bbox and pixel area from the GeoTIFF model tags"""
+    width = int(reader.scalar(IMAGE_WIDTH, 0))
+    height = int(reader.scalar(IMAGE_LENGTH, 0))
+    keys = geokeys(reader)
+
+    # Pixel-is-point tiepoints refer to pixel centres; shift to the outer edge
+    shift = 0.5 if keys.get(GT_RASTER_TYPE) == RASTER_PIXEL_IS_POINT else 0.0
+
+    transform = reader.value(MODEL_TRANSFORMATION)
+    tiepoint = reader.value(MODEL_TIEPOINT)
+    scale = reader.value(MODEL_PIXEL_SCALE)
+    if transform and len(transform) >= 8:
+        a, b, _, d, e, f, _, h = transform[:8]
+    elif tiepoint and scale and len(tiepoint) >= 6 and len(scale) >= 2:
+        i, j, _, x, y, _ = tiepoint[:6]
+        a, b, d = scale[0], 0.0, x - i * scale[0]
+        e, f, h = 0.0, -scale[1], y + j * scale[1]
+    else:
+        return {
+            "width": width,
+            "height": height,
+            "bbox": None,
+            "pixelArea": None,
+            "epsg": None,
+        }
+
+    corners = [
+        (a * (col - shift) + b * (row - shift) + d, e * (col - shift) + f * (row - shift) + h)
+        for col, row in ((0, 0), (width, 0), (0, height), (width, height))
+    ]
+    xs = [c[0] for c in corners]
+    ys = [c[1] for c in corners]
+    epsg = keys.get(PROJECTED_CS_TYPE) or keys.get(GEOGRAPHIC_TYPE)
+
+    return {
+        "width": width,
+        "height": height,
+        "bbox": [min(xs), min(ys), max(xs), max(ys)],
+        "pixelArea": abs(a * f - b * e),
+        "epsg": epsg if isinstance(epsg, int) else None,
+    }
@@ -0,0 +1,18 @@
+import json
+from typing import Any, Dict
+
+
+def manifest_key(dataset_id: str) -> str:
+    return f"{dataset_id}/manifest.json"
+
+
+def write_manifest(s3: Any, bucket: str, dataset_id: str, summary: Dict[str, Any]) -> str:
+    """Write the job summary to {datasetId}/manifest.json and return its key"""
+    key = manifest_key(dataset_id)
+    s3.put_object(
+        Bucket=bucket,
+        Key=key,
+        Body=json.dumps(summary).encode("utf-8"),
+        ContentType="application/json",
+    )
+    return key
@@ -0,0 +1,94 @@
+"""Buffered CloudWatch metrics in Embedded Metric Format (EMF).
+
+put_metric only appends to an in-process buffer; flush() writes the buffer
+to stdout as EMF log lines, which CloudWatch Logs turns into metrics
+asynchronously. Handlers decorated with flush_metrics flush when they
+return or raise, so recording a metric never adds a network round trip.
+
+Metrics are grouped into one log line per namespace and dimension values,
+and repeated values of a metric are sent as one array. A metric recorded
+with dimensions is also published without them, so alarms and dashboards
+on the bare metric see the total.
+"""
+import functools
+import json
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# EMF limits per log line
+MAX_METRICS_PER_LINE = 100
+MAX_VALUES_PER_METRIC = 100
+
+_Group = Tuple[str, Tuple[Tuple[str, str], ...]]
+_buffer: Dict[_Group, Dict[str, Tuple[str, List[float]]]] = {}
+
+
+def put_metric(
+    namespace: str,
+    name: str,
+    value: float,
+    unit: str = "Count",
+    dimensions: Optional[Dict[str, str]] = None,
+) -> None:
+    group = (namespace, tuple(sorted((k, str(v)) for k, v in (dimensions or {}).items())))
+    metrics = _buffer.setdefault(group, {})
+    metrics.setdefault(name, (unit, []))[1].append(float(value))
+
+
+def flush() -> None:
+    """Write buffered metrics as EMF log lines and clear the buffer"""
+    timestamp = int(time.time() * 1000)
+    groups = list(_buffer.items())
+    _buffer.clear()
+    for (namespace, dims), metrics in groups:
+        for line in _emf_lines(namespace, dict(dims), metrics, timestamp):
+            print(json.dumps(line, separators=(",", ":")))
+
+
+def flush_metrics(handler: Callable[..., Any]) -> Callable[..., Any]:
+    """Decorate a Lambda handler to flush buffered metrics when it finishes"""
+    @functools.wraps(handler)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        try:
+            return handler(*args, **kwargs)
+        finally:
+            flush()
+    return wrapper
+
+
+def _emf_lines(
+    namespace: str,
+    dims: Dict[str, str],
+    metrics: Dict[str, Tuple[str, List[float]]],
+    timestamp: int,
+) -> List[Dict[str, Any]]:
+    dimension_sets = [sorted(dims), []] if dims else [[]]
+    # Split into lines of at most MAX_METRICS_PER_LINE metrics and
+    # MAX_VALUES_PER_METRIC values per metric
+    chunks: List[Dict[str, Tuple[str, List[float]]]] = []
+    for name, (unit, values) in metrics.items():
+        for start in range(0, len(values), MAX_VALUES_PER_METRIC):
+            i = 0
+            while i < len(chunks) and (name in chunks[i] or len(chunks[i]) >= MAX_METRICS_PER_LINE):
+                i += 1
+            if i == len(chunks):
+                chunks.append({})
+            chunks[i][name] = (unit, values[start:start + MAX_VALUES_PER_METRIC])
+
+    lines = []
+    for chunk in chunks:
+        line: Dict[str, Any] = {
+            "_aws": {
+                "Timestamp": timestamp,
+                "CloudWatchMetrics": [{
+                    "Namespace": namespace,
+                    "Dimensions": dimension_sets,
+                    "Metrics": [{"Name": name, "Unit": unit} for name, (unit, _) in chunk.items()],
+                }],
+            },
+            **dims,
+        }
+        for name, (_, values) in chunk.items():
+            line[name] = values[0] if len(values) == 1 else values
+        lines.append(line)
+    return lines
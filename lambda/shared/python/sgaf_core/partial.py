@@ -0,0 +1,128 @@
+"""Exact, mergeable partial aggregates for tile results.
+
+A partial is a JSON-serialisable dict holding counts, a bbox and floating
+point sums kept as Shewchuk expansions (the non-overlapping partials used by
+math.fsum). An expansion represents its sum exactly, so merging partials is
+associative and commutative and the finalized totals are the correctly
+rounded exact sums, independent of shard order or reduction tree shape.
+"""
+import math
+from typing import Any, Dict, Iterable, List, Optional
+
+PARTIAL_VERSION = 1
+
+_SUM_FIELDS = ("pointSumX", "pointSumY", "polygonArea")
+_COUNT_FIELDS = ("pointCount", "polygonCount", "otherCount")
+
+
+def grow(partials: List[float], x: float) -> List[float]:
+    """Add x to an expansion in place (Shewchuk's grow-expansion, as in fsum)"""
+    i = 0
+    for y in partials:
+        if abs(x) < abs(y):
+            x, y = y, x
+        hi = x + y
+        lo = y - (hi - x)
+        if lo:
+            partials[i] = lo
+            i += 1
+        x = hi
+    partials[i:] = [x]
+    return partials
+
+
+def empty() -> Dict[str, Any]:
+    partial: Dict[str, Any] = {"v": PARTIAL_VERSION, "bbox": None}
+    for field in _COUNT_FIELDS:
+        partial[field] = 0
+    for field in _SUM_FIELDS:
+        partial[field] = [0.0]
+    return partial
+
+
+def add_sum(partial: Dict[str, Any], field: str, value: float) -> None:
+    grow(partial[field], float(value))
+
+
+def add_bbox(partial: Dict[str, Any], bbox: Optional[List[float]]) -> None:
+    if not bbox:
+        return
+    current = partial["bbox"]
+    if current is None:
+        partial["bbox"] = [float(v) for v in bbox]
+    else:
+        partial["bbox"] = [
+            min(current[0], bbox[0]),
+            min(current[1], bbox[1]),
+            max(current[2], bbox[2]),
+            max(current[3], bbox[3]),
+        ]
+
+
+def from_totals(
+    point_count: int = 0,
+    point_sum: Optional[List[float]] = None,
+    polygon_count: int = 0,
+    polygon_area: float = 0.0,
+    other_count: int = 0,
+    bbox: Optional[List[float]] = None,
+) -> Dict[str, Any]:
+    """Build a partial from already-rounded totals (e.g. legacy tile results)"""
+    partial = empty()
+    partial["pointCount"] = int(point_count)
+    partial["polygonCount"] = int(polygon_count)
+    partial["otherCount"] = int(other_count)
+    point_sum = point_sum or [0.0, 0.0]
+    add_sum(partial, "pointSumX", point_sum[0])
+    add_sum(partial, "pointSumY", point_sum[1])
+    add_sum(partial, "polygonArea", polygon_area)
+    add_bbox(partial, bbox)
+    return partial
+
+
+def merge(a: Dict[str, Any], b: Dict[str, Any]) -> Dict[str, Any]:
+    """Associative, commutative merge of two partials into a new one"""
+    out = empty()
+    for field in _COUNT_FIELDS:
+        out[field] = int(a.get(field, 0)) + int(b.get(field, 0))
+    for field in _SUM_FIELDS:
+        acc = list(a.get(field) or [0.0])
+        for x in b.get(field) or ():
+            grow(acc, float(x))
+        out[field] = acc
+    add_bbox(out, a.get("bbox"))
+    add_bbox(out, b.get("bbox"))
+    return out
+
+
+def merge_all(partials: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Tree-reduce any number of partials pairwise"""
+    level = list(partials)
+    if not level:
+        return empty()
+    while len(level) > 1:
+        nxt = [merge(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            nxt.append(level[-1])
+        level = nxt
+    return level[0]
+
+
+def total(partial: Dict[str, Any], field: str) -> float:
+    return math.fsum(partial.get(field) or ())
+
+
+def finalize(partial: Dict[str, Any]) -> Dict[str, Any]:
+    """Collapse a partial into the summary fields used by manifests"""
+    point_count = int(partial.get("pointCount", 0))
+    sum_x = total(partial, "pointSumX")
+    sum_y = total(partial, "pointSumY")
+    return {
+        "bbox": partial.get("bbox"),
+        "pointCount": point_count,
+        "pointSum": [sum_x, sum_y],
+        "pointCentroid": [sum_x / point_count, sum_y / point_count] if point_count else None,
+        "polygonCount": int(partial.get("polygonCount", 0)),
+        "polygonArea": total(partial, "polygonArea"),
+        "otherCount": int(partial.get("otherCount", 0)),
+    }
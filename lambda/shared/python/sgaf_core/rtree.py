@@ -0,0 +1,180 @@
+"""Packed Hilbert R-tree over feature bboxes and byte offsets.
+
+The layout follows FlatGeobuf's static index: items are sorted by the
+Hilbert value of their bbox centre, grouped NODE_SIZE at a time into parent
+nodes, and all levels are stored root first as fixed-size records. Level
+boundaries follow from the item count alone, so a reader can walk the tree
+with a few ranged reads and never loads the whole index.
+
+File layout (little endian):
+    header  MAGIC, version u16, node size u16, item count u64, node count u64
+    nodes   minx, miny, maxx, maxy f64, offset u64, length u64
+
+Leaf offset/length give the feature's byte span in the source object. For
+internal nodes, offset is the index of the first child node.
+"""
+import struct
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+MAGIC = b"SGRT"
+VERSION = 1
+NODE_SIZE = 16
+HEADER = struct.Struct("<4sHHQQ")
+NODE = struct.Struct("<ddddQQ")
+
+HILBERT_MAX = (1 << 16) - 1
+
+# (minx, miny, maxx, maxy, offset, length)
+Item = Tuple[float, float, float, float, int, int]
+
+
+def level_bounds(num_items: int, node_size: int = NODE_SIZE) -> List[Tuple[int, int]]:
+    """Node index ranges per level, leaves first, for a tree stored root first"""
+    counts = [num_items]
+    n = num_items
+    while n > 1:
+        n = -(-n // node_size)
+        counts.append(n)
+    bounds = []
+    end = sum(counts)
+    for count in counts:
+        bounds.append((end - count, end))
+        end -= count
+    return bounds
+
+
+def hilbert(x: int, y: int, order: int = 16) -> int:
+    """Distance of cell (x, y) along a Hilbert curve over a 2^order grid"""
+    d = 0
+    s = 1 << (order - 1)
+    while s:
+        rx = 1 if x & s else 0
+        ry = 1 if y & s else 0
+        d += s * s * ((3 * rx) ^ ry)
+        if not ry:
+            if rx:
+                x = s - 1 - x
+                y = s - 1 - y
+            x, y = y, x
+        s >>= 1
+    return d
+
+
+def extent(items: Iterable[Item]) -> Optional[Tuple[float, float, float, float]]:
+    box = None
+    for it in items:
+        if box is None:
+            box = [it[0], it[1], it[2], it[3]]
+        else:
+            box[0] = min(box[0], it[0])
+            box[1] = min(box[1], it[1])
+            box[2] = max(box[2], it[2])
+            box[3] = max(box[3], it[3])
+    return tuple(box) if box else None
+
+
+def hilbert_sort(items: List[Item]) -> List[Item]:
+    box = extent(items)
+    if box is None:
+        return items
+    width = (box[2] - box[0]) or 1.0
+    height = (box[3] - box[1]) or 1.0
+
+    def key(it: Item) -> int:
+        x = int(HILBERT_MAX * ((it[0] + it[2]) / 2 - box[0]) / width)
+        y = int(HILBERT_MAX * ((it[1] + it[3]) / 2 - box[1]) / height)
+        return hilbert(x, y)
+
+    return sorted(items, key=key)
+
+
+def build(items: Sequence[Item], node_size: int = NODE_SIZE) -> bytes:
+    """Serialise a packed R-tree; items must already be in the desired order"""
+    bounds = level_bounds(len(items), node_size)
+    nodes: List[Optional[Item]] = [None] * bounds[0][1]
+
+    leaf_start = bounds[0][0]
+    for k, it in enumerate(items):
+        nodes[leaf_start + k] = it
+
+    for level in range(1, len(bounds)):
+        child_start, child_end = bounds[level - 1]
+        start = bounds[level][0]
+        for k, first in enumerate(range(child_start, child_end, node_size)):
+            children = nodes[first:min(first + node_size, child_end)]
+            box = extent(children)
+            nodes[start + k] = (box[0], box[1], box[2], box[3], first, 0)
+
+    out = bytearray(HEADER.pack(MAGIC, VERSION, node_size, len(items), len(nodes)))
+    for node in nodes:
+        out += NODE.pack(*node)
+    return bytes(out)
+
+
+def parse_header(data: bytes) -> Tuple[int, int, int]:
+    """Return (node size, item count, node count)"""
+    magic, version, node_size, num_items, num_nodes = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not an SGAF R-tree index")
+    return node_size, num_items, num_nodes
+
+
+def read_items(data: bytes) -> List[Item]:
+    """Leaf items of an in-memory index, in stored order"""
+    node_size, num_items, _ = parse_header(data)
+    start = level_bounds(num_items, node_size)[0][0] if num_items else 0
+    base = HEADER.size + start * NODE.size
+    return [NODE.unpack_from(data, base + k * NODE.size) for k in range(num_items)]
+
+
+def _intersects(node: Item, bbox: Sequence[float]) -> bool:
+    return not (node[2] < bbox[0] or node[3] < bbox[1] or node[0] > bbox[2] or node[1] > bbox[3])
+
+
+def search(
+    read_nodes: Callable[[int, int], bytes],
+    node_size: int,
+    num_items: int,
+    bbox: Sequence[float],
+    start: int = 0,
+) -> Iterator[Tuple[int, Item]]:
+    """Yield (leaf index, item) for items whose bbox intersects bbox.
+
+    read_nodes(first, count) returns the records of count consecutive nodes,
+    e.g. via a ranged GET. The tree is walked depth first with one read per
+    visited node's children, so leaves come out in stored (Hilbert) order and
+    a caller that stops early never reads the rest of the tree. Leaves before
+    start (a previous page's cursor) are skipped without visiting their
+    subtrees: a node at level L covers leaves [k * size^L, (k + 1) * size^L).
+    """
+    if not num_items:
+        return
+    bounds = level_bounds(num_items, node_size)
+    top = len(bounds) - 1
+    stack = [(top, bounds[top][0], bounds[top][1])]
+
+    while stack:
+        level, first, end = stack.pop()
+        data = read_nodes(first, end - first)
+        level_start = bounds[level][0]
+        span = node_size ** level
+        children = []
+        for k in range(end - first):
+            rel = first + k - level_start
+            if (rel + 1) * span <= start:
+                continue
+            node = NODE.unpack_from(data, k * NODE.size)
+            if not _intersects(node, bbox):
+                continue
+            if level == 0:
+                yield rel, node
+            else:
+                child_end = bounds[level - 1][1]
+                children.append((level - 1, node[4], min(node[4] + node_size, child_end)))
+        stack.extend(reversed(children))
+
+
+def node_range(first: int, count: int) -> Tuple[int, int]:
+    """Byte range [start, end) of count nodes starting at node index first"""
+    start = HEADER.size + first * NODE.size
+    return start, start + count * NODE.size
@@ -0,0 +1,127 @@
+"""Spatial partitioning helpers for grid-sharded jobs.
+
+Ingest splits the dataset extent into spatially coherent cells with a
+kd-style recursive median split over a sample of feature centres, so each
+cell receives about the same number of features. Cells are half-open
+rectangles ([min, max) on both axes) whose outer edges are unbounded
+(None), so together they tile the plane without gaps or overlaps and every
+feature lands in exactly one cell. kd_tree also returns the splits, so
+ingest can assign every feature to its cell in O(log n) with locate_cell.
+"""
+from typing import Any, List, Optional, Sequence, Tuple, Union
+
+Cell = List[Optional[float]]
+# A leaf is its cell's index; a split is (axis, value, lower subtree, upper subtree)
+KdNode = Union[int, Tuple[int, float, Any, Any]]
+
+
+def geometry_bbox(geom: Any) -> Optional[Tuple[float, float, float, float]]:
+    """Bounding box of any GeoJSON geometry, or None if it has no coordinates"""
+    if not isinstance(geom, dict):
+        return None
+    if geom.get("type") == "GeometryCollection":
+        boxes = [b for b in (geometry_bbox(g) for g in geom.get("geometries") or []) if b]
+        if not boxes:
+            return None
+        return (
+            min(b[0] for b in boxes), min(b[1] for b in boxes),
+            max(b[2] for b in boxes), max(b[3] for b in boxes),
+        )
+
+    xs: List[float] = []
+    ys: List[float] = []
+    stack = [geom.get("coordinates")]
+    while stack:
+        node = stack.pop()
+        if not isinstance(node, list) or not node:
+            continue
+        if isinstance(node[0], (int, float)):
+            if len(node) >= 2:
+                xs.append(float(node[0]))
+                ys.append(float(node[1]))
+        else:
+            stack.extend(node)
+    if not xs:
+        return None
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def feature_center(feature: Any) -> Optional[Tuple[float, float]]:
+    if not isinstance(feature, dict):
+        return None
+    bbox = geometry_bbox(feature.get("geometry"))
+    if bbox is None:
+        return None
+    return (bbox[0] + bbox[2]) / 2.0, (bbox[1] + bbox[3]) / 2.0
+
+
+def kd_partition(points: Sequence[Tuple[float, float]], num_cells: int) -> List[Cell]:
+    """Split the plane into num_cells cells holding roughly equal sample counts"""
+    return kd_tree(points, num_cells)[0]
+
+
+def kd_tree(points: Sequence[Tuple[float, float]], num_cells: int) -> Tuple[List[Cell], KdNode]:
+    """Like kd_partition, but also return the split tree for locate_cell"""
+    cells: List[Cell] = []
+    root = _split(list(points), max(1, num_cells), [None, None, None, None], cells)
+    return cells, root
+
+
+def locate_cell(root: KdNode, x: float, y: float) -> int:
+    """Index of the kd_tree cell containing (x, y); agrees with cell_contains"""
+    node = root
+    while not isinstance(node, int):
+        axis, split, lower, upper = node
+        node = lower if (x if axis == 0 else y) < split else upper
+    return node
+
+
+def _split(points: List[Tuple[float, float]], n: int, cell: Cell, out: List[Cell]) -> KdNode:
+    if n == 1 or not points:
+        # Without samples there is nothing to balance; further splits would be empty
+        leaf = len(out)
+        out.append(cell)
+        for _ in range(n - 1):
+            out.append(_empty_cell(cell))
+        return leaf
+
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    axis = 0 if (max(xs) - min(xs)) >= (max(ys) - min(ys)) else 1
+    points.sort(key=lambda p: p[axis])
+
+    left_n = n // 2
+    at = min(len(points) - 1, max(1, len(points) * left_n // n))
+    split = points[at][axis]
+
+    left = list(cell)
+    right = list(cell)
+    left[axis + 2] = split
+    right[axis] = split
+    lower = _split([p for p in points if p[axis] < split], left_n, left, out)
+    upper = _split([p for p in points if p[axis] >= split], n - left_n, right, out)
+    return axis, split, lower, upper
+
+
+def _empty_cell(cell: Cell) -> Cell:
+    # A zero-width cell at the parent's lower edge; it contains nothing
+    edge = cell[0] if cell[0] is not None else 0.0
+    return [edge, cell[1], edge, cell[3]]
+
+
+def cell_contains(cell: Cell, x: float, y: float) -> bool:
+    minx, miny, maxx, maxy = cell
+    return (
+        (minx is None or x >= minx)
+        and (maxx is None or x < maxx)
+        and (miny is None or y >= miny)
+        and (maxy is None or y < maxy)
+    )
+
+
+def clip_cell(cell: Cell, bbox: Optional[List[float]]) -> Optional[List[float]]:
+    """Bound a cell's open edges by the dataset bbox for reporting"""
+    if not bbox:
+        return None
+    minx, miny, maxx, maxy = (bbox[i] if cell[i] is None else cell[i] for i in range(4))
+    return [max(minx, bbox[0]), max(miny, bbox[1]), min(maxx, bbox[2]), min(maxy, bbox[3])]
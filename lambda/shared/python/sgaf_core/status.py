@@ -0,0 +1,160 @@
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from botocore.exceptions import ClientError
+
+from .dynamo import from_dynamo, to_dynamo
+from .manifest import manifest_key
+
+TERMINAL_STATUSES = ("COMPLETED", "FAILED")
+JOB_STATUSES = ("PENDING", "PROCESSING") + TERMINAL_STATUSES
+
+# Scalar fields of a manifest summary copied onto the job item; everything
+# else (per-tile arrays, partials, raster bands) stays in the S3 manifest
+SUMMARY_FIELDS = (
+    "ok",
+    "pointCount",
+    "polygonCount",
+    "polygonArea",
+    "otherCount",
+    "bbox",
+    "pointCentroid",
+    "reusedTiles",
+    "cachedFrom",
+)
+MAX_ERROR_CHARS = 4096
+
+
+def compact_summary(summary: Dict[str, Any]) -> Dict[str, Any]:
+    """Fixed-size digest of a manifest summary, whatever the tile count"""
+    out = {k: summary[k] for k in SUMMARY_FIELDS if summary.get(k) is not None}
+    out["numTiles"] = len(summary.get("tiles") or [])
+    if summary.get("datasets") is not None:
+        out["numDatasets"] = len(summary["datasets"])
+    return out
+
+
+def job_view(item: Dict[str, Any]) -> Dict[str, Any]:
+    """A job item as returned by GET /status and pushed to subscribers"""
+    # The item carries a compact summary; the full result is the S3 manifest
+    result = None
+    if item.get("summary") is not None:
+        result = {"summary": from_dynamo(item["summary"]), "manifestKey": item.get("manifestKey")}
+    elif item.get("result") is not None:
+        # Written before summaries were compacted
+        result = from_dynamo(item["result"])
+
+    return {
+        "datasetId": item.get("datasetId"),
+        "status": item.get("status", "UNKNOWN"),
+        "fileName": item.get("fileName"),
+        "fileType": item.get("fileType"),
+        "createdAt": item.get("createdAt"),
+        "updatedAt": item.get("updatedAt"),
+        "version": from_dynamo(item.get("version")),
+        "result": result,
+        "error": from_dynamo(item.get("error")),
+    }
+
+
+def put_job(table: Any, dataset_id: str, status: str, **fields: Any) -> Optional[int]:
+    """Start a job record, or restart it if the dataset ID is reused.
+
+    Written as an update rather than a put so version keeps increasing
+    across restarts; results of an earlier run are removed. Returns the new
+    version, which the run passes back as expected_version with its terminal
+    status so a superseded run cannot overwrite a restarted job.
+    """
+    now = datetime.utcnow().isoformat()
+    update_expr = "SET #status = :status, createdAt = :now, updatedAt = :now, " \
+        "#version = if_not_exists(#version, :zero) + :one"
+    expr_attrs: Dict[str, Any] = {":status": status, ":now": now, ":zero": 0, ":one": 1}
+    expr_names = {
+        "#status": "status",
+        "#version": "version",
+        "#summary": "summary",
+        "#result": "result",
+        "#error": "error",
+    }
+    for k, (name, value) in enumerate(sorted(fields.items())):
+        update_expr += f", #f{k} = :f{k}"
+        expr_names[f"#f{k}"] = name
+        expr_attrs[f":f{k}"] = to_dynamo(value)
+    update_expr += " REMOVE #summary, manifestKey, executionArn, #result, #error"
+
+    response = table.update_item(
+        Key={"datasetId": dataset_id},
+        UpdateExpression=update_expr,
+        ExpressionAttributeNames=expr_names,
+        ExpressionAttributeValues=expr_attrs,
+        ReturnValues="UPDATED_NEW",
+    )
+    version = (response.get("Attributes") or {}).get("version")
+    return int(version) if version is not None else None
+
+
+def update_job_status(
+    table: Any,
+    dataset_id: str,
+    status: str,
+    result: Optional[Dict[str, Any]] = None,
+    error: Any = None,
+    expected_version: Optional[int] = None,
+) -> bool:
+    """Write a job status transition to DynamoDB in a single conditional update.
+
+    The write only applies while the job is not already in a terminal state,
+    so a retried or duplicate completion cannot overwrite the first one, and,
+    with expected_version, only if no other write landed in between. Every
+    write increments version. Only compact_summary of the result is stored;
+    manifestKey points at the full result in S3. Returns False if the
+    condition rejected the write.
+    """
+    update_expr = "SET #status = :status, updatedAt = :updatedAt, " \
+        "#version = if_not_exists(#version, :zero) + :one"
+    expr_attrs = {
+        ":status": status,
+        ":updatedAt": datetime.utcnow().isoformat(),
+        ":completed": "COMPLETED",
+        ":failed": "FAILED",
+        ":zero": 0,
+        ":one": 1,
+    }
+    expr_names = {"#status": "status", "#version": "version"}
+    condition = "(attribute_not_exists(#status) OR NOT #status IN (:completed, :failed))"
+
+    if result:
+        update_expr += ", #summary = :summary, manifestKey = :manifestKey"
+        expr_names["#summary"] = "summary"
+        expr_attrs[":summary"] = to_dynamo(compact_summary(result.get("summary") or result))
+        expr_attrs[":manifestKey"] = manifest_key(dataset_id)
+
+    if error:
+        if isinstance(error, dict):
+            error = {k: v[:MAX_ERROR_CHARS] if isinstance(v, str) else v for k, v in error.items()}
+        elif isinstance(error, str):
+            error = error[:MAX_ERROR_CHARS]
+        update_expr += ", #error = :error"
+        expr_attrs[":error"] = to_dynamo(error)
+        expr_names["#error"] = "error"
+
+    if expected_version is not None:
+        if expected_version:
+            condition += " AND #version = :expected"
+            expr_attrs[":expected"] = expected_version
+        else:
+            condition += " AND attribute_not_exists(#version)"
+
+    try:
+        table.update_item(
+            Key={"datasetId": dataset_id},
+            UpdateExpression=update_expr,
+            ConditionExpression=condition,
+            ExpressionAttributeNames=expr_names,
+            ExpressionAttributeValues=expr_attrs,
+        )
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException":
+            return False
+        raise
+    return True
@@ -0,0 +1,166 @@
+"""Read-through cache of job items for the API Lambda.
+
+Lookups try a per-container LRU first, then an optional shared tier, and
+only then DynamoDB. Running jobs are served from the LRU for a short TTL,
+COMPLETED and FAILED jobs for a longer one; a dataset ID can be restarted
+by a re-upload, so finished jobs are not kept forever. Writers invalidate
+the shared tier through the JobsTable stream, so its entries are served
+until they expire or are deleted. A cached job is only replaced by an item
+with a higher version, which keeps a slow reader from putting an older
+status back after a newer one was seen.
+
+The shared tier is any object with get(key), set(key, value, ttl) and
+delete(key) over JSON strings: RedisTier in a deployment, MemoryTier when
+running locally or in tests.
+"""
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .dynamo import from_dynamo
+from .status import TERMINAL_STATUSES
+
+try:
+    import redis
+except ImportError:  # redis is only needed when a shared tier URL is configured
+    redis = None
+
+
+class MemoryTier:
+    """In-process stand-in for a shared tier"""
+
+    def __init__(self) -> None:
+        self.data: Dict[str, Tuple[str, Optional[float]]] = {}
+
+    def get(self, key: str) -> Optional[str]:
+        value, expires = self.data.get(key, (None, None))
+        if expires is not None and expires <= time.monotonic():
+            self.data.pop(key, None)
+            return None
+        return value
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        self.data[key] = (value, time.monotonic() + ttl if ttl else None)
+
+    def delete(self, key: str) -> None:
+        self.data.pop(key, None)
+
+
+class RedisTier:
+    """Shared tier on Redis/ElastiCache"""
+
+    def __init__(self, url: str) -> None:
+        if redis is None:
+            raise RuntimeError("redis is not installed")
+        self.client = redis.Redis.from_url(url, socket_timeout=0.2, socket_connect_timeout=0.2)
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.client.get(key)
+        return value.decode("utf-8") if value is not None else None
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None) -> None:
+        self.client.set(key, value, px=int(ttl * 1000) if ttl else None)
+
+    def delete(self, key: str) -> None:
+        self.client.delete(key)
+
+
+class StatusCache:
+    """LRU of JSON-compatible values with an optional shared tier behind it"""
+
+    def __init__(
+        self,
+        max_items: int = 1024,
+        ttl_seconds: float = 2.0,
+        shared: Any = None,
+        prefix: str = "sgaf:",
+        shared_terminal_ttl_seconds: float = 3600.0,
+        terminal_ttl_seconds: float = 60.0,
+    ) -> None:
+        self.max_items = max_items
+        self.ttl_seconds = ttl_seconds
+        self.shared = shared
+        self.prefix = prefix
+        self.shared_terminal_ttl_seconds = shared_terminal_ttl_seconds
+        self.terminal_ttl_seconds = terminal_ttl_seconds
+        self._items: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self.stats = {"localHits": 0, "sharedHits": 0, "misses": 0, "sharedErrors": 0}
+
+    def get(self, key: str, load: Callable[[], Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """Return the cached value for key, calling load() and caching its result on a miss.
+
+        Local entries are served for ttl_seconds, or terminal_ttl_seconds
+        once COMPLETED or FAILED. An expired entry is refreshed from the
+        shared tier when it holds the same or a newer version.
+        """
+        entry = self._items.get(key)
+        if entry is not None and entry[1] > time.monotonic():
+            self._items.move_to_end(key)
+            self.stats["localHits"] += 1
+            return entry[0]
+
+        value = self._shared_get(key) if self.shared is not None else None
+        if value is not None and (entry is None or _version(value) >= _version(entry[0])):
+            self._store(key, value)
+            self.stats["sharedHits"] += 1
+            return value
+
+        self.stats["misses"] += 1
+        self._items.pop(key, None)
+        value = load()
+        if value is not None:
+            value = self.put(key, value)
+        return value
+
+    def put(self, key: str, value: Dict[str, Any]) -> Dict[str, Any]:
+        """Cache value unless a newer version is already cached; returns the value kept"""
+        value = from_dynamo(value)
+        cached = self._items.get(key)
+        if cached is not None and _version(cached[0]) > _version(value):
+            return cached[0]
+        self._store(key, value)
+        if self.shared is not None:
+            ttl = self.shared_terminal_ttl_seconds if value.get("status") in TERMINAL_STATUSES else self.ttl_seconds
+            try:
+                self.shared.set(self.prefix + key, json.dumps(value), ttl)
+            except Exception as e:
+                print(f"Shared status cache unavailable: {e}")
+                self.stats["sharedErrors"] += 1
+        return value
+
+    def invalidate(self, key: str) -> None:
+        self._items.pop(key, None)
+        if self.shared is not None:
+            try:
+                self.shared.delete(self.prefix + key)
+            except Exception as e:
+                print(f"Shared status cache unavailable: {e}")
+                self.stats["sharedErrors"] += 1
+
+    def take_stats(self) -> Dict[str, int]:
+        """Return the counters since the last call and reset them"""
+        stats = dict(self.stats)
+        for name in self.stats:
+            self.stats[name] = 0
+        return stats
+
+    def _shared_get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            raw = self.shared.get(self.prefix + key)
+        except Exception as e:
+            print(f"Shared status cache unavailable: {e}")
+            self.stats["sharedErrors"] += 1
+            return None
+        return json.loads(raw) if raw is not None else None
+
+    def _store(self, key: str, value: Dict[str, Any]) -> None:
+        ttl = self.terminal_ttl_seconds if value.get("status") in TERMINAL_STATUSES else self.ttl_seconds
+        self._items[key] = (value, time.monotonic() + ttl)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+
+def _version(value: Dict[str, Any]) -> int:
+    return int(value.get("version") or 0)
@@ -0,0 +1,89 @@
+"""Per-stage wall time, bytes and feature counts of a process tile.
+
+A StageTimer attributes the time since its previous lap to the stage named
+in lap(), so a loop is instrumented by calling lap() at each stage
+boundary. Time spent inside nested work that is measured separately (S3
+reads, via add()) is excluded from the enclosing lap. A disabled timer does
+nothing, and its to_dict() returns None.
+
+Tile results carry {stage: {"ms", "bytes", "features"}}; merge() rolls tile
+timings up into the manifest's timings block.
+"""
+import time
+from typing import Any, Dict, Iterable, Optional
+
+
+class StageTimer:
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self._started = self._last = time.perf_counter()
+        self._excluded = 0.0
+
+    def lap(self, stage: str, features: int = 0, nbytes: int = 0) -> None:
+        """Attribute the time since the previous lap, less any add()ed time, to stage"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self._record(stage, now - self._last - self._excluded, features, nbytes)
+        self._last = now
+        self._excluded = 0.0
+
+    def add(self, stage: str, seconds: float, features: int = 0, nbytes: int = 0) -> None:
+        """Record separately measured time; it is excluded from the current lap"""
+        if not self.enabled:
+            return
+        self._record(stage, seconds, features, nbytes)
+        self._excluded += seconds
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        out: Dict[str, Any] = {
+            stage: {"ms": round(s["ms"], 3), "bytes": int(s["bytes"]), "features": int(s["features"])}
+            for stage, s in self.stages.items()
+        }
+        out["totalMs"] = round((time.perf_counter() - self._started) * 1000, 3)
+        return out
+
+    def _record(self, stage: str, seconds: float, features: int, nbytes: int) -> None:
+        s = self.stages.setdefault(stage, {"ms": 0.0, "bytes": 0, "features": 0})
+        s["ms"] += max(seconds, 0.0) * 1000
+        s["bytes"] += nbytes
+        s["features"] += features
+
+
+def merge(tiles: Iterable[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Roll up the timings of manifest tiles; None if no tile was timed"""
+    stages: Dict[str, Dict[str, float]] = {}
+    timed = 0
+    total_ms = 0.0
+    slowest: Optional[Dict[str, Any]] = None
+    for tile in tiles:
+        timings = tile.get("timings")
+        if not timings:
+            continue
+        timed += 1
+        total_ms += timings.get("totalMs", 0.0)
+        if slowest is None or timings.get("totalMs", 0.0) > slowest["totalMs"]:
+            slowest = {"tile": tile.get("tile"), "totalMs": timings.get("totalMs", 0.0)}
+        for stage, s in timings.items():
+            if stage == "totalMs":
+                continue
+            acc = stages.setdefault(stage, {"ms": 0.0, "bytes": 0, "features": 0})
+            acc["ms"] += s.get("ms", 0.0)
+            acc["bytes"] += s.get("bytes", 0)
+            acc["features"] += s.get("features", 0)
+    if not timed:
+        return None
+
+    for s in stages.values():
+        s["ms"] = round(s["ms"], 3)
+        # Features per second of stage time
+        s["featuresPerSecond"] = round(s["features"] / (s["ms"] / 1000), 1) if s["ms"] > 0 else None
+    return {
+        "tiles": timed,
+        "totalMs": round(total_ms, 3),
+        "slowestTile": slowest,
+        "stages": stages,
+    }
@@ -0,0 +1,74 @@
+"""GeoJSON geometry to little-endian 2D WKB"""
+import struct
+from typing import Any, List
+
+GEOMETRY_TYPES = {
+    "Point": 1,
+    "LineString": 2,
+    "Polygon": 3,
+    "MultiPoint": 4,
+    "MultiLineString": 5,
+    "MultiPolygon": 6,
+    "GeometryCollection": 7,
+}
+
+_NAN = float("nan")
+
+
+def to_wkb(geom: Any) -> bytes:
+    """Encode a GeoJSON geometry; raises ValueError if it is malformed"""
+    if not isinstance(geom, dict) or geom.get("type") not in GEOMETRY_TYPES:
+        raise ValueError("Unsupported geometry")
+    out = bytearray()
+    _write(out, geom)
+    return bytes(out)
+
+
+def _write(out: bytearray, geom: Any) -> None:
+    gtype = geom.get("type")
+    code = GEOMETRY_TYPES.get(gtype)
+    if code is None:
+        raise ValueError(f"Unsupported geometry type {gtype}")
+    out += struct.pack("<BI", 1, code)
+
+    if gtype == "GeometryCollection":
+        parts = geom.get("geometries") or []
+        out += struct.pack("<I", len(parts))
+        for part in parts:
+            _write(out, part)
+        return
+
+    coords = geom.get("coordinates")
+    if gtype == "Point":
+        # Empty points are encoded as NaN coordinates
+        out += struct.pack("<dd", *(_xy(coords) if coords else (_NAN, _NAN)))
+    elif gtype == "LineString":
+        _points(out, coords)
+    elif gtype == "Polygon":
+        _rings(out, coords)
+    else:
+        member = {4: "Point", 5: "LineString", 6: "Polygon"}[code]
+        parts = coords or []
+        out += struct.pack("<I", len(parts))
+        for part in parts:
+            _write(out, {"type": member, "coordinates": part})
+
+
+def _xy(p: Any) -> List[float]:
+    if not isinstance(p, list) or len(p) < 2:
+        raise ValueError("Invalid position")
+    return [float(p[0]), float(p[1])]
+
+
+def _points(out: bytearray, points: Any) -> None:
+    points = points or []
+    out += struct.pack("<I", len(points))
+    for p in points:
+        out += struct.pack("<dd", *_xy(p))
+
+
+def _rings(out: bytearray, rings: Any) -> None:
+    rings = rings or []
+    out += struct.pack("<I", len(rings))
+    for ring in rings:
+        _points(out, ring)
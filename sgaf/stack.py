@@ -1,5 +1,9 @@
 import json
+import subprocess
+import sys
+
 import aws_cdk as cdk
+import jsii
 from aws_cdk import (
     Stack,
     Duration,
@@ -7,6 +11,7 @@ from aws_cdk import (
     aws_s3 as s3,
     aws_s3_notifications as s3n,
     aws_lambda as _lambda,
+    aws_lambda_event_sources as lambda_event_sources,
     aws_iam as iam,
     aws_logs as logs,
     aws_stepfunctions as sfn,
@@ -14,6 +19,8 @@ from aws_cdk import (
     aws_sns as sns,
     aws_sns_subscriptions as subs,
     aws_apigateway as apigateway,
+    aws_apigatewayv2 as apigwv2,
+    aws_apigatewayv2_integrations as apigwv2_integrations,
     aws_dynamodb as dynamodb,
     aws_events as events,
     aws_events_targets as targets,
@@ -28,6 +35,28 @@ from aws_cdk import (
 from constructs import Construct
 
 
+@jsii.implements(cdk.ILocalBundling)
+class _PipLocalBundling:
+    """Build a Python layer with the local pip, downloading Lambda-compatible
+    wheels; Docker bundling is the fallback when that fails"""
+
+    def try_bundle(self, output_dir: str, options: cdk.BundlingOptions) -> bool:
+        try:
+            subprocess.run(
+                [
+                    sys.executable, "-m", "pip", "install", "--quiet",
+                    "-r", "lambda/layers/numpy/requirements.txt",
+                    "-t", f"{output_dir}/python",
+                    "--platform", "manylinux2014_x86_64", "--implementation", "cp",
+                    "--python-version", "3.12", "--only-binary=:all:",
+                ],
+                check=True,
+            )
+        except (OSError, subprocess.CalledProcessError):
+            return False
+        return True
+
+
 class SgafStack(Stack):
     def __init__(self, scope: Construct, construct_id: str, **kwargs) -> None:
         super().__init__(scope, construct_id, **kwargs)
@@ -39,15 +68,28 @@ class SgafStack(Stack):
             block_public_access=s3.BlockPublicAccess.BLOCK_ALL,
             encryption=s3.BucketEncryption.S3_MANAGED,
             enforce_ssl=True,
-            lifecycle_rules=[s3.LifecycleRule(expiration=Duration.days(3))],
+            lifecycle_rules=[s3.LifecycleRule(
+                expiration=Duration.days(3),
+                abort_incomplete_multipart_upload_after=Duration.days(1),
+            )],
+            # Browsers PUT presigned multipart parts directly and need the part ETags
+            cors=[s3.CorsRule(
+                allowed_methods=[s3.HttpMethods.PUT],
+                allowed_origins=["*"],
+                allowed_headers=["*"],
+                exposed_headers=["ETag"],
+            )],
             removal_policy=RemovalPolicy.DESTROY,  # For easy cleanup
         )
 
+        # Outputs expire this long after their last write; result cache entries
+        # are rewritten on every hit, so they expire once unused for as long
+        output_retention_days = 3
         output_bucket = s3.Bucket(self, "OutputBucket",
             block_public_access=s3.BlockPublicAccess.BLOCK_ALL,
             encryption=s3.BucketEncryption.S3_MANAGED,
             enforce_ssl=True,
-            lifecycle_rules=[s3.LifecycleRule(expiration=Duration.days(3))],
+            lifecycle_rules=[s3.LifecycleRule(expiration=Duration.days(output_retention_days))],
             removal_policy=RemovalPolicy.DESTROY,
         )
 
@@ -62,6 +104,16 @@ class SgafStack(Stack):
             billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,  # Free tier: 25 GB storage
             removal_policy=RemovalPolicy.DESTROY,
             time_to_live_attribute="ttl",  # Optional TTL for auto-cleanup
+            stream=dynamodb.StreamViewType.NEW_AND_OLD_IMAGES,  # Drives status pushes
+        )
+        # GET /jobs pages through this index newest first instead of scanning
+        # the table; result summaries are left out of the projection
+        jobs_table.add_global_secondary_index(
+            index_name="StatusCreatedAtIndex",
+            partition_key=dynamodb.Attribute(name="status", type=dynamodb.AttributeType.STRING),
+            sort_key=dynamodb.Attribute(name="createdAt", type=dynamodb.AttributeType.STRING),
+            projection_type=dynamodb.ProjectionType.INCLUDE,
+            non_key_attributes=["fileName", "fileType", "updatedAt"],
         )
 
         # ============================================================================
@@ -121,14 +173,21 @@ class SgafStack(Stack):
             removal_policy=RemovalPolicy.DESTROY,
         )
 
+        # Fan-out tuning, overridable with -c map_concurrency=N etc.
+        map_concurrency = int(self.node.try_get_context("map_concurrency") or 10)
+        distributed_map = str(self.node.try_get_context("distributed_map") or "false").lower() == "true"
+        distributed_map_min_tiles = int(self.node.try_get_context("distributed_map_min_tiles") or 40)
+        max_items = int(self.node.try_get_context("max_items") or (1000 if distributed_map else 32))
+        sharding_mode = str(self.node.try_get_context("sharding_mode") or "contiguous")
+
         # ============================================================================
         # SERVICE 10: Systems Manager Parameter Store - Configuration
         # ============================================================================
         config_parameter = ssm.StringParameter(self, "SgafConfig",
             parameter_name="/sgaf/config",
             string_value=json.dumps({
-                "max_file_size": "1048576",
-                "max_items": "3",
+                "max_file_size": "268435456",
+                "max_items": str(max_items),
                 "region": self.region,
                 "email": email_address,
             }),
@@ -200,21 +259,45 @@ class SgafStack(Stack):
             "INPUT_BUCKET": input_bucket.bucket_name,
             "OUTPUT_BUCKET": output_bucket.bucket_name,
             "DYNAMODB_TABLE": jobs_table.table_name,
-            "MAX_FILE_SIZE_BYTES": "1048576",  # 1 MiB cap
-            "MAX_ITEMS": "3"
+            "MAX_FILE_SIZE_BYTES": "268435456",  # 256 MiB cap; GeoJSON is streamed
+            "MAX_ITEMS": str(max_items),
+            "TARGET_SHARD_BYTES": "8388608",  # One tile per 8 MiB
+            "MIN_SHARD_FEATURES": "1000",
+            "SHARDING_MODE": sharding_mode,
+            "RESULT_CACHE_TTL_DAYS": str(output_retention_days),
+            # Output options; ingest also folds them into result cache keys
+            "SPATIAL_INDEX": "true",
+            "COLUMNAR_OUTPUT": "true",
+            "TILE_CACHE": "true",
+            "RASTER_HISTOGRAM_BINS": "256",
+            # Opt-in per-stage timings in tile results and the manifest
+            # Usage: cdk deploy -c stage_timings=true
+            "STAGE_TIMINGS": str(self.node.try_get_context("stage_timings") or "false").lower(),
         }
+        # Usage: cdk deploy -c raster_histogram_range=0,10000
+        raster_histogram_range = self.node.try_get_context("raster_histogram_range")
+        if raster_histogram_range:
+            common_env["RASTER_HISTOGRAM_RANGE"] = str(raster_histogram_range)
 
         # ============================================================================
         # SERVICE 5: Lambda Functions
         # ============================================================================
 
+        # Shared sgaf_core library (status updates, manifests, GeoJSON scanning)
+        core_layer = _lambda.LayerVersion(self, "SgafCoreLayer",
+            code=_lambda.Code.from_asset("lambda/shared"),
+            compatible_runtimes=[_lambda.Runtime.PYTHON_3_12],
+            description="Shared SGAF library importable by every handler",
+        )
+
         # Process Lambda (invoked by Step Functions Map)
         process_fn = _lambda.Function(self, "ProcessFn",
             code=_lambda.Code.from_asset("lambda/process"),
             handler="app.handler",
+            layers=[core_layer],
             runtime=_lambda.Runtime.PYTHON_3_12,
             memory_size=128,
-            timeout=Duration.seconds(10),
+            timeout=Duration.seconds(60),  # Streams large objects
             environment=common_env,
             log_retention=logs.RetentionDays.THREE_DAYS,
             tracing=tracing,  # Enable X-Ray tracing
@@ -224,33 +307,51 @@ class SgafStack(Stack):
         input_bucket.grant_read(process_fn)
         jobs_table.grant_read_data(process_fn)
         jobs_table.grant_write_data(process_fn)
-        process_fn.add_to_role_policy(iam.PolicyStatement(
-            actions=["cloudwatch:PutMetricData"],
-            resources=["*"],
-        ))
+
+        # NumPy layer for GeoTIFF block statistics and the vectorised geometry
+        # kernel, built from lambda/layers/numpy at synth time. Without NumPy
+        # the kernel falls back to pure Python and rasters get metadata only.
+        # Usage: cdk deploy -c numpy_layer_arn=arn:aws:lambda:...:layer:...  (existing layer)
+        #        cdk deploy -c numpy_layer=false  (no NumPy)
+        numpy_layer_arn = self.node.try_get_context("numpy_layer_arn")
+        if numpy_layer_arn:
+            process_fn.add_layers(
+                _lambda.LayerVersion.from_layer_version_arn(self, "NumpyLayer", numpy_layer_arn)
+            )
+        elif str(self.node.try_get_context("numpy_layer") or "true").lower() == "true":
+            process_fn.add_layers(_lambda.LayerVersion(self, "NumpyLayer",
+                code=_lambda.Code.from_asset("lambda/layers/numpy",
+                    bundling=cdk.BundlingOptions(
+                        image=_lambda.Runtime.PYTHON_3_12.bundling_image,
+                        command=["bash", "-c", "pip install -r requirements.txt -t /asset-output/python"],
+                        local=_PipLocalBundling(),
+                    ),
+                ),
+                compatible_runtimes=[_lambda.Runtime.PYTHON_3_12],
+                description="NumPy for GeoTIFF statistics and the geometry kernel",
+            ))
 
         # Aggregate Lambda
         aggregate_fn = _lambda.Function(self, "AggregateFn",
             code=_lambda.Code.from_asset("lambda/aggregate"),
             handler="app.handler",
+            layers=[core_layer],
             runtime=_lambda.Runtime.PYTHON_3_12,
-            memory_size=128,
-            timeout=Duration.seconds(10),
+            memory_size=512,  # Merges the per-tile spatial index parts
+            timeout=Duration.seconds(60),
             environment=common_env,
             log_retention=logs.RetentionDays.THREE_DAYS,
             tracing=tracing,  # Enable X-Ray tracing
             dead_letter_queue=dlq,  # Use DLQ for failed invocations
         )
         output_bucket.grant_read_write(aggregate_fn)
-        aggregate_fn.add_to_role_policy(iam.PolicyStatement(
-            actions=["cloudwatch:PutMetricData"],
-            resources=["*"],
-        ))
+        jobs_table.grant_read_write_data(aggregate_fn)
 
         # Update Status Lambda (updates DynamoDB)
         update_status_fn = _lambda.Function(self, "UpdateStatusFn",
             code=_lambda.Code.from_asset("lambda/update_status"),
             handler="app.handler",
+            layers=[core_layer],
             runtime=_lambda.Runtime.PYTHON_3_12,
             memory_size=128,
             timeout=Duration.seconds(10),
@@ -265,23 +366,18 @@ class SgafStack(Stack):
         jobs_table.grant_write_data(update_status_fn)
         output_bucket.grant_read(update_status_fn)
 
-        # Update aggregate function environment
-        aggregate_fn.add_environment("UPDATE_STATUS_FUNCTION", update_status_fn.function_name)
-        aggregate_fn.add_to_role_policy(iam.PolicyStatement(
-            actions=["lambda:InvokeFunction"],
-            resources=[update_status_fn.function_arn],
-        ))
-
         # API Lambda
         api_fn = _lambda.Function(self, "ApiFn",
             code=_lambda.Code.from_asset("lambda/api"),
             handler="app.handler",
+            layers=[core_layer],
             runtime=_lambda.Runtime.PYTHON_3_12,
             memory_size=128,
-            timeout=Duration.seconds(10),
+            timeout=Duration.seconds(28),  # GET /status?wait= holds requests up to 20 s
             environment={
                 **common_env,
                 "CONFIG_PARAMETER": config_parameter.parameter_name,
+                "JOBS_STATUS_INDEX": "StatusCreatedAtIndex",
                 "USER_POOL_ID": user_pool.user_pool_id,
                 "USER_POOL_CLIENT_ID": user_pool_client.user_pool_client_id,
             },
@@ -295,6 +391,7 @@ class SgafStack(Stack):
         config_parameter.grant_read(api_fn)
         user_pool.grant(api_fn, "cognito-idp:AdminGetUser", "cognito-idp:AdminListGroupsForUser")
         input_bucket.grant_read_write(api_fn)
+        output_bucket.grant_read(api_fn)  # Manifests and spatial indexes for bbox queries
         jobs_table.grant_read_data(api_fn)
         jobs_table.grant_write_data(api_fn)
         api_fn.add_to_role_policy(iam.PolicyStatement(
@@ -302,13 +399,23 @@ class SgafStack(Stack):
             resources=["*"],  # Will be restricted below
         ))
 
+        # Optional shared tier for the API's status cache; the redis package
+        # and network access to the cluster must be provided alongside.
+        # Usage: cdk deploy -c status_cache_url=redis://host:6379
+        status_cache_url = self.node.try_get_context("status_cache_url")
+        if status_cache_url:
+            api_fn.add_environment("STATUS_CACHE_URL", status_cache_url)
+
         # Ingest Lambda: triggered by S3, validates and starts Step Functions
         ingest_fn = _lambda.Function(self, "IngestFn",
             code=_lambda.Code.from_asset("lambda/ingest"),
             handler="app.handler",
+            layers=[core_layer],
             runtime=_lambda.Runtime.PYTHON_3_12,
-            memory_size=128,
-            timeout=Duration.seconds(10),
+            # The feature index pass scans at roughly 7 MB/s per vCPU; 1769 MB
+            # buys a full vCPU, so a 256 MB object indexes in well under the timeout
+            memory_size=1769,
+            timeout=Duration.minutes(5),
             environment={
                 **common_env,
             },
@@ -321,6 +428,7 @@ class SgafStack(Stack):
         format_sns_fn = _lambda.Function(self, "FormatSnsFn",
             code=_lambda.Code.from_asset("lambda/format_sns"),
             handler="app.handler",
+            layers=[core_layer],
             runtime=_lambda.Runtime.PYTHON_3_12,
             memory_size=128,
             timeout=Duration.seconds(10),
@@ -335,6 +443,7 @@ class SgafStack(Stack):
         email_secret.grant_read(ingest_fn)
         config_parameter.grant_read(ingest_fn)
         input_bucket.grant_read(ingest_fn)
+        output_bucket.grant_read_write(ingest_fn)  # Sidecar feature index and result cache
         jobs_table.grant_read_data(ingest_fn)
         jobs_table.grant_write_data(ingest_fn)
         
@@ -345,10 +454,11 @@ class SgafStack(Stack):
         # SERVICE 6: Step Functions - Workflow Orchestration
         # ============================================================================
         
-        # Update DynamoDB task
-        update_dynamodb_task = tasks.LambdaInvoke(self, "UpdateDynamoDB",
+        # Mark the job FAILED in DynamoDB; aggregate records successful jobs itself
+        mark_failed_task = tasks.LambdaInvoke(self, "MarkJobFailed",
             lambda_function=update_status_fn,
             payload_response_only=True,
+            result_path=sfn.JsonPath.DISCARD,
         )
 
         # Process task
@@ -360,9 +470,16 @@ class SgafStack(Stack):
         # Map state for parallel processing
         map_state = sfn.Map(self, "MapProcess",
             items_path=sfn.JsonPath.string_at("$.workItems"),
-            max_concurrency=1
+            max_concurrency=map_concurrency
         ).iterator(process_task)
 
+        # Single-tile jobs invoke the process Lambda directly, skipping the Map
+        process_inline_task = tasks.LambdaInvoke(self, "ProcessInline",
+            lambda_function=process_fn,
+            payload=sfn.TaskInput.from_json_path_at("$.workItems[0]"),
+            payload_response_only=True,
+        )
+
         # Aggregate task
         aggregate_task = tasks.LambdaInvoke(self, "AggregateResults",
             lambda_function=aggregate_fn,
@@ -396,29 +513,56 @@ class SgafStack(Stack):
         )
 
         # Error handling with formatted messages
-        failure_chain = format_failure_task.next(notify_failure)
+        mark_failed_task.add_catch(format_failure_task, result_path=sfn.JsonPath.DISCARD)
+        failure_chain = mark_failed_task.next(format_failure_task).next(notify_failure)
         map_state.add_catch(failure_chain, result_path="$.error")
+        process_inline_task.add_catch(failure_chain, result_path="$.error")
+
+        # Distributed Map for very wide jobs: work items are read from an S3
+        # manifest written by ingest and tile results are written back to S3
+        distributed_map_state = None
+        if distributed_map:
+            distributed_map_state = sfn.DistributedMap(self, "DistributedMapProcess",
+                max_concurrency=map_concurrency,
+                item_reader=sfn.S3JsonItemReader(
+                    bucket=output_bucket,
+                    key=sfn.JsonPath.string_at("$.workItemsKey"),
+                ),
+                result_writer=sfn.ResultWriter(
+                    bucket=output_bucket,
+                    prefix="map-results",
+                ),
+            ).item_processor(tasks.LambdaInvoke(self, "ProcessDistributedItem",
+                lambda_function=process_fn,
+                payload_response_only=True,
+            ))
+            distributed_map_state.add_catch(failure_chain, result_path="$.error")
         aggregate_task.add_catch(failure_chain, result_path="$.error")
-        update_dynamodb_task.add_catch(failure_chain, result_path="$.error")
         format_sns_task.add_catch(failure_chain, result_path="$.error")
 
         # Workflow definition showing all services:
         # 1. S3 (trigger) -> 2. Lambda (Ingest) -> 3. Step Functions (orchestration)
-        # 4. Lambda (Process) -> 5. Lambda (Aggregate) -> 6. DynamoDB (Update)
+        # 4. Lambda (Process) -> 5. Lambda (Aggregate, writes DynamoDB) -> 6. DynamoDB (Update on failure)
         # 7. Lambda (Format SNS) -> 8. SNS (Notify) -> 9. CloudWatch (Metrics)
         # 10. EventBridge (Monitoring) -> 11. X-Ray (Tracing) -> 12. SQS (DLQ)
         # 13. Secrets Manager (Config) -> 14. SSM (Parameters)
+        process_inline_task.next(aggregate_task)
+        map_state.next(aggregate_task)
+        aggregate_task.next(format_sns_task).next(notify_success)
+
+        route = sfn.Choice(self, "RouteByTileCount")
+        if distributed_map_state is not None:
+            distributed_map_state.next(aggregate_task)
+            route.when(sfn.Condition.is_present("$.workItemsKey"), distributed_map_state)
         definition = (
-            map_state
-            .next(aggregate_task)
-            .next(update_dynamodb_task)
-            .next(format_sns_task)
-            .next(notify_success)
+            route
+            .when(sfn.Condition.number_equals("$.numTiles", 1), process_inline_task)
+            .otherwise(map_state)
         )
 
         state_machine = sfn.StateMachine(self, "SgafStateMachine",
             definition=definition,
-            timeout=Duration.minutes(2),
+            timeout=Duration.minutes(15),  # Wide fan-outs run several rounds of tiles
             state_machine_type=sfn.StateMachineType.STANDARD,
             logs=sfn.LogOptions(
                 destination=logs.LogGroup(self, "SgafSfnLogs",
@@ -429,13 +573,76 @@ class SgafStack(Stack):
             tracing_enabled=True,  # Enable X-Ray tracing for Step Functions
         )
 
+        # Express fast path for small single-tile jobs: process and aggregate
+        # run back to back (aggregate writes the manifest and DynamoDB item)
+        # without the Map state
+        fast_format_failure_task = tasks.LambdaInvoke(self, "FastFormatFailureMessage",
+            lambda_function=format_sns_fn,
+            payload_response_only=True,
+        )
+        fast_mark_failed_task = tasks.LambdaInvoke(self, "FastMarkJobFailed",
+            lambda_function=update_status_fn,
+            payload_response_only=True,
+            result_path=sfn.JsonPath.DISCARD,
+        )
+        fast_mark_failed_task.add_catch(fast_format_failure_task, result_path=sfn.JsonPath.DISCARD)
+        fast_failure_chain = fast_mark_failed_task.next(fast_format_failure_task).next(
+            tasks.SnsPublish(self, "FastNotifyFailure",
+                topic=failure_topic,
+                subject=sfn.JsonPath.string_at("$.subject"),
+                message=sfn.TaskInput.from_text(sfn.JsonPath.string_at("$.message")),
+            )
+        )
+        fast_process_task = tasks.LambdaInvoke(self, "FastProcessItem",
+            lambda_function=process_fn,
+            payload=sfn.TaskInput.from_json_path_at("$.workItems[0]"),
+            payload_response_only=True,
+        )
+        fast_aggregate_task = tasks.LambdaInvoke(self, "FastAggregateResults",
+            lambda_function=aggregate_fn,
+            payload_response_only=True,
+        )
+        fast_format_sns_task = tasks.LambdaInvoke(self, "FastFormatSnsMessage",
+            lambda_function=format_sns_fn,
+            payload_response_only=True,
+        )
+        for task in (fast_process_task, fast_aggregate_task, fast_format_sns_task):
+            task.add_catch(fast_failure_chain, result_path="$.error")
+
+        express_state_machine = sfn.StateMachine(self, "SgafExpressStateMachine",
+            definition=(
+                fast_process_task
+                .next(fast_aggregate_task)
+                .next(fast_format_sns_task)
+                .next(tasks.SnsPublish(self, "FastNotifySuccess",
+                    topic=success_topic,
+                    subject=sfn.JsonPath.string_at("$.subject"),
+                    message=sfn.TaskInput.from_text(sfn.JsonPath.string_at("$.message")),
+                ))
+            ),
+            timeout=Duration.minutes(1),
+            state_machine_type=sfn.StateMachineType.EXPRESS,
+            logs=sfn.LogOptions(
+                destination=logs.LogGroup(self, "SgafExpressSfnLogs",
+                    retention=logs.RetentionDays.THREE_DAYS
+                ),
+                level=sfn.LogLevel.ERROR
+            ),
+            tracing_enabled=True,
+        )
+
         # Grant permissions
         state_machine.grant_start_execution(ingest_fn)
+        state_machine.grant_read(ingest_fn)  # DescribeExecution detects redelivered events
+        express_state_machine.grant_start_execution(ingest_fn)
         state_machine.grant_start_execution(api_fn)
         api_fn.add_environment("STATE_MACHINE_ARN", state_machine.state_machine_arn)
 
         # Update ingest function environment
         ingest_fn.add_environment("STATE_MACHINE_ARN", state_machine.state_machine_arn)
+        ingest_fn.add_environment("EXPRESS_STATE_MACHINE_ARN", express_state_machine.state_machine_arn)
+        if distributed_map:
+            ingest_fn.add_environment("DISTRIBUTED_MAP_MIN_TILES", str(distributed_map_min_tiles))
 
         # ============================================================================
         # SERVICE 7: EventBridge - Event-Driven Processing
@@ -471,7 +678,7 @@ class SgafStack(Stack):
             default_cors_preflight_options=apigateway.CorsOptions(
                 allow_origins=apigateway.Cors.ALL_ORIGINS,
                 allow_methods=apigateway.Cors.ALL_METHODS,
-                allow_headers=["Content-Type", "X-Amz-Date", "Authorization"],
+                allow_headers=["Content-Type", "X-Amz-Date", "Authorization", "If-None-Match"],
             ),
         )
 
@@ -489,6 +696,20 @@ class SgafStack(Stack):
             ]
         )
 
+        # Multipart upload completion endpoint
+        upload_complete_resource = upload_resource.add_resource("complete")
+        upload_complete_resource.add_method("POST",
+            apigateway.LambdaIntegration(api_fn),
+            method_responses=[
+                apigateway.MethodResponse(
+                    status_code="200",
+                    response_parameters={
+                        "method.response.header.Access-Control-Allow-Origin": True,
+                    }
+                )
+            ]
+        )
+
         # Status endpoint
         status_resource = api.root.add_resource("status").add_resource("{datasetId}")
         status_resource.add_method("GET",
@@ -517,14 +738,103 @@ class SgafStack(Stack):
             ]
         )
 
+        # Bbox feature query endpoint
+        features_resource = api.root.add_resource("datasets").add_resource("{datasetId}").add_resource("features")
+        features_resource.add_method("GET",
+            apigateway.LambdaIntegration(api_fn),
+            method_responses=[
+                apigateway.MethodResponse(
+                    status_code="200",
+                    response_parameters={
+                        "method.response.header.Access-Control-Allow-Origin": True,
+                    }
+                )
+            ]
+        )
+
         # Note: OPTIONS methods are automatically created by default_cors_preflight_options
 
-        # S3 event: trigger ingest on object created
+        # S3 event: trigger ingest on object created, by PUT or by completing
+        # a presigned multipart upload. With -c ingest_queue=true the events
+        # are buffered in SQS so bursts of uploads reach ingest in batches,
+        # where small files are packed into shared executions
+        ingest_destination = s3n.LambdaDestination(ingest_fn)
+        if str(self.node.try_get_context("ingest_queue") or "false").lower() == "true":
+            ingest_queue = sqs.Queue(self, "IngestQueue",
+                visibility_timeout=Duration.minutes(30),  # 6x the ingest timeout
+                retention_period=Duration.days(3),
+                dead_letter_queue=sqs.DeadLetterQueue(max_receive_count=3, queue=dlq),
+                removal_policy=RemovalPolicy.DESTROY,
+            )
+            ingest_fn.add_event_source(lambda_event_sources.SqsEventSource(ingest_queue,
+                batch_size=int(self.node.try_get_context("ingest_batch_size") or 100),
+                max_batching_window=Duration.seconds(
+                    int(self.node.try_get_context("ingest_batch_window_seconds") or 10)
+                ),
+                report_batch_item_failures=True,
+            ))
+            # Objects that would not finish indexing in a batch's remaining time are re-queued
+            ingest_fn.add_environment("INGEST_QUEUE_URL", ingest_queue.queue_url)
+            ingest_queue.grant_send_messages(ingest_fn)
+            ingest_destination = s3n.SqsDestination(ingest_queue)
         input_bucket.add_event_notification(
             s3.EventType.OBJECT_CREATED_PUT,
-            s3n.LambdaDestination(ingest_fn)
+            ingest_destination
+        )
+        input_bucket.add_event_notification(
+            s3.EventType.OBJECT_CREATED_COMPLETE_MULTIPART_UPLOAD,
+            ingest_destination
         )
 
+        # Push job status changes to the frontend over a WebSocket API instead
+        # of having it poll /status: the JobsTable stream invokes the push
+        # Lambda, which posts to every connection subscribed to the job
+        connections_table = dynamodb.Table(self, "StatusConnectionsTable",
+            partition_key=dynamodb.Attribute(name="datasetId", type=dynamodb.AttributeType.STRING),
+            sort_key=dynamodb.Attribute(name="connectionId", type=dynamodb.AttributeType.STRING),
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            removal_policy=RemovalPolicy.DESTROY,
+            time_to_live_attribute="ttl",  # Subscriptions expire with their connection
+        )
+        push_fn = _lambda.Function(self, "PushFn",
+            code=_lambda.Code.from_asset("lambda/push"),
+            handler="app.handler",
+            layers=[core_layer],
+            runtime=_lambda.Runtime.PYTHON_3_12,
+            memory_size=128,
+            timeout=Duration.seconds(10),
+            environment={
+                "DYNAMODB_TABLE": jobs_table.table_name,
+                "CONNECTIONS_TABLE": connections_table.table_name,
+            },
+            log_retention=logs.RetentionDays.THREE_DAYS,
+            tracing=tracing,
+        )
+        status_socket = apigwv2.WebSocketApi(self, "StatusSocket",
+            api_name="sgaf-status",
+            description="Pushes job status changes to subscribed clients",
+        )
+        status_socket.add_route("subscribe",
+            integration=apigwv2_integrations.WebSocketLambdaIntegration("SubscribeIntegration", push_fn),
+        )
+        status_socket_stage = apigwv2.WebSocketStage(self, "StatusSocketStage",
+            web_socket_api=status_socket,
+            stage_name="prod",
+            auto_deploy=True,
+        )
+        push_fn.add_environment("WEBSOCKET_ENDPOINT", status_socket_stage.callback_url)
+        if status_cache_url:
+            # Every JobsTable write invalidates the shared status cache entry
+            push_fn.add_environment("STATUS_CACHE_URL", status_cache_url)
+        status_socket.grant_manage_connections(push_fn)
+        jobs_table.grant_read_data(push_fn)
+        connections_table.grant_read_write_data(push_fn)
+        push_fn.add_event_source(lambda_event_sources.DynamoEventSource(jobs_table,
+            starting_position=_lambda.StartingPosition.LATEST,
+            batch_size=100,
+            retry_attempts=2,  # Pushes are best effort; clients also poll slowly
+        ))
+
         # ============================================================================
         # CloudWatch Dashboard Widgets
         # ============================================================================
@@ -555,6 +865,23 @@ class SgafStack(Stack):
                     ),
                 ],
             ),
+            cloudwatch.GraphWidget(
+                title="Processing Throughput",
+                left=[
+                    cloudwatch.Metric(
+                        namespace="SGAF/Processing",
+                        metric_name="FeaturesPerSecond",
+                        statistic="Average",
+                    ),
+                ],
+                right=[
+                    cloudwatch.Metric(
+                        namespace="SGAF/Processing",
+                        metric_name="BytesRead",
+                        statistic="Sum",
+                    ),
+                ],
+            ),
             cloudwatch.AlarmWidget(
                 alarm=error_alarm,
                 title="Processing Errors",
@@ -568,7 +895,9 @@ class SgafStack(Stack):
         cdk.CfnOutput(self, "InputBucketName", value=input_bucket.bucket_name)
         cdk.CfnOutput(self, "OutputBucketName", value=output_bucket.bucket_name)
         cdk.CfnOutput(self, "StateMachineArn", value=state_machine.state_machine_arn)
+        cdk.CfnOutput(self, "ExpressStateMachineArn", value=express_state_machine.state_machine_arn)
         cdk.CfnOutput(self, "ApiGatewayUrl", value=api.url)
+        cdk.CfnOutput(self, "StatusSocketUrl", value=status_socket_stage.url)
         cdk.CfnOutput(self, "SuccessTopicArn", value=success_topic.topic_arn)
         cdk.CfnOutput(self, "FailureTopicArn", value=failure_topic.topic_arn)
         cdk.CfnOutput(self, "DynamoDBTableName", value=jobs_table.table_name)